@@ -108,9 +108,22 @@ def create_app(test_config=None):
     if test_config:
         app.config.update(test_config)
 
+    # Opt-in: an X-Profile request header runs that request under a profiler
+    app.config.setdefault(
+        "REQUEST_PROFILING", os.environ.get("REQUEST_PROFILING", "N") == "Y"
+    )
+    if app.config["REQUEST_PROFILING"]:
+        from .request_profiler import init_request_profiler
+        init_request_profiler(app)
+
     # Initialize extensions
     db.init_app(app)
 
+    # Server-Timing headers and per-route latency histograms
+    from .request_metrics import init_request_metrics
+    with app.app_context():
+        init_request_metrics(app, db.engine)
+
     # Register blueprints
     from .routes.web_routes import web_bp
     from .routes.api_routes import api_bp
@@ -126,4 +139,10 @@ def create_app(test_config=None):
         db.create_all()
         app.logger.info("[__init__.py] Database tables created")
 
+        # Triggers that keep the per-symbol analysis cache versions current
+        from lib.db_utils import DatabaseInserter
+        from lib.symbol_version import ensure_symbol_versions
+        with DatabaseInserter(db=db) as conn:
+            ensure_symbol_versions(conn)
+
     return app
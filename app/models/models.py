@@ -1,12 +1,9 @@
 # app/models/models.py
 from ..extensions import db
-from lib.constants import Action
+from lib.constants import COMMON_ACTIONS
 
 # Actions that represent trade entries (buys) or exits (sells)
-common_actions = [
-    Action.BUY, Action.BUY_TO_OPEN, Action.EXERCISED,
-    Action.EXPIRED, Action.REINVEST_SHARES, Action.SELL, Action.SELL_TO_CLOSE,
-]
+common_actions = list(COMMON_ACTIONS)
 
 
 class Security(db.Model):
@@ -36,3 +33,27 @@ class TradeTransaction(db.Model):
     security = db.relationship(
         "Security", backref=db.backref("transactions", lazy=True)
     )
+
+    # Access paths of the repository queries and DatabaseInserter.transaction_exists;
+    # existing databases get them from bin/migrate_add_covering_indexes.py
+    __table_args__ = (
+        # get_raw_trade_data (rows come back in index order) and the CSV dedupe lookup
+        db.Index("idx_trade_symbol_date", "symbol", "trade_date", "action", "trade_type", "account"),
+        # get_current_holdings / get_trade_stats_summary aggregate from the index alone
+        db.Index(
+            "idx_trade_action_symbol_covering",
+            "action", "symbol", "trade_type", "label", "quantity", "amount", "price",
+        ),
+        # API dedupe (see bin/migrate_add_activity_id.py)
+        db.Index(
+            "unique_trade_transaction_activity_index", "activity_id", "leg_index",
+            unique=True, sqlite_where=db.text("activity_id IS NOT NULL"),
+        ),
+    )
+
+
+class SymbolVersion(db.Model):
+    """Per-symbol change counter, bumped by triggers (see lib/symbol_version.py)."""
+
+    symbol = db.Column(db.String(30), primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
@@ -1,8 +1,11 @@
 # app/repositories/trade_repository.py
+from itertools import groupby
+from operator import itemgetter
+
 from sqlalchemy import func, case, select
 
 from ..extensions import db
-from ..models.models import Security, TradeTransaction, common_actions
+from ..models.models import Security, SymbolVersion, TradeTransaction, common_actions
 from lib.constants import Action
 from lib.ignore_symbols import get_ignored_symbols
 
@@ -203,41 +206,69 @@ def get_current_holdings_symbols():
     return result
 
 
+_TRADE_DATA_COLUMNS = (
+    TradeTransaction.id,
+    TradeTransaction.symbol,
+    TradeTransaction.action,
+    TradeTransaction.trade_type,
+    TradeTransaction.label,
+    TradeTransaction.trade_date,
+    TradeTransaction.expiration_date,
+    TradeTransaction.quantity,
+    TradeTransaction.price,
+    TradeTransaction.target_price,
+    TradeTransaction.amount,
+    TradeTransaction.account,
+    TradeTransaction.reason,
+    TradeTransaction.initial_stop_price,
+    TradeTransaction.projected_sell_price,
+)
+
+# Analyzer input order. Deterministic for same-day fills (the lot ledger relies on it)
+_TRADE_DATA_ORDER = (
+    TradeTransaction.trade_date,
+    TradeTransaction.action,
+    TradeTransaction.trade_type,
+    TradeTransaction.account,
+    TradeTransaction.id,
+)
+
+
 def get_raw_trade_data(symbol):
     if symbol.upper() in get_ignored_symbols():
         return []
     stmt = (
-        select(
-            TradeTransaction.id,
-            TradeTransaction.symbol,
-            TradeTransaction.action,
-            TradeTransaction.trade_type,
-            TradeTransaction.label,
-            TradeTransaction.trade_date,
-            TradeTransaction.expiration_date,
-            TradeTransaction.quantity,
-            TradeTransaction.price,
-            TradeTransaction.target_price,
-            TradeTransaction.amount,
-            TradeTransaction.account,
-            TradeTransaction.reason,
-            TradeTransaction.initial_stop_price,
-            TradeTransaction.projected_sell_price,
-        )
+        select(*_TRADE_DATA_COLUMNS)
         .where(
             TradeTransaction.symbol == symbol,
             TradeTransaction.action.in_(common_actions),
         )
-        .order_by(
-            TradeTransaction.trade_date,
-            TradeTransaction.action,
-            TradeTransaction.trade_type,
-            TradeTransaction.account,
-        )
+        .order_by(*_TRADE_DATA_ORDER)
     )
     return db.session.execute(stmt).mappings().all()
 
 
+def iter_trade_data_by_symbol(batch_size=1000):
+    """Yields (symbol, transactions) for every traded symbol, in symbol order.
+
+    One ordered query over all non-ignored symbols, grouped by symbol as the
+    rows stream in — each group is the same list get_trade_data_for_analysis
+    returns for that symbol.
+    """
+    stmt = (
+        select(*_TRADE_DATA_COLUMNS)
+        .where(
+            TradeTransaction.symbol.notin_(get_ignored_symbols()),
+            TradeTransaction.action.in_(common_actions),
+        )
+        .order_by(TradeTransaction.symbol, *_TRADE_DATA_ORDER)
+        .execution_options(yield_per=batch_size)
+    )
+    rows = db.session.execute(stmt).mappings()
+    for symbol, group in groupby(rows, key=itemgetter("symbol")):
+        yield symbol, [dict(row) for row in group]
+
+
 def get_trade_data_for_analysis(stock_symbol):
     """Returns all trade transactions for a given stock symbol."""
     return [dict(row) for row in get_raw_trade_data(stock_symbol)]
@@ -262,3 +293,14 @@ def get_all_traded_symbols():
         .order_by(TradeTransaction.symbol)
     )
     return [row[0] for row in db.session.execute(stmt).all()]
+
+
+def get_symbol_versions(symbols=None):
+    """Returns {symbol: version} from symbol_version (all symbols if None).
+
+    Symbols that never had a trade row are absent.
+    """
+    stmt = select(SymbolVersion.symbol, SymbolVersion.version)
+    if symbols is not None:
+        stmt = stmt.where(SymbolVersion.symbol.in_(symbols))
+    return dict(db.session.execute(stmt).all())
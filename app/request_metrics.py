@@ -0,0 +1,115 @@
+"""
+Per-route latency: Server-Timing headers and Prometheus histograms.
+
+Every request opens a lib.request_timing tally. SQL statements run through
+SQLAlchemy (the repository layer) add to its "sql" time, TradingAnalyzer
+stages and derived views to "analysis", and Yahoo Finance calls to
+"yahoo". When the response goes out, the tally and the request's total
+time are
+
+- sent back as a Server-Timing header, so the browser's network panel
+  shows where a slow dashboard call went;
+- observed into this process's histograms, labelled by route template
+  (/api/trades/<string:scope>/json/<string:stock_symbol>, not the
+  concrete URL), which GET /api/debug/metrics renders for a Prometheus
+  scraper.
+
+Statements run on raw DatabaseInserter connections (the analysis, quote
+and lot-ledger tables) bypass SQLAlchemy and are not in "sql". A streamed
+response is measured up to the point its body starts streaming.
+"""
+import time
+
+from flask import g, request
+from sqlalchemy import event
+
+from lib import request_timing
+from lib.metrics import Registry
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "Time to build a response, by route template.",
+    ("method", "route", "status"),
+)
+CATEGORY_SECONDS = {
+    category: registry.histogram(
+        f"http_request_{category}_seconds",
+        f"Time per request spent in {category}, by route template.",
+        ("method", "route"),
+    )
+    for category in request_timing.CATEGORIES
+}
+
+# Route label for requests that matched no URL rule (404s)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def init_request_metrics(app, engine):
+    """Install the timing hooks on app and the SQL listeners on engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+    @app.before_request
+    def start_request_timing():
+        g.request_timing_token = request_timing.start()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_timing(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        timings = request_timing.current()
+        route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+
+        REQUEST_SECONDS.observe(
+            total, method=request.method, route=route, status=str(response.status_code)
+        )
+        for category, histogram in CATEGORY_SECONDS.items():
+            histogram.observe(timings.get(category, 0.0), method=request.method, route=route)
+
+        response.headers.add("Server-Timing", server_timing_header(total, timings))
+        return response
+
+    @app.teardown_request
+    def finish_request_timing(exc=None):
+        token = g.pop("request_timing_token", None)
+        if token is not None:
+            request_timing.finish(token)
+
+
+def server_timing_header(total, timings):
+    """Server-Timing value: the total, then each category that took time (ms)."""
+    entries = [f"total;dur={total * 1000:.1f}"]
+    entries += [
+        f"{category};dur={timings[category] * 1000:.1f}"
+        for category in request_timing.CATEGORIES
+        if category in timings
+    ]
+    return ", ".join(entries)
+
+
+def render_metrics():
+    """This process's histograms in the Prometheus text format."""
+    return registry.render()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    request_timing.record(request_timing.SQL, time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        started = conn.info["query_started"].pop()
+        request_timing.record(request_timing.SQL, time.perf_counter() - started)
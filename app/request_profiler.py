@@ -0,0 +1,128 @@
+"""
+Opt-in per-request profiling.
+
+With REQUEST_PROFILING=Y, a request sent with an `X-Profile: pstats` or
+`X-Profile: speedscope` header (see lib/profiling.py) runs under that
+profiler. The profile is saved to PROFILE_DIR (data/profiles by default),
+its file name comes back in an X-Profile-Id response header, and
+GET /api/debug/profiles lists and downloads the saved profiles. Only
+requests that pass the API key check are profiled, and only the newest
+PROFILE_KEEP profiles (100 by default) are kept. Both settings come from
+the app config or, failing that, the environment.
+
+When REQUEST_PROFILING is off the hooks are never installed, so ordinary
+requests don't even look at the header.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import g, request
+
+from lib.profiling import PROFILERS, prune_profiles
+
+log = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+DEFAULT_PROFILE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "profiles"
+)
+DEFAULT_PROFILE_KEEP = 100
+
+# Serializes file writes and pruning between request threads
+_save_lock = threading.Lock()
+
+
+def init_request_profiler(app):
+    """Install the profiling hooks on app (call only when profiling is enabled)."""
+    app.config.setdefault("PROFILE_DIR", os.environ.get("PROFILE_DIR", DEFAULT_PROFILE_DIR))
+    app.config.setdefault("PROFILE_KEEP", _env_int("PROFILE_KEEP", DEFAULT_PROFILE_KEEP))
+    os.makedirs(app.config["PROFILE_DIR"], exist_ok=True)
+    log.warning(f"Request profiling enabled; profiles go to {app.config['PROFILE_DIR']}")
+
+    @app.before_request
+    def start_request_profile():
+        kind = request.headers.get(PROFILE_HEADER)
+        if not kind:
+            return
+        from .routes.api_routes import valid_api_key
+        if kind not in PROFILERS or not valid_api_key(request):
+            log.info(f"[profile] Ignoring {PROFILE_HEADER}: {kind!r} on {request.path}")
+            return
+        profiler_class, suffix = PROFILERS[kind]
+        profiler = profiler_class()
+        try:
+            profiler.start()
+        except ValueError as e:
+            # Only one cProfile can be active per process (Python 3.12+)
+            log.warning(f"[profile] Not profiling {request.path}: {e}")
+            return
+        g.request_profile = (profiler, suffix, time.perf_counter())
+
+    @app.after_request
+    def save_request_profile(response):
+        profile = g.pop("request_profile", None)
+        if profile is None:
+            return response
+        profiler, suffix, started = profile
+        profiler.stop()
+        name = profile_name(request.method, request.path, suffix)
+        with _save_lock:
+            profiler.save(
+                os.path.join(app.config["PROFILE_DIR"], name),
+                name=f"{request.method} {request.full_path}",
+            )
+            prune_profiles(app.config["PROFILE_DIR"], app.config["PROFILE_KEEP"])
+        log.info(
+            f"[profile] {request.method} {request.path} took "
+            f"{time.perf_counter() - started:.3f}s, saved {name}"
+        )
+        response.headers[PROFILE_ID_HEADER] = name
+        return response
+
+    @app.teardown_request
+    def stop_request_profile(exc=None):
+        # Reached with a profile still running only if the view raised
+        profile = g.pop("request_profile", None)
+        if profile is not None:
+            profile[0].stop()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        log.warning(f"Ignoring non-integer {name}={os.environ[name]!r}")
+        return default
+
+
+def profile_name(method, path, suffix):
+    """A sortable, filesystem-safe file name for a request's profile."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:80] or "root"
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    return f"{stamp}-{method}-{slug}{suffix}"
+
+
+def list_profiles(directory):
+    """[{"name", "format", "bytes", "created"}] for the saved profiles, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    formats = {suffix: kind for kind, (_, suffix) in PROFILERS.items()}
+    profiles = []
+    for entry in os.scandir(directory):
+        kind = next((k for suffix, k in formats.items() if entry.name.endswith(suffix)), None)
+        if kind is None or not entry.is_file():
+            continue
+        stat = entry.stat()
+        profiles.append({
+            "name": entry.name,
+            "format": kind,
+            "bytes": stat.st_size,
+            "created": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+        })
+    return sorted(profiles, key=lambda p: p["name"], reverse=True)
@@ -1,9 +1,10 @@
 # app/routes/api_routes.py
 import os
+import json
 import logging
 from datetime import datetime
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, send_from_directory
 from app.utils import filter_symbols
 from lib.yfinance import YahooFinance, get_quote, extract_price
 from lib.option_utils import label_to_occ
@@ -15,21 +16,36 @@ log = logging.getLogger(__name__)
 from ..models.models import TradeTransaction
 from ..repositories.trade_repository import (
     get_all_securities,
-    get_all_traded_symbols,
     get_current_holdings,
     get_current_holdings_symbols,
     get_trade_data_for_analysis,
 )
 from ..extensions import db
-from ..services.trade_service import validate_trade_update, validate_positions_params
+from ..services.trade_service import (
+    DEFAULT_PAGE_LIMIT,
+    page_trade_rows,
+    validate_date_range,
+    validate_page_params,
+    validate_positions_params,
+    validate_trade_update,
+)
 from ..services.analysis_service import (
     analyze_symbol,
     analyze_symbol_safe,
-    clear_analysis_cache,
+    get_realized_pnl_buckets,
+    profile_symbol,
+    refresh_after_edit,
+    stale_realized_pnl_symbols,
+    stream_symbol_analysis,
 )
+from ..services.dashboard_service import build_dashboard_summary
 from ..services.holdings_service import build_holdings
+from ..request_metrics import render_metrics
+from ..request_profiler import list_profiles
 from ..services.sync_service import start_sync, get_job_status
 from lib.schwab_transactions import get_last_sync
+from lib.analysis_profile import stage_stats
+from lib.request_timing import YAHOO, timed
 
 
 # TODO Add proper authentication
@@ -121,32 +137,38 @@ def get_positions_json(scope, stock_symbol):
                     When set to 'stock' or 'option', only that section is included in the
                     response. The frontend exposes this via a green toggle button group
                     in the navbar, passed as a query parameter (e.g. ?asset_type=stock).
+        stream: When '1' or 'true', the JSON is streamed in chunks as it is encoded
+                instead of built in memory first — for symbols with very many fills.
+                The document is the same apart from key order. Ignored when paging.
+        limit, after, before: Cursor pagination. Each section's all_trades is cut to
+                at most `limit` buys (each with its applied sells), ordered by
+                (trade_date, id); `after`/`before` take a section's page.next_cursor /
+                page.prev_cursor. Summaries still cover the whole filtered set.
     """
 
     after_date = request.args.get("after_date")
     account = request.args.get("account")
     asset_type = request.args.get("asset_type", "all")
+    stream = request.args.get("stream", "").lower() in ("1", "true")
+    limit = request.args.get("limit")
+    after = request.args.get("after")
+    before = request.args.get("before")
 
     error = validate_positions_params(
         scope, after_date=after_date, account=account, asset_type=asset_type
-    )
+    ) or validate_page_params(limit=limit, after=after, before=before)
     if error:
         return jsonify({"error": error}), 400
+    paged = bool(limit or after or before)
 
     log.info(f"[{stock_symbol}] Getting {scope.capitalize()} Positions JSON"
              + (f" after_date={after_date}" if after_date else "")
              + (f" account={account}" if account else "")
-             + (f" asset_type={asset_type}" if asset_type != "all" else ""))
+             + (f" asset_type={asset_type}" if asset_type != "all" else "")
+             + (" (streamed)" if stream else ""))
 
     trade_record = {
         "stock_symbol": stock_symbol,
-        "transaction_stats": analyze_symbol(
-            stock_symbol,
-            status=scope,
-            account=account,
-            after_date=after_date,
-            asset_type=asset_type,
-        ),
         "requested": f"{scope}_trades",
     }
 
@@ -159,8 +181,41 @@ def get_positions_json(scope, stock_symbol):
         if asset_type != "all":
             trade_record["filters"]["asset_type"] = asset_type
 
+    analysis_args = dict(
+        status=scope, account=account, after_date=after_date, asset_type=asset_type
+    )
+    if stream and not paged:
+        chunks = stream_symbol_analysis(stock_symbol, **analysis_args)
+        return Response(_stream_trade_record(trade_record, chunks), mimetype="application/json")
+
+    transaction_stats = None
+    if paged and not (account or after_date):
+        # A page is cut from the symbol's whole analysis (a lot depends on
+        # every earlier fill), so take it from the cache rather than rerun it
+        cached = analyze_symbol_safe(stock_symbol, status=scope)
+        if cached is not None:
+            transaction_stats = {
+                security_type: dict(section) for security_type, section in cached.items()
+                if asset_type in ("all", security_type)
+            }
+    if transaction_stats is None:
+        transaction_stats = analyze_symbol(stock_symbol, **analysis_args)
+    if paged:
+        page_limit = int(limit) if limit else DEFAULT_PAGE_LIMIT
+        for section in transaction_stats.values():
+            section["all_trades"], section["page"] = page_trade_rows(
+                section["all_trades"], page_limit, after=after, before=before
+            )
+    trade_record["transaction_stats"] = transaction_stats
     return jsonify(trade_record)
 
+
+def _stream_trade_record(trade_record, stats_chunks):
+    """Yield trade_record as JSON with the streamed analysis as transaction_stats."""
+    yield json.dumps(trade_record)[:-1] + ', "transaction_stats": '
+    yield from stats_chunks
+    yield "}"
+
 @api_bp.route("/trade/update/<int:transaction_id>", methods=["PATCH"])
 def update_trade(transaction_id):
     """Update user-editable fields on a trade transaction (reason, initial_stop_price, projected_sell_price)."""
@@ -188,8 +243,9 @@ def update_trade(transaction_id):
         return jsonify({"error": "No valid fields to update"}), 400
 
     db.session.commit()
-    # Field edits don't change the cache's data-version token — clear explicitly
-    clear_analysis_cache()
+    # The edit bumped the symbol's version; catch its lot ledger and
+    # realized P&L up here rather than on the read path
+    refresh_after_edit([trade.symbol])
     log.info(f"[update_trade] Updated trade {transaction_id}: {updated}")
     return jsonify({"success": True, "updated": updated}), 200
 
@@ -258,7 +314,8 @@ def get_ticker_history(symbol):
     prices = []
     try:
         ticker = yf_lib.Ticker(symbol)
-        hist = ticker.history(period=period, interval=interval)
+        with timed(YAHOO):
+            hist = ticker.history(period=period, interval=interval)
         for date, row in hist.iterrows():
             prices.append({
                 "date": date.strftime("%Y-%m-%d"),
@@ -296,167 +353,150 @@ def get_ticker_history(symbol):
     return jsonify({"symbol": symbol, "prices": prices, "trades": trades})
 
 
-def _build_symbol_stats(symbol, scope="closed"):
-    """Run the analysis pipeline for a symbol and return serializable stats for stock and option."""
-    data = analyze_symbol_safe(symbol, status=scope)
-    if data is None:
-        return None
-
-    result = {}
-    for asset_type in ("stock", "option"):
-        sec = data.get(asset_type, {})
-        if not sec.get("has_trades"):
-            continue
-        summary = sec.get("summary", {})
-        result[asset_type] = {
-            "winning_trades_count": summary.get("winning_trades_count", 0) or 0,
-            "losing_trades_count": summary.get("losing_trades_count", 0) or 0,
-            "batting_average": summary.get("batting_average", 0.0) or 0.0,
-            "profit_loss": summary.get("profit_loss", 0.0) or 0.0,
-            "percent_profit_loss": summary.get("percent_profit_loss", 0.0) or 0.0,
-        }
-    return result if result else None
-
-
 @api_bp.route("/dashboard/summary")
 def get_dashboard_summary():
     """Aggregate win/loss and P&L stats across all symbols (closed trades only)."""
-    # Build a name lookup from the security table
-    name_map = {symbol: name for symbol, name in get_all_securities()}
-    symbols = get_all_traded_symbols()
-
-    total_wins = 0
-    total_losses = 0
-    total_pnl = 0.0
-    by_symbol = []
-
-    for symbol in symbols:
-        stats = _build_symbol_stats(symbol, scope="closed")
-        if stats is None:
-            continue
-
-        symbol_wins = sum(s["winning_trades_count"] for s in stats.values())
-        symbol_losses = sum(s["losing_trades_count"] for s in stats.values())
-        symbol_pnl = sum(s["profit_loss"] for s in stats.values())
-
-        total_wins += symbol_wins
-        total_losses += symbol_losses
-        total_pnl += symbol_pnl
-
-        total_decided = symbol_wins + symbol_losses
-        by_symbol.append({
-            "symbol": symbol,
-            "name": name_map.get(symbol, ""),
-            "stock": stats.get("stock"),
-            "option": stats.get("option"),
-            "combined": {
-                "winning_trades_count": symbol_wins,
-                "losing_trades_count": symbol_losses,
-                "batting_average": round(symbol_wins / total_decided, 3) if total_decided else 0.0,
-                "profit_loss": round(symbol_pnl, 2),
-            },
-        })
-
-    total_decided = total_wins + total_losses
-    overall = {
-        "total_realized_pnl": round(total_pnl, 2),
-        "total_winning_trades": total_wins,
-        "total_losing_trades": total_losses,
-        "batting_average": round(total_wins / total_decided, 3) if total_decided else 0.0,
-        "symbols_traded": len(by_symbol),
-    }
+    return jsonify(build_dashboard_summary())
+
 
-    log.info(f"[dashboard/summary] {len(by_symbol)} symbols, overall: {overall}")
-    return jsonify({"overall": overall, "by_symbol": by_symbol})
+@api_bp.route("/debug/analysis_profile")
+def get_analysis_profile_stats():
+    """This worker's analysis stage totals, with the slowest symbols.
+
+    ?top=N limits the symbol list; ?reset=1 starts the totals over after
+    returning them.
+    """
+    top = request.args.get("top", "20")
+    if not top.isdigit():
+        return jsonify({"error": "top must be a non-negative integer"}), 400
+    snapshot = stage_stats.snapshot(top=int(top))
+    if request.args.get("reset") == "1":
+        stage_stats.reset()
+    return jsonify(snapshot)
+
+
+@api_bp.route("/debug/metrics")
+def get_metrics():
+    """This worker's request latency histograms, in the Prometheus text format."""
+    return Response(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@api_bp.route("/debug/profiles")
+def get_request_profiles():
+    """Saved request profiles (REQUEST_PROFILING=Y), newest first."""
+    if not current_app.config.get("REQUEST_PROFILING"):
+        return jsonify({"error": "Request profiling is disabled"}), 404
+    return jsonify({"profiles": list_profiles(current_app.config["PROFILE_DIR"])})
+
+
+@api_bp.route("/debug/profiles/<path:name>")
+def download_request_profile(name):
+    """Download one saved profile (.pstats or .speedscope.json)."""
+    if not current_app.config.get("REQUEST_PROFILING"):
+        return jsonify({"error": "Request profiling is disabled"}), 404
+    # send_from_directory refuses names that escape PROFILE_DIR
+    return send_from_directory(current_app.config["PROFILE_DIR"], name, as_attachment=True)
+
+
+@api_bp.route("/debug/analysis_profile/<string:symbol>")
+def get_analysis_profile(symbol):
+    """Analyze one symbol uncached and return the time spent in each stage."""
+    status = request.args.get("status", "all")
+    if status not in ("all", "open", "closed"):
+        return jsonify({"error": "status must be 'all', 'open' or 'closed'"}), 400
+    symbol = symbol.upper()
+    try:
+        profile = profile_symbol(symbol, status=status)
+    except Exception as e:
+        log.warning(f"[debug/analysis_profile] {symbol} failed: {e}")
+        return jsonify({"symbol": symbol, "error": str(e)}), 500
+    log.info(f"[debug/analysis_profile] {symbol}: {profile['total_seconds']:.3f}s")
+    return jsonify(profile)
 
 
 @api_bp.route("/dashboard/pnl_over_time")
 def get_pnl_over_time():
-    """Monthly and quarterly P&L aggregates across all closed trades.
+    """Realized P&L aggregates across all closed trades, per period.
+
+    Served from the realized_pnl_daily table as the last sync or edit left
+    it, so each period is one GROUP BY and the request never writes. If
+    trades changed since, the response carries an X-Realized-PnL-Stale
+    header with the number of symbols behind.
 
-    Optional query param:
+    Optional query params:
         asset_type: 'all' (default), 'stock', or 'option'
+        periods: Comma-separated subset of day, week, month, quarter, year
+                 (default: month,quarter). Each adds a list keyed daily,
+                 weekly, monthly, quarterly or yearly.
+        start, end: Inclusive close-date range (YYYY-MM-DD)
     """
     asset_type = request.args.get("asset_type", "all")
-    error = validate_positions_params("all", asset_type=asset_type)
+    start = request.args.get("start")
+    end = request.args.get("end")
+    periods = [p.strip() for p in request.args.get("periods", "month,quarter").split(",") if p.strip()]
+
+    error = validate_positions_params("all", asset_type=asset_type) or validate_date_range(start, end)
+    if not error and (not periods or any(p not in PNL_PERIODS for p in periods)):
+        error = f"periods must be a comma-separated subset of {list(PNL_PERIODS)}"
     if error:
         return jsonify({"error": error}), 400
 
-    symbols = get_all_traded_symbols()
     security_types = ["stock", "option"] if asset_type == "all" else [asset_type]
 
-    # Collect all closed buy trades across all symbols
-    monthly = {}   # key: "YYYY-MM"
-    quarterly = {} # key: "YYYY-QN"
-
-    for symbol in symbols:
-        data = analyze_symbol_safe(symbol, status="closed")
-        if data is None:
-            continue
-
-        for sec_type in security_types:
-            sec = data.get(sec_type, {})
-            if not sec.get("has_trades"):
-                continue
-            for trade in sec.get("all_trades", []):
-                if not trade.get("is_buy_trade") or not trade.get("is_done"):
-                    continue
-                closed_date = trade.get("closed_date")
-                if not closed_date:
-                    continue
-
-                try:
-                    close_dt = datetime.fromisoformat(closed_date)
-                except (ValueError, TypeError):
-                    continue
-
-                pnl = trade.get("current_profit_loss", 0.0) or 0.0
-                pnl_pct = trade.get("current_percent_profit_loss", 0.0) or 0.0
-                is_win = pnl > 0
-
-                month_key = close_dt.strftime("%Y-%m")
-                q_num = (close_dt.month - 1) // 3 + 1
-                quarter_key = f"{close_dt.year}-Q{q_num}"
-
-                for bucket_key, buckets in ((month_key, monthly), (quarter_key, quarterly)):
-                    if bucket_key not in buckets:
-                        buckets[bucket_key] = {
-                            "winning_trades": 0,
-                            "losing_trades": 0,
-                            "pnl_dollars": 0.0,
-                            "pnl_pct_sum": 0.0,
-                            "trade_count": 0,
-                        }
-                    b = buckets[bucket_key]
-                    b["winning_trades"] += 1 if is_win else 0
-                    b["losing_trades"] += 0 if is_win else 1
-                    b["pnl_dollars"] += pnl
-                    b["pnl_pct_sum"] += pnl_pct
-                    b["trade_count"] += 1
-
-    def _format_bucket(key, b, is_quarterly):
+    def _format_bucket(period, b):
         decided = b["winning_trades"] + b["losing_trades"]
-        avg_pct = round(b["pnl_pct_sum"] / b["trade_count"], 2) if b["trade_count"] else 0.0
-        if is_quarterly:
-            year, q = key.split("-")
-            label = f"{q} {year}"
-        else:
-            label = datetime.strptime(key, "%Y-%m").strftime("%b %Y")
+        key = b["period"]
         return {
             "period": key,
-            "label": label,
+            "label": _pnl_period_label(period, key),
             "winning_trades": b["winning_trades"],
             "losing_trades": b["losing_trades"],
             "batting_average": round(b["winning_trades"] / decided, 3) if decided else 0.0,
             "pnl_dollars": round(b["pnl_dollars"], 2),
-            "pnl_pct_avg": avg_pct,
+            "pnl_pct_avg": round(b["pnl_pct_sum"] / b["trade_count"], 2) if b["trade_count"] else 0.0,
         }
 
-    monthly_list = [_format_bucket(k, v, False) for k, v in sorted(monthly.items())]
-    quarterly_list = [_format_bucket(k, v, True) for k, v in sorted(quarterly.items())]
-
-    log.info(f"[dashboard/pnl_over_time] {len(monthly_list)} months, {len(quarterly_list)} quarters")
-    return jsonify({"monthly": monthly_list, "quarterly": quarterly_list})
+    response = {}
+    for period in periods:
+        buckets = get_realized_pnl_buckets(period, security_types, start=start, end=end)
+        response[PNL_PERIODS[period]] = [_format_bucket(period, b) for b in buckets]
+
+    log.info("[dashboard/pnl_over_time] "
+             + ", ".join(f"{len(v)} {k}" for k, v in response.items()))
+    resp = jsonify(response)
+    stale = stale_realized_pnl_symbols()
+    if stale:
+        log.warning(f"[dashboard/pnl_over_time] {len(stale)} symbols changed since the last refresh")
+        resp.headers[REALIZED_PNL_STALE_HEADER] = str(len(stale))
+    return resp
+
+
+# pnl_over_time response header: symbols whose realized P&L lags their trades
+REALIZED_PNL_STALE_HEADER = "X-Realized-PnL-Stale"
+
+
+# pnl_over_time period -> response key
+PNL_PERIODS = {
+    "day": "daily",
+    "week": "weekly",
+    "month": "monthly",
+    "quarter": "quarterly",
+    "year": "yearly",
+}
+
+
+def _pnl_period_label(period, key):
+    """Display label for a realized-P&L bucket key (e.g. '2024-Q3' -> 'Q3 2024')."""
+    if period == "quarter":
+        year, q = key.split("-")
+        return f"{q} {year}"
+    if period == "month":
+        return datetime.strptime(key, "%Y-%m").strftime("%b %Y")
+    if period == "week":
+        return "Wk of " + datetime.strptime(key, "%Y-%m-%d").strftime("%b %d %Y")
+    if period == "day":
+        return datetime.strptime(key, "%Y-%m-%d").strftime("%b %d %Y")
+    return key
 
 
 @api_bp.route("/schwab/sync", methods=["POST"])
@@ -3,7 +3,7 @@ import logging
 from datetime import datetime, timedelta
 import pytz
 from flask import Blueprint, flash, redirect, render_template, request, url_for
-from sqlalchemy import select
+from sqlalchemy import func, select, tuple_
 from ..extensions import db
 from app.utils import SYMBOLS_TO_EXCLUDE, is_option_symbol
 from lib.trading_analyzer import TradingAnalyzer
@@ -13,8 +13,14 @@ log = logging.getLogger(__name__)
 
 from ..models.models import Security, TradeTransaction
 from ..repositories.trade_repository import get_trade_data_for_analysis, get_trade_stats_summary
-from ..services.trade_service import validate_trade_update
-from ..services.analysis_service import clear_analysis_cache
+from ..services.analysis_service import refresh_after_edit
+from ..services.trade_service import (
+    DEFAULT_PAGE_LIMIT,
+    decode_cursor,
+    encode_cursor,
+    validate_page_params,
+    validate_trade_update,
+)
 from lib.constants import Action
 from lib.ignore_symbols import get_ignored_symbols
 
@@ -86,8 +92,7 @@ def update_transaction(transaction_id):
 
     log.info(f"Committing the update for transaction id: {transaction_id}")
     db.session.commit()
-    # Field edits don't change the cache's data-version token — clear explicitly
-    clear_analysis_cache()
+    refresh_after_edit([transaction.symbol])
     flash("Transaction updated successfully!", "success")
     return redirect(url_for("web.view_transaction", transaction_id=transaction_id))
 
@@ -119,23 +124,64 @@ def recent_trades(days):
 
 @web_bp.route("/trades/<string:symbol>")
 def trades_by_symbol(symbol):
-    """Fetches all buy and sell transactions for the given symbol, ordered by trade date."""
+    """Fetches one page of buy and sell transactions for the given symbol, ordered by trade date.
+
+    Optional query parameters:
+        limit: Page size (default DEFAULT_PAGE_LIMIT)
+        after, before: Cursor of the page boundary, as linked from the page
+    """
 
     log.info(f"Inside Trades By Symbol route '/trades/{symbol}'")
     if symbol.upper() in get_ignored_symbols():
         return "Symbol not found", 404
-    stmt = (
-        select(TradeTransaction)
-        .where(
-            TradeTransaction.action.in_([Action.BUY, Action.REINVEST_SHARES, Action.SELL]),
-            TradeTransaction.symbol == symbol,
-        )
-        .order_by(TradeTransaction.trade_date)
+
+    limit = request.args.get("limit")
+    after = request.args.get("after")
+    before = request.args.get("before")
+    error = validate_page_params(limit=limit, after=after, before=before)
+    if error:
+        return error, 400
+    limit = int(limit) if limit else DEFAULT_PAGE_LIMIT
+
+    # Keyset pagination on (trade_date, id); 'before' walks backwards.
+    # trade_date is stored both as a bare date and as a timestamp, so it is
+    # compared through SQLite's datetime(), which reads either as
+    # 'YYYY-MM-DD HH:MM:SS'; a bound datetime compared to the raw text would
+    # skip the rest of a bare date.
+    trade_time = func.datetime(TradeTransaction.trade_date)
+    position = tuple_(trade_time, TradeTransaction.id)
+    stmt = select(TradeTransaction).where(
+        TradeTransaction.action.in_([Action.BUY, Action.REINVEST_SHARES, Action.SELL]),
+        TradeTransaction.symbol == symbol,
     )
-    transactions = db.session.execute(stmt).scalars().all()
+    cursor = after or before
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        cursor_position = tuple_(cursor_date.strftime("%Y-%m-%d %H:%M:%S"), cursor_id)
+        stmt = stmt.where(position > cursor_position if after else position < cursor_position)
+    if before:
+        stmt = stmt.order_by(trade_time.desc(), TradeTransaction.id.desc())
+    else:
+        stmt = stmt.order_by(trade_time, TradeTransaction.id)
+
+    # One extra row tells whether there is a further page in this direction
+    transactions = db.session.execute(stmt.limit(limit + 1)).scalars().all()
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
+    if before:
+        transactions.reverse()
     log.debug(f"/trades/symbol Transactions: {transactions}")
+
+    first, last = (transactions[0], transactions[-1]) if transactions else (None, None)
+    more_before = has_more if before else bool(after)
+    more_after = has_more if not before else True
     return render_template(
-        "trades_by_symbol.html", transactions=transactions, symbol=symbol
+        "trades_by_symbol.html",
+        transactions=transactions,
+        symbol=symbol,
+        limit=limit,
+        prev_cursor=encode_cursor(first.trade_date, first.id) if first and more_before else None,
+        next_cursor=encode_cursor(last.trade_date, last.id) if last and more_after else None,
     )
 
 
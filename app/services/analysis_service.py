@@ -1,44 +1,185 @@
 # app/services/analysis_service.py
 """Shared trade-analysis pipeline used by both API and web routes."""
+import hashlib
 import logging
+import os
+import sqlite3
 import threading
 import time
 
-from sqlalchemy import func, select
-
-from lib.trading_analyzer import TradingAnalyzer
+from flask import has_app_context
+from lib.analysis_cache import DEFAULT_MAX_BYTES, MISS, AnalysisCache
+from lib.db_utils import DatabaseInserter
+from lib.lot_ledger import LotLedger
+from lib.lot_matching import AllocationMismatchError
+from lib.portfolio_analysis import DEFAULT_MIN_PARALLEL, analyze_groups, analyze_transactions
+from lib.realized_pnl import RealizedPnl, daily_rows
+from lib.request_timing import ANALYSIS, timed
+from lib.trading_analyzer import TradingAnalyzer, derive_profit_loss_view
 from app.extensions import db
-from app.models.models import TradeTransaction
-from app.repositories.trade_repository import get_trade_data_for_analysis
+from app.repositories.trade_repository import (
+    get_symbol_versions,
+    get_trade_data_for_analysis,
+    iter_trade_data_by_symbol,
+)
 
 log = logging.getLogger(__name__)
 
-# In-process cache for analyze_symbol_safe. Entries are validated against a
-# data-version token (MAX(id), COUNT(*)) so any insert — including from the
-# external Schwab sync process — invalidates the whole cache on the next
-# request. Trade-field edits don't change the token, so the update routes call
-# clear_analysis_cache() explicitly. The TTL is a backstop for edits made
-# directly in SQLite outside the app.
+# Two-level cache for analyze_symbol_safe / analyze_portfolio: an in-process
+# dict in front of the analysis_cache table every gunicorn worker shares, so a
+# cold worker reads what another worker computed. Entries are keyed by the
+# symbol's version in symbol_version, which database triggers bump on every
+# insert, update or delete of one of its trade rows — including writes from
+# the external Schwab sync process and edits from the UI — so a change only
+# invalidates that symbol. The TTL is a backstop for anything the version
+# doesn't capture (e.g. a change to the ignored-symbols list).
 CACHE_TTL_SECONDS = 30 * 60
 
+# Statuses the UI asks for (holdings: open, dashboard: closed, trade pages: all)
+WARM_STATUSES = ("open", "closed", "all")
+
+# Status filters only pick which matched buys a result shows, so each symbol
+# is analyzed (converted, sorted, matched) once, unfiltered, and cached under
+# this status in both cache levels. Other statuses are derived from it with
+# derive_profit_loss_view and kept in the in-process cache only.
+MATCHED_STATUS = "all"
+
+# Cache status suffix for summary-only results, e.g. "closed:summary" (see
+# analyze_portfolio). Summary callers are served and cached from these
+# alone, in both cache levels, never from a full result built for them.
+SUMMARY_VIEW = ":summary"
+
+# analysis_cache row listing the symbols an analyze_portfolio run covered
+PORTFOLIO_KEY = "*"
+
+# analysis_cache status of the portfolio-wide aggregates (see cached_aggregate)
+AGGREGATE_STATUS = "aggregate"
+
 _cache_lock = threading.Lock()
-_cache = {}            # (symbol, status) -> (result, cached_at)
-_cache_version = None  # data-version token the current entries were built from
+_cache = {}              # (symbol, status) -> (result, cached_at, version)
+_portfolio_symbols = {}  # status -> (portfolio version, symbols)
+
 
+def _symbol_versions(symbols=None):
+    """{symbol: version token}; symbols without trade rows are absent (version '0')."""
+    return {symbol: str(version) for symbol, version in get_symbol_versions(symbols).items()}
 
-def _data_version():
-    """Cheap token that changes whenever trade rows are inserted or deleted."""
-    return db.session.execute(
-        select(func.max(TradeTransaction.id), func.count(TradeTransaction.id))
-    ).one()
+
+def _portfolio_version(versions):
+    """Token that changes when any symbol's version does, or symbols come and go."""
+    digest = hashlib.sha1()
+    for symbol, version in sorted(versions.items()):
+        digest.update(f"{symbol}={version};".encode())
+    return digest.hexdigest()
 
 
 def clear_analysis_cache():
-    """Drop all cached analysis results (call after mutating trade rows)."""
-    global _cache_version
+    """Drop all cached analysis results.
+
+    Edits no longer need this — symbol versions invalidate them. Outside an
+    app context (at startup) only this process's entries go.
+    """
     with _cache_lock:
         _cache.clear()
-        _cache_version = None
+        _portfolio_symbols.clear()
+    if has_app_context():
+        try:
+            with DatabaseInserter(db=db) as conn:
+                AnalysisCache(conn).clear()
+        except sqlite3.Error as e:
+            log.warning(f"[analysis_cache] Could not clear the shared cache: {e}")
+
+
+def _cache_get(symbol, status, version, now):
+    """In-process cached result, or MISS. Caller holds _cache_lock."""
+    entry = _cache.get((symbol, status))
+    if entry is None or entry[2] != version or now - entry[1] >= CACHE_TTL_SECONDS:
+        return MISS
+    return entry[0]
+
+
+def _shared_get(versions, status):
+    """Results from the shared analysis_cache table; {} if it can't be read."""
+    try:
+        with DatabaseInserter(db=db) as conn:
+            return AnalysisCache(conn).get_many(versions, status, max_age=CACHE_TTL_SECONDS)
+    except sqlite3.Error as e:
+        log.warning(f"[analysis_cache] Shared cache unavailable: {e}")
+        return {}
+
+
+def _shared_put(entries, status):
+    """Publish {symbol: (version, result)} to the other workers (best effort)."""
+    try:
+        with DatabaseInserter(db=db) as conn:
+            AnalysisCache(
+                conn, max_bytes=_env_int("ANALYSIS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+            ).put_many(entries, status)
+    except sqlite3.Error as e:
+        log.warning(f"[analysis_cache] Could not write the shared cache: {e}")
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        log.warning(f"Ignoring non-integer {name}={os.environ[name]!r}")
+        return default
+
+
+def _run_analyzer(symbol, status="all", account=None, after_date=None):
+    """Fetch a symbol's trade rows and analyze them against its lot ledger.
+
+    The ledger's allocations are applied instead of re-matching the whole
+    history; rows added since it was last extended are matched in memory
+    (LotLedger.read never writes, so a read request takes no write lock).
+    Falls back to the object engine if the ledger can't be used.
+    Returns None for a symbol with no transactions.
+    """
+    with DatabaseInserter(db=db) as conn:
+        try:
+            allocations = LotLedger(conn).read(symbol)
+        except sqlite3.Error as e:
+            log.warning(f"[{symbol}] Lot ledger unavailable, matching in full: {e}")
+            allocations = None
+
+    transactions = get_trade_data_for_analysis(symbol)
+    if not transactions:
+        return None
+
+    try:
+        return analyze_transactions(
+            symbol, transactions, allocations,
+            status=status, account=account, after_date=after_date,
+        )
+    except AllocationMismatchError as e:
+        # Rows changed between reading the ledger and the rows; the next
+        # write-side extend_lot_ledger brings the ledger up to date
+        log.info(f"[{symbol}] Lot ledger out of date ({e}), matching in full")
+        return analyze_transactions(
+            symbol, transactions, None,
+            status=status, account=account, after_date=after_date,
+        )
+
+
+def extend_lot_ledger(symbols=None):
+    """Bring the lot ledger up to date for symbols (all if None); best effort.
+
+    For the write side — after a sync or a trade edit — so read requests
+    find a current ledger. Returns False if the ledger couldn't be extended.
+    """
+    try:
+        with DatabaseInserter(db=db) as conn:
+            ledger = LotLedger(conn)
+            if symbols is None:
+                ledger.extend_all()
+            else:
+                for symbol in symbols:
+                    ledger.extend(symbol)
+    except sqlite3.Error as e:
+        log.warning(f"[lot_ledger] Could not extend the lot ledger: {e}")
+        return False
+    return True
 
 
 def analyze_symbol(symbol, status="all", account=None, after_date=None, asset_type="all"):
@@ -48,12 +189,45 @@ def analyze_symbol(symbol, status="all", account=None, after_date=None, asset_ty
     Raises on invalid input or malformed trade data — use analyze_symbol_safe
     when looping across many symbols.
     """
-    transactions = get_trade_data_for_analysis(symbol)
-    analyzer = TradingAnalyzer(symbol, transactions)
-    analyzer.analyze_trades(status=status, account=account, after_date=after_date)
+    analyzer = _analyzer_for(symbol, status=status, account=account, after_date=after_date)
     return analyzer.get_profit_loss_data_json(asset_type=asset_type)
 
 
+def stream_symbol_analysis(symbol, status="all", account=None, after_date=None, asset_type="all"):
+    """analyze_symbol, returning the result as an iterator of JSON text chunks.
+
+    The analysis itself runs before this returns, so bad input still raises
+    here; only the serialization is deferred until the chunks are consumed.
+    """
+    analyzer = _analyzer_for(symbol, status=status, account=account, after_date=after_date)
+    return analyzer.iter_profit_loss_data_json(asset_type=asset_type)
+
+
+def profile_symbol(symbol, status="all"):
+    """Analyze a symbol now, bypassing the caches, and report its stage timings.
+
+    Returns {"symbol", "status", "trades", "total_seconds", "stages"}; the
+    run is also added to this process's stage_stats. Raises like
+    analyze_symbol.
+    """
+    analyzer = _analyzer_for(symbol, status=status)
+    analyzer.get_profit_loss_data_json()
+    return {
+        "symbol": symbol,
+        "status": status,
+        "trades": len(analyzer.trade_transactions),
+        **analyzer.timings.as_dict(),
+    }
+
+
+def _analyzer_for(symbol, status="all", account=None, after_date=None):
+    analyzer = _run_analyzer(symbol, status=status, account=account, after_date=after_date)
+    if analyzer is None:
+        analyzer = TradingAnalyzer(symbol, [])
+        analyzer.analyze_trades(status=status, account=account, after_date=after_date)
+    return analyzer
+
+
 def analyze_symbol_safe(symbol, status="all"):
     """analyze_symbol variant for cross-symbol loops, with caching.
 
@@ -62,39 +236,298 @@ def analyze_symbol_safe(symbol, status="all"):
     Results are cached per (symbol, status); callers must treat the returned
     dict as read-only.
     """
-    global _cache_version
-    key = (symbol, status)
     now = time.monotonic()
-    version = _data_version()
+    version = _symbol_versions([symbol]).get(symbol, "0")
+
+    with _cache_lock:
+        result = _cache_get(symbol, status, version, now)
+    if result is not MISS:
+        return result
+
+    result = _matched_result(symbol, version, now)
+    if result is MISS:
+        return None
+    return _status_view(symbol, status, version, result, now)
+
 
+def _matched_result(symbol, version, now):
+    """A symbol's unfiltered result from either cache level, or analyzed now.
+
+    Returns MISS if the analysis failed; transient failures are not cached.
+    """
+    key = (symbol, MATCHED_STATUS)
     with _cache_lock:
-        if version != _cache_version:
-            _cache.clear()
-            _cache_version = version
-        entry = _cache.get(key)
-        if entry is not None and now - entry[1] < CACHE_TTL_SECONDS:
-            return entry[0]
+        result = _cache_get(symbol, MATCHED_STATUS, version, now)
+    if result is not MISS:
+        return result
+
+    shared = _shared_get({symbol: version}, MATCHED_STATUS)
+    if symbol in shared:
+        result = shared[symbol]
+        with _cache_lock:
+            _cache[key] = (result, now, version)
+        return result
 
     try:
-        transactions = get_trade_data_for_analysis(symbol)
-        if not transactions:
-            result = None  # cached too — no point re-querying empty symbols
-        else:
-            analyzer = TradingAnalyzer(symbol, transactions)
-            analyzer.analyze_trades(status=status)
-            result = analyzer.get_profit_loss_data_json()
+        analyzer = _run_analyzer(symbol, status=MATCHED_STATUS)
+        # An empty symbol is cached too — no point re-querying it
+        result = analyzer.get_profit_loss_data_json() if analyzer else None
     except Exception as e:
-        # Transient failures are not cached
         log.warning(f"[analyze_symbol_safe] Skipping {symbol}: {e}")
-        return None
+        return MISS
 
+    # Stored under the version read up front: if the rows changed mid-run,
+    # the next call sees a newer version and recomputes
     with _cache_lock:
-        # Only store if the data hasn't shifted underneath us mid-computation
-        if version == _cache_version:
-            _cache[key] = (result, now)
+        _cache[key] = (result, now, version)
+    _shared_put({symbol: (version, result)}, MATCHED_STATUS)
     return result
 
 
+def _status_view(symbol, status, version, result, now):
+    """The status view of a symbol's unfiltered result, cached in-process."""
+    if result is None or status == MATCHED_STATUS:
+        return result
+    with _cache_lock:
+        view = _cache_get(symbol, status, version, now)
+    if view is MISS:
+        with timed(ANALYSIS):
+            view = derive_profit_loss_view(result, status=status)
+        with _cache_lock:
+            _cache[(symbol, status)] = (view, now, version)
+    return view
+
+
+def analyze_portfolio(status="all", summary_only=False):
+    """Analyze every traded symbol in one pass.
+
+    Returns {symbol: result} in symbol order, where each result is what
+    analyze_symbol_safe(symbol, status) returns; symbols without a result are
+    left out. Instead of a version check, a trade query and a ledger read
+    per symbol, this reads every symbol version in one query, reads the lot
+    ledger for all symbols at once (without writing), and streams every
+    trade row in a single ordered query. Only symbols whose version changed
+    are re-analyzed; results share analyze_symbol_safe's cache, and a repeat
+    call on unchanged data is served from it without the scan. Every status
+    is derived from the same unfiltered results.
+
+    With summary_only, results have each section's has_trades and summary
+    but no all_trades list — all an aggregate of the summaries needs. These
+    are analyzed for `status` directly, without building per-trade rows,
+    and only the summaries are cached (under status + SUMMARY_VIEW); a full
+    result this process already holds is summarized instead.
+    """
+    now = time.monotonic()
+    versions = _symbol_versions()
+    if summary_only:
+        return _portfolio_results(versions, now, status, summary_only=True)
+    results = _portfolio_results(versions, now, MATCHED_STATUS)
+    return {
+        symbol: _status_view(symbol, status, versions.get(symbol, "0"), result, now)
+        for symbol, result in results.items()
+    }
+
+
+def _portfolio_results(versions, now, status, summary_only=False):
+    """analyze_portfolio's results for status, from the caches or the scan.
+
+    Full results are always status MATCHED_STATUS; summary-only results are
+    cached under status + SUMMARY_VIEW.
+    """
+    cache_status = status + SUMMARY_VIEW if summary_only else status
+    portfolio_version = _portfolio_version(versions)
+
+    with _cache_lock:
+        entry = _portfolio_symbols.get(cache_status)
+        if entry is not None and entry[0] == portfolio_version:
+            results = {
+                symbol: _cache_get(symbol, cache_status, versions.get(symbol, "0"), now)
+                for symbol in entry[1]
+            }
+            if all(result is not MISS for result in results.values()):
+                return results
+
+    # A cold worker picks up a portfolio another worker already analyzed
+    shared = _shared_get({**versions, PORTFOLIO_KEY: portfolio_version}, cache_status)
+    symbols = shared.pop(PORTFOLIO_KEY, None)
+    if symbols is not None and all(symbol in shared for symbol in symbols):
+        results = {symbol: shared[symbol] for symbol in symbols}
+        _store_portfolio(results, cache_status, versions, portfolio_version, now)
+        return results
+
+    with DatabaseInserter(db=db) as conn:
+        try:
+            allocations = LotLedger(conn).read_all()
+        except sqlite3.Error as e:
+            log.warning(f"[analyze_portfolio] Lot ledger unavailable, matching in full: {e}")
+            allocations = {}
+
+    cached = {}
+    computed = {}
+    stale_ledger = []
+
+    def pending_groups():
+        for symbol, transactions in iter_trade_data_by_symbol():
+            version = versions.get(symbol, "0")
+            with _cache_lock:
+                result = _cache_get(symbol, cache_status, version, now)
+                full = _cache_get(symbol, MATCHED_STATUS, version, now) if summary_only else MISS
+            if result is MISS:
+                result = shared.get(symbol, MISS)
+            if result is not MISS:
+                cached[symbol] = result
+            elif full is not MISS:
+                # Summarize a full result this process already holds
+                with timed(ANALYSIS):
+                    computed[symbol] = full and derive_profit_loss_view(
+                        full, status=status, summary_only=True
+                    )
+            else:
+                # Symbols the ledger can't serve without a replay match in full
+                yield symbol, transactions, allocations.get(symbol)
+
+    # Opt-in process-pool fan-out; small portfolios still run serially
+    for symbol, result, error, ledger_stale in analyze_groups(
+        pending_groups(),
+        status=status,
+        workers=_env_int("ANALYSIS_WORKERS", 0),
+        min_parallel=_env_int("ANALYSIS_PARALLEL_MIN_SYMBOLS", DEFAULT_MIN_PARALLEL),
+        summary_only=summary_only,
+    ):
+        if error is not None:
+            log.warning(f"[analyze_portfolio] Skipping {symbol}: {error}")
+            continue
+        if ledger_stale:
+            stale_ledger.append(symbol)
+        computed[symbol] = result
+
+    if stale_ledger:
+        log.info(
+            f"[analyze_portfolio] Lot ledger out of date for {len(stale_ledger)} symbols, "
+            f"matched in full"
+        )
+
+    results = dict(sorted({**cached, **computed}.items()))
+    _store_portfolio(results, cache_status, versions, portfolio_version, now)
+    shared_entries = {
+        symbol: (versions.get(symbol, "0"), result) for symbol, result in computed.items()
+    }
+    shared_entries[PORTFOLIO_KEY] = (portfolio_version, list(results))
+    _shared_put(shared_entries, cache_status)
+
+    log.debug(
+        f"[analyze_portfolio] {len(computed)} of {len(results)} symbols analyzed "
+        f"(status={cache_status})"
+    )
+    return results
+
+
+def cached_aggregate(name, build):
+    """build()'s portfolio-wide aggregate, cached in both levels.
+
+    Keyed by the portfolio version, so a change to any symbol rebuilds it,
+    and stored in the shared cache so every worker serves the aggregate
+    whichever worker built it — one row read instead of a per-symbol
+    analysis. build() must return JSON-serializable data; callers must
+    treat the result as read-only.
+    """
+    now = time.monotonic()
+    version = _portfolio_version(_symbol_versions())
+    with _cache_lock:
+        result = _cache_get(name, AGGREGATE_STATUS, version, now)
+    if result is not MISS:
+        return result
+
+    shared = _shared_get({name: version}, AGGREGATE_STATUS)
+    if name in shared:
+        result = shared[name]
+    else:
+        # Stored under the version read up front, as in analyze_symbol_safe
+        result = build()
+        _shared_put({name: (version, result)}, AGGREGATE_STATUS)
+    with _cache_lock:
+        _cache[(name, AGGREGATE_STATUS)] = (result, now, version)
+    return result
+
+
+def warm_analysis_cache(statuses=WARM_STATUSES):
+    """Re-analyze whatever changed since the cache was built, for each status.
+
+    Run after a sync: analyze_portfolio re-analyzes only the symbols whose
+    version moved and stores them, plus the portfolio's symbol list, in the
+    shared cache. The first status does the matching; the rest are derived
+    views of it, kept in this process. The aggregates the dashboard and
+    holdings endpoints serve are warmed separately (see
+    sync_service._warm_caches).
+    """
+    for status in statuses:
+        analyze_portfolio(status=status)
+
+
+def refresh_realized_pnl():
+    """Bring the realized_pnl_daily table up to date; returns symbols rebuilt.
+
+    Only symbols whose version moved since they were materialized are
+    rebuilt, from analyze_portfolio(status="closed") — which itself only
+    re-analyzes changed symbols — so on unchanged data this is one query.
+    """
+    versions = get_symbol_versions()
+    with DatabaseInserter(db=db) as conn:
+        stale = RealizedPnl(conn).stale_symbols(versions)
+    if not stale:
+        return 0
+
+    # Stored under the versions read up front, as in analyze_symbol_safe
+    results = analyze_portfolio(status="closed")
+    entries = {
+        symbol: (versions.get(symbol), daily_rows(results.get(symbol)))
+        for symbol in stale
+    }
+    with DatabaseInserter(db=db) as conn:
+        RealizedPnl(conn).replace(entries)
+    log.info(f"[realized_pnl] Rebuilt {len(entries)} symbols")
+    return len(entries)
+
+
+def stale_realized_pnl_symbols():
+    """Symbols whose realized_pnl_daily rows lag their trades; read-only.
+
+    The table is only written on the write side (a sync's warm-up or a trade
+    edit, see refresh_realized_pnl), so a read request can report that it
+    is behind without taking the write lock to catch it up.
+    """
+    versions = get_symbol_versions()
+    with DatabaseInserter(db=db) as conn:
+        return RealizedPnl(conn).stale_symbols(versions)
+
+
+def get_realized_pnl_buckets(period, asset_types=("stock", "option"), start=None, end=None):
+    """Realized P&L summed per period (see RealizedPnl.buckets), as last refreshed."""
+    with DatabaseInserter(db=db) as conn:
+        return RealizedPnl(conn).buckets(period, asset_types, start=start, end=end)
+
+
+def refresh_after_edit(symbols):
+    """Catch the lot ledger and realized_pnl_daily up after trades were edited.
+
+    For the edit routes, once the edit is committed. Best effort: a failure
+    is logged and the next sync's warm-up catches up instead.
+    """
+    extend_lot_ledger(symbols)
+    try:
+        refresh_realized_pnl()
+    except Exception:
+        log.exception("[realized_pnl] Could not refresh after an edit")
+
+
+def _store_portfolio(results, status, versions, portfolio_version, now):
+    """Keep a portfolio's results in this process's cache."""
+    with _cache_lock:
+        for symbol, result in results.items():
+            _cache[(symbol, status)] = (result, now, versions.get(symbol, "0"))
+        _portfolio_symbols[status] = (portfolio_version, tuple(results))
+
+
 def iter_open_buy_trades(analysis_data):
     """Yield (asset_type, trade_dict, remaining_qty) for each open buy trade.
 
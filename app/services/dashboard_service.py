@@ -0,0 +1,90 @@
+# app/services/dashboard_service.py
+"""Builds the win/loss summary served by GET /api/dashboard/summary.
+
+The summary is cached as a whole (cached_aggregate), so after a sync has
+warmed it every worker serves it from one analysis_cache row; building it
+only reads the closed-trade summaries, never the per-trade rows.
+"""
+import logging
+
+from app.repositories.trade_repository import get_all_securities
+from .analysis_service import analyze_portfolio, cached_aggregate
+
+log = logging.getLogger(__name__)
+
+DASHBOARD_SUMMARY = "dashboard_summary"
+
+
+def build_dashboard_summary():
+    """Aggregate win/loss and P&L stats across all symbols (closed trades only).
+
+    Returns {"overall": {...}, "by_symbol": [...]}; treat it as read-only.
+    """
+    return cached_aggregate(DASHBOARD_SUMMARY, _build_dashboard_summary)
+
+
+def _build_dashboard_summary():
+    # Build a name lookup from the security table
+    name_map = {symbol: name for symbol, name in get_all_securities()}
+
+    total_wins = 0
+    total_losses = 0
+    total_pnl = 0.0
+    by_symbol = []
+
+    for symbol, data in analyze_portfolio(status="closed", summary_only=True).items():
+        stats = _build_symbol_stats(data)
+        if stats is None:
+            continue
+
+        symbol_wins = sum(s["winning_trades_count"] for s in stats.values())
+        symbol_losses = sum(s["losing_trades_count"] for s in stats.values())
+        symbol_pnl = sum(s["profit_loss"] for s in stats.values())
+
+        total_wins += symbol_wins
+        total_losses += symbol_losses
+        total_pnl += symbol_pnl
+
+        total_decided = symbol_wins + symbol_losses
+        by_symbol.append({
+            "symbol": symbol,
+            "name": name_map.get(symbol, ""),
+            "stock": stats.get("stock"),
+            "option": stats.get("option"),
+            "combined": {
+                "winning_trades_count": symbol_wins,
+                "losing_trades_count": symbol_losses,
+                "batting_average": round(symbol_wins / total_decided, 3) if total_decided else 0.0,
+                "profit_loss": round(symbol_pnl, 2),
+            },
+        })
+
+    total_decided = total_wins + total_losses
+    overall = {
+        "total_realized_pnl": round(total_pnl, 2),
+        "total_winning_trades": total_wins,
+        "total_losing_trades": total_losses,
+        "batting_average": round(total_wins / total_decided, 3) if total_decided else 0.0,
+        "symbols_traded": len(by_symbol),
+    }
+
+    log.info(f"[dashboard/summary] {len(by_symbol)} symbols, overall: {overall}")
+    return {"overall": overall, "by_symbol": by_symbol}
+
+
+def _build_symbol_stats(data):
+    """Return serializable stock and option stats from a symbol's analysis result."""
+    result = {}
+    for asset_type in ("stock", "option"):
+        sec = data.get(asset_type, {})
+        if not sec.get("has_trades"):
+            continue
+        summary = sec.get("summary", {})
+        result[asset_type] = {
+            "winning_trades_count": summary.get("winning_trades_count", 0) or 0,
+            "losing_trades_count": summary.get("losing_trades_count", 0) or 0,
+            "batting_average": summary.get("batting_average", 0.0) or 0.0,
+            "profit_loss": summary.get("profit_loss", 0.0) or 0.0,
+            "percent_profit_loss": summary.get("percent_profit_loss", 0.0) or 0.0,
+        }
+    return result if result else None
@@ -1,20 +1,88 @@
 # app/services/holdings_service.py
-"""Builds the aggregated open-holdings view served by GET /api/holdings."""
+"""Builds the aggregated open-holdings view served by GET /api/holdings.
+
+Prices are served stale-while-revalidate from the quote store: a request
+never waits on Yahoo for a ticker it already has a price for, however old.
+Expired quotes are handed to a background QuoteRefresher and the response
+says so (quotes.refreshing), so the client polls again for the new prices.
+Only a ticker with no stored quote at all (a newly opened position) holds
+the request, for at most NEW_QUOTE_WAIT_SECONDS.
+"""
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+
+from flask import current_app
 
+from lib.db_utils import DatabaseInserter
 from lib.option_utils import label_to_occ
-from lib.yfinance import get_market_price
+from lib.quote_store import QuoteStore
+from lib.yfinance import download_prices
 from lib.constants import OPTIONS_MULTIPLIER
-from app.repositories.trade_repository import (
-    get_all_securities,
-    get_all_traded_symbols,
-)
-from .analysis_service import analyze_symbol_safe, iter_open_buy_trades
+from app.extensions import db
+from app.repositories.trade_repository import get_all_securities
+from .analysis_service import analyze_portfolio, cached_aggregate, iter_open_buy_trades
 
 log = logging.getLogger(__name__)
 
-PRICE_FETCH_WORKERS = 8
+NEW_QUOTE_WAIT_SECONDS = 3.0
+
+OPEN_POSITIONS = "open_positions"
+
+
+class QuoteRefresher:
+    """
+    Refreshes expired quotes on one background thread per process, a batch
+    (one download) at a time. Tickers submitted while a batch is in flight
+    are queued for the next one, except those in the batch itself: they
+    are about to get a fresh quote, so they are dropped rather than fetched
+    twice, and are refreshed again only once that quote expires.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # app -> tickers to refresh in its database
+        self._in_flight = set()
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def submit(self, app, tickers):
+        with self._lock:
+            tickers = set(tickers) - self._in_flight
+            if not tickers:
+                return
+            self._pending.setdefault(app, set()).update(tickers)
+            if self._idle.is_set():
+                self._idle.clear()
+                threading.Thread(target=self._run, name="quote-refresh", daemon=True).start()
+
+    def refreshing(self, tickers):
+        """Whether any of tickers is queued or being fetched."""
+        with self._lock:
+            busy = self._in_flight.union(*self._pending.values())
+        return not busy.isdisjoint(tickers)
+
+    def wait(self, timeout=None):
+        """Block until every submitted ticker is refreshed; False on timeout."""
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._in_flight = set()
+                    self._idle.set()
+                    return
+                app, batch = self._pending.popitem()
+                self._in_flight = batch
+            try:
+                with app.app_context(), DatabaseInserter(db=db) as conn:
+                    QuoteStore(conn).refresh(sorted(batch), download_prices)
+            except Exception:
+                log.exception("[holdings] Background quote refresh failed")
+
+
+_refresher = QuoteRefresher()
 
 
 def build_holdings():
@@ -24,23 +92,34 @@ def build_holdings():
     label (one row per unique contract, priced via its OCC-format ticker).
     Returns the full response dict with stock and option sections.
     """
-    stock_agg, option_agg = _aggregate_open_positions()
+    positions = aggregate_open_positions()
 
-    stock_positions = [_stock_position(symbol, agg) for symbol, agg in stock_agg.items()]
-    option_positions = [_option_position(label, agg) for label, agg in option_agg.items()]
+    stock_positions = [_stock_position(symbol, agg) for symbol, agg in positions["stock"].items()]
+    option_positions = [_option_position(label, agg) for label, agg in positions["option"].items()]
 
-    _apply_live_prices(stock_positions, option_positions)
+    quotes = _apply_live_prices(stock_positions, option_positions)
 
     log.info(
         f"[holdings] {len(stock_positions)} stock positions, "
-        f"{len(option_positions)} option positions"
+        f"{len(option_positions)} option positions, {quotes['stale']} stale quotes"
     )
     return {
         "stock": _section_with_totals(stock_positions),
         "option": _section_with_totals(option_positions),
+        "quotes": quotes,
     }
 
 
+def aggregate_open_positions():
+    """Open quantity and cost per stock symbol and per option label.
+
+    Returns {"stock": {symbol: agg}, "option": {label: agg}}, cached as a
+    whole (cached_aggregate) so a warmed cache serves it to every worker;
+    treat it as read-only. Prices are applied per request on top of it.
+    """
+    return cached_aggregate(OPEN_POSITIONS, _aggregate_open_positions)
+
+
 def _aggregate_open_positions():
     """Sum open quantity and cost per stock symbol and per option label."""
     name_map = {symbol: name for symbol, name in get_all_securities()}
@@ -48,11 +127,7 @@ def _aggregate_open_positions():
     stock_agg = {}   # symbol -> { name, trade_type, total_qty, total_cost }
     option_agg = {}  # label  -> { occ_ticker, symbol, name, trade_type, total_qty, total_cost }
 
-    for symbol in get_all_traded_symbols():
-        data = analyze_symbol_safe(symbol, status="open")
-        if data is None:
-            continue
-
+    for symbol, data in analyze_portfolio(status="open").items():
         for asset_type, trade, remaining_qty in iter_open_buy_trades(data):
             if asset_type == "stock":
                 agg = stock_agg.setdefault(symbol, {
@@ -83,7 +158,7 @@ def _aggregate_open_positions():
                 agg["total_qty"] += remaining_qty
                 agg["total_cost"] += trade["price"] * remaining_qty * OPTIONS_MULTIPLIER
 
-    return stock_agg, option_agg
+    return {"stock": stock_agg, "option": option_agg}
 
 
 def _base_position(agg):
@@ -94,6 +169,7 @@ def _base_position(agg):
         "quantity": round(agg["total_qty"], 4),
         "cost_basis": round(agg["total_cost"], 2),
         "current_price": None,
+        "price_age_seconds": None,
         "market_value": None,
         "unrealized_pnl": None,
         "pnl_pct": None,
@@ -123,28 +199,50 @@ def _option_position(label, agg):
 
 
 def _apply_live_prices(stock_positions, option_positions):
-    """Fetch current prices in parallel and fill in market value / P&L fields."""
-    fetch_tasks = {pos["symbol"]: False for pos in stock_positions}
-    fetch_tasks.update({pos["occ_ticker"]: True for pos in option_positions})
-    if not fetch_tasks:
-        return
+    """Price every position from the quote store and fill in market value / P&L fields.
 
-    price_map = {}
-    with ThreadPoolExecutor(max_workers=PRICE_FETCH_WORKERS) as pool:
-        futures = {
-            pool.submit(get_market_price, ticker, is_option): ticker
-            for ticker, is_option in fetch_tasks.items()
-        }
-        for future in as_completed(futures):
-            price_map[futures[future]] = future.result()
+    Each position gets price_age_seconds, the age of the quote it was priced
+    from. Expired and missing quotes are refreshed in the background, in one
+    download however many positions are open.
+
+    Returns:
+        {"stale": positions' tickers served without a fresh quote,
+         "refreshing": whether a refresh of any of them is under way}
+    """
+    tickers = list(dict.fromkeys(
+        [pos["symbol"] for pos in stock_positions]
+        + [pos["occ_ticker"] for pos in option_positions]
+    ))
+    if not tickers:
+        return {"stale": 0, "refreshing": False}
+
+    now = time.time()
+    with DatabaseInserter(db=db) as conn:
+        quotes = QuoteStore(conn).get_many(tickers)
+    expired = QuoteStore.expired(tickers, quotes, now)
+    if expired:
+        _refresher.submit(current_app._get_current_object(), expired)
+        # A new position has nothing to serve yet: give the refresh a moment
+        if len(quotes) < len(tickers) and _refresher.wait(NEW_QUOTE_WAIT_SECONDS):
+            now = time.time()
+            with DatabaseInserter(db=db) as conn:
+                quotes = QuoteStore(conn).get_many(tickers)
 
     for pos in stock_positions:
-        _price_position(pos, price_map.get(pos["symbol"]), multiplier=1)
+        _price_position(pos, quotes.get(pos["symbol"]), now, multiplier=1)
     for pos in option_positions:
-        _price_position(pos, price_map.get(pos["occ_ticker"]), multiplier=OPTIONS_MULTIPLIER)
+        _price_position(pos, quotes.get(pos["occ_ticker"]), now, multiplier=OPTIONS_MULTIPLIER)
+    return {
+        "stale": len(QuoteStore.expired(tickers, quotes, now)),
+        "refreshing": _refresher.refreshing(tickers),
+    }
 
 
-def _price_position(pos, price, multiplier):
+def _price_position(pos, quote, now, multiplier):
+    if quote is None:
+        return
+    pos["price_age_seconds"] = round(now - quote.fetched_at)
+    price = quote.price
     if price is None:
         return
     pos["current_price"] = price
@@ -6,16 +6,36 @@ Job status lives in the sync_job table rather than an in-process dict:
 production runs gunicorn with multiple worker processes, and a dict in one
 worker's memory would be invisible to the request that later polls for the
 job's status if it lands on a different worker.
+
+When the job is started from a request, the lot ledger is extended, the
+analysis cache and the dashboard and holdings aggregates re-warmed, and
+the realized_pnl_daily table brought up to date after the sync (before
+the job is marked done) so the page the UI reloads next is served from
+cache; the time that took is recorded as sync_job.warmup_seconds.
+
+A job whose worker died mid-sync stays 'running' forever. Once it is older
+than STALE_JOB_AFTER it no longer blocks its scope: the next start_sync()
+marks it interrupted and starts a job that resumes from the dead one's
+checkpoints (see lib/sync_checkpoint.py).
 """
 import logging
 import sqlite3
 import threading
-from datetime import datetime, timezone
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, has_app_context
 
 from lib.schwab_transactions import DB_PATH, sync
+from .analysis_service import extend_lot_ledger, refresh_realized_pnl, warm_analysis_cache
+from .dashboard_service import build_dashboard_summary
+from .holdings_service import aggregate_open_positions
 
 log = logging.getLogger(__name__)
 
+# No sync runs this long: a 'running' job older than this lost its worker
+STALE_JOB_AFTER = timedelta(hours=1)
+
 
 def _connect(db_path):
     conn = sqlite3.connect(db_path, timeout=10)
@@ -23,10 +43,46 @@ def _connect(db_path):
     return conn
 
 
-def _run_job(job_id, symbol, db_path):
+def _warm_caches(app):
+    """Re-warm the analysis cache and realized P&L after a sync; returns the seconds it took.
+
+    Runs the calls the dashboard and holdings endpoints make, so their
+    aggregates land in the shared cache and the first load in any worker
+    is a single cache read. Best-effort: a failure is logged and leaves
+    the cache to fill lazily.
+    """
+    started = time.monotonic()
+    try:
+        with app.app_context():
+            # sync() extended the symbols it inserted; this catches up the
+            # rest (edits and out-of-band inserts since the last sync)
+            extend_lot_ledger()
+            warm_analysis_cache()
+            build_dashboard_summary()
+            aggregate_open_positions()
+            refresh_realized_pnl()
+    except Exception:
+        log.exception('Post-sync cache warm-up failed')
+        return None
+    elapsed = round(time.monotonic() - started, 3)
+    log.info('Post-sync cache warm-up took %.3fs', elapsed)
+    return elapsed
+
+
+def _run_job(job_id, symbol, db_path, app=None):
     conn = _connect(db_path)
     try:
         result = sync(symbol=symbol, db_path=db_path)
+        if app is not None:
+            warmup_seconds = _warm_caches(app)
+            try:
+                conn.execute(
+                    'UPDATE sync_job SET warmup_seconds = ? WHERE id = ?',
+                    (warmup_seconds, job_id),
+                )
+            except sqlite3.OperationalError as exc:
+                log.warning('Cannot record warm-up time (run '
+                            'bin/migrate_add_sync_job_warmup.py): %s', exc)
         conn.execute(
             "UPDATE sync_job SET status = 'success', finished_at = ?, inserted = ?, "
             'skipped_existing = ?, skipped_invalid = ? WHERE id = ?',
@@ -62,30 +118,47 @@ def start_sync(symbol=None, db_path=None):
     both pass this check and start a duplicate sync; harmless here since
     sync() dedupes inserts by activity_id and watermark saves are idempotent,
     just wasted API calls — not worth a stricter lock for a personal app.
+
+    A 'running' job older than STALE_JOB_AFTER is taken to have died with
+    its worker: it is marked as an error and replaced by the new job, whose
+    sync() picks up where it stopped.
     """
     db_path = db_path or DB_PATH
     symbol = symbol.upper() if symbol else None
+    # The warm-up needs the app; jobs started outside a request skip it
+    app = current_app._get_current_object() if has_app_context() else None
 
     conn = _connect(db_path)
     try:
         row = conn.execute(
-            "SELECT id FROM sync_job WHERE status = 'running' AND symbol IS ? "
+            "SELECT id, started_at FROM sync_job WHERE status = 'running' AND symbol IS ? "
             'ORDER BY id DESC LIMIT 1',
             (symbol,),
         ).fetchone()
-        if row:
+        now = datetime.now(timezone.utc)
+        if row and now - datetime.fromisoformat(row['started_at']) < STALE_JOB_AFTER:
             return row['id']
 
         cursor = conn.execute(
             'INSERT INTO sync_job (symbol, status, started_at) VALUES (?, ?, ?)',
-            (symbol, 'running', datetime.now(timezone.utc).isoformat()),
+            (symbol, 'running', now.isoformat()),
         )
-        conn.commit()
         job_id = cursor.lastrowid
+        if row:
+            log.warning('Schwab sync job %s never finished — resuming it as job %s',
+                        row['id'], job_id)
+            conn.execute(
+                "UPDATE sync_job SET status = 'error', finished_at = ?, error_message = ? "
+                'WHERE id = ?',
+                (now.isoformat(), f'Interrupted; resumed by job {job_id}', row['id']),
+            )
+        conn.commit()
     finally:
         conn.close()
 
-    threading.Thread(target=_run_job, args=(job_id, symbol, db_path), daemon=True).start()
+    threading.Thread(
+        target=_run_job, args=(job_id, symbol, db_path, app), daemon=True
+    ).start()
     return job_id
 
 
@@ -1,4 +1,8 @@
 # app/services/trade_service.py
+import base64
+import binascii
+import json
+from bisect import bisect_left, bisect_right
 from datetime import datetime
 
 REASON_MAX_LEN = 500
@@ -7,6 +11,10 @@ VALID_SCOPES = ["all", "open", "closed"]
 VALID_ACCOUNTS = ["C", "R", "I", "O"]
 VALID_ASSET_TYPES = ["stock", "option", "all"]
 
+# Page size for the trades_by_symbol view when no limit is given
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
 
 def validate_positions_params(scope, after_date=None, account=None, asset_type="all"):
     """
@@ -31,6 +39,24 @@ def validate_positions_params(scope, after_date=None, account=None, asset_type="
     return None
 
 
+def validate_date_range(start=None, end=None):
+    """
+    Validates optional inclusive 'start'/'end' date bounds (YYYY-MM-DD).
+    Returns an error message string for the first invalid bound, or None.
+    """
+    for name, value in (("start", start), ("end", end)):
+        if value is not None:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except (ValueError, TypeError):
+                return f"{name} must be in 'YYYY-MM-DD' format"
+
+    if start and end and start > end:
+        return "start must not be after end"
+
+    return None
+
+
 def validate_trade_update(data: dict) -> dict:
     """
     Validates user-editable trade fields.
@@ -60,3 +86,117 @@ def validate_trade_update(data: dict) -> dict:
                     errors[price_field] = "Must be a positive number"
 
     return errors
+
+
+def validate_page_params(limit=None, after=None, before=None):
+    """
+    Validates the cursor pagination parameters (limit, after, before).
+    Returns an error message string for the first invalid parameter, or None.
+    """
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            return "limit must be an integer"
+        if not 1 <= limit <= MAX_PAGE_LIMIT:
+            return f"limit must be between 1 and {MAX_PAGE_LIMIT}"
+
+    if after and before:
+        return "Only one of 'after' or 'before' may be given"
+
+    for name, cursor in (("after", after), ("before", before)):
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except ValueError:
+                return f"{name} is not a valid cursor"
+
+    return None
+
+
+def encode_cursor(trade_date, trade_id):
+    """Opaque, URL-safe cursor for a (trade_date, id) position."""
+    if isinstance(trade_date, datetime):
+        trade_date = trade_date.isoformat()
+    raw = json.dumps([trade_date, trade_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor.
+    Returns (trade_date as a naive datetime, integer trade_id); raises
+    ValueError if malformed, so a crafted cursor can't reach the keyset
+    comparisons with a value they can't compare.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        trade_date, trade_id = json.loads(raw)
+        trade_date = datetime.fromisoformat(trade_date)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if trade_date.tzinfo is not None or type(trade_id) is not int:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return trade_date, trade_id
+
+
+def page_trade_rows(rows, limit, after=None, before=None):
+    """
+    Returns one page of a section's flattened all_trades rows.
+
+    The rows are lots — a buy row followed by the sells applied to it — and
+    a page never splits a lot. Lots are ordered by the buy's (trade_date,
+    trade_id); 'after' returns the lots following that cursor, 'before' the
+    lots preceding it. The returned page info carries the cursors for the
+    neighbouring pages, plus counts and win/loss averages over all rows so
+    the caller can show totals for the whole filtered set.
+
+    Args:
+        rows: all_trades list from TradingAnalyzer.get_profit_loss_data_json
+        limit: Maximum number of lots (buys) per page
+        after, before: Cursors from encode_cursor (at most one)
+
+    Returns:
+        (page_rows, page_info)
+    """
+    lots = []
+    for row in rows:
+        if row.get("is_buy_trade") or not lots:
+            lots.append([row])
+        else:
+            lots[-1].append(row)
+
+    def lot_key(lot):
+        return datetime.fromisoformat(lot[0]["trade_date"]), lot[0]["trade_id"]
+
+    lots.sort(key=lot_key)
+    keys = [lot_key(lot) for lot in lots]
+
+    if after:
+        start = bisect_right(keys, decode_cursor(after))
+        end = min(start + limit, len(lots))
+    elif before:
+        end = bisect_left(keys, decode_cursor(before))
+        start = max(end - limit, 0)
+    else:
+        start, end = 0, min(limit, len(lots))
+
+    closed_pnl = [
+        row["current_profit_loss"]
+        for row in rows
+        if row.get("is_buy_trade") and row.get("is_done")
+    ]
+    wins = [pnl for pnl in closed_pnl if pnl > 0]
+    losses = [pnl for pnl in closed_pnl if pnl < 0]
+
+    page_info = {
+        "limit": limit,
+        "total_lots": len(lots),
+        "total_trades": len(rows),
+        "avg_closed_win": sum(wins) / len(wins) if wins else None,
+        "avg_closed_loss": sum(losses) / len(losses) if losses else None,
+        "next_cursor": encode_cursor(*keys[end - 1]) if start < end < len(lots) else None,
+        "prev_cursor": encode_cursor(*keys[start]) if 0 < start < end else None,
+    }
+    page_rows = [row for lot in lots[start:end] for row in lot]
+    return page_rows, page_info
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark serial vs process-pool portfolio analysis and find the crossover.
+
+Builds synthetic symbols (alternating buys and partial sells in two
+accounts), runs lib.portfolio_analysis.analyze_groups over increasing
+symbol counts serially and with a process pool, and reports the smallest
+count where the pool wins. Use it to pick ANALYSIS_PARALLEL_MIN_SYMBOLS for
+the machine the app runs on. Pool start-up is paid once before timing, as
+it is in a long-running web worker.
+
+Usage:
+    python bin/benchmark_parallel_analysis.py
+    python bin/benchmark_parallel_analysis.py --workers 4 --rows 400
+    python bin/benchmark_parallel_analysis.py --counts 10 50 100 500
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+# Allow running from project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.portfolio_analysis import analyze_groups, shutdown_pool
+
+
+def synthetic_group(symbol, rows):
+    start = date(2020, 1, 1)
+    transactions = []
+    for i in range(rows):
+        # Each account sees buy, buy, sell(12 of 20) repeating
+        is_buy = (i // 2) % 3 != 2
+        quantity = 10 if is_buy else 12
+        price = 100.0 + (i % 17)
+        transactions.append({
+            "id": i + 1,
+            "symbol": symbol,
+            "action": "B" if is_buy else "S",
+            "trade_date": (start + timedelta(days=i)).isoformat(),
+            "quantity": quantity,
+            "price": price,
+            "amount": -price * quantity if is_buy else price * quantity,
+            "account": "C" if i % 2 else "R",
+        })
+    return symbol, transactions, None
+
+
+def best_of(repeat, groups, **kwargs):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _result in analyze_groups(groups, **kwargs):
+            pass
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--rows", type=int, default=200, help="Trade rows per symbol")
+    parser.add_argument("--counts", type=int, nargs="+",
+                        default=[5, 10, 25, 50, 100, 200, 400])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    all_groups = [synthetic_group(f"S{i:04d}", args.rows) for i in range(max(args.counts))]
+
+    # Start the pool (and import the analyzer in every worker) before timing
+    warm = all_groups[:args.workers]
+    for _result in analyze_groups(warm, workers=args.workers, min_parallel=1):
+        pass
+
+    print(f"workers={args.workers} rows/symbol={args.rows} cpus={os.cpu_count()}")
+    print(f"{'symbols':>8} {'serial s':>10} {'pool s':>10} {'speedup':>8}")
+    crossover = None
+    try:
+        for count in args.counts:
+            groups = all_groups[:count]
+            serial = best_of(args.repeat, groups)
+            pooled = best_of(args.repeat, groups, workers=args.workers, min_parallel=1)
+            print(f"{count:>8} {serial:>10.3f} {pooled:>10.3f} {serial / pooled:>7.2f}x")
+            if crossover is None and pooled < serial:
+                crossover = count
+    finally:
+        shutdown_pool()
+
+    if crossover is None:
+        print("The pool never beat serial analysis — leave ANALYSIS_WORKERS unset.")
+    else:
+        print(f"Crossover: ~{crossover} symbols (ANALYSIS_PARALLEL_MIN_SYMBOLS={crossover})")
+
+
+if __name__ == "__main__":
+    main()
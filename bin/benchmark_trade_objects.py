@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark Trade object construction time and memory.
+
+Converts synthetic trade rows (the dicts TradingAnalyzer receives from the
+repository) into BuyTrade/SellTrade objects with
+TradingAnalyzer._convert_to_trade, then runs a full analysis. Reports the
+best conversion and analysis time and the memory held by one symbol's Trade
+objects, measured with tracemalloc. Run it before and after changes to
+lib/models/Trade.py: --save writes a run's numbers to a JSON file, and
+--compare reads one back and prints how many times faster and smaller the
+current code is.
+
+Usage:
+    python bin/benchmark_trade_objects.py
+    python bin/benchmark_trade_objects.py --rows 5000 --repeat 5
+    python bin/benchmark_trade_objects.py --save before.json   # on the old code
+    python bin/benchmark_trade_objects.py --compare before.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# Allow running from project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bin.benchmark_parallel_analysis import synthetic_group
+from lib.trading_analyzer import TradingAnalyzer
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2000, help="Trade rows per symbol")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", metavar="FILE", help="Write this run's results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="Report the factor against a saved run")
+    args = parser.parse_args()
+
+    symbol, transactions, _ = synthetic_group("BENCH", args.rows)
+    analyzer = TradingAnalyzer(symbol, transactions)
+
+    def convert():
+        return [analyzer._convert_to_trade(row) for row in transactions]
+
+    def analyze():
+        TradingAnalyzer(symbol, transactions).analyze_trades()
+
+    convert_s = best_of(args.repeat, convert)
+    analyze_s = best_of(args.repeat, analyze)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    trades = convert()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    held = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    results = {
+        "rows": len(trades),
+        "convert_seconds": convert_s,
+        "analyze_seconds": analyze_s,
+        "bytes_per_trade": held / len(trades),
+    }
+
+    print(f"rows/symbol={len(trades)}")
+    print(f"convert: {convert_s * 1000:8.2f} ms  ({convert_s / len(trades) * 1e6:.2f} us/trade)")
+    print(f"analyze: {analyze_s * 1000:8.2f} ms")
+    print(f"memory:  {held / 1024:8.1f} KiB  ({held / len(trades):.0f} bytes/trade)")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)
+        if before["rows"] != results["rows"]:
+            print(f"warning: saved run had {before['rows']} rows/symbol, this one {results['rows']}")
+        print(f"\nagainst {args.compare}:")
+        for key, label in (("convert_seconds", "convert"), ("analyze_seconds", "analyze"),
+                           ("bytes_per_trade", "memory")):
+            print(f"{label + ':':9}{before[key] / results[key]:6.2f}x  "
+                  f"({before[key]:.6g} -> {results[key]:.6g})")
+
+if __name__ == "__main__":
+    main()
@@ -13,25 +13,15 @@
 -- INDEXES
 -- ---------------------------------------------------------------------------
 
--- Covers get_raw_trade_data / get_trade_data_for_analysis:
---   WHERE symbol = ? AND action IN (...) ORDER BY trade_date
-CREATE INDEX IF NOT EXISTS idx_trade_symbol_action_date
-    ON trade_transaction (symbol, action, trade_date);
-
--- Covers the buy/sell aggregation CTEs in get_current_holdings:
---   WHERE action IN (...) GROUP BY symbol, trade_type
-CREATE INDEX IF NOT EXISTS idx_trade_action_symbol_type
-    ON trade_transaction (action, symbol, trade_type);
+-- The repository access paths (get_raw_trade_data, get_current_holdings,
+-- get_trade_stats_summary, get_all_traded_symbols, transaction_exists) are
+-- covered by idx_trade_symbol_date and idx_trade_action_symbol_covering —
+-- see bin/migrate_add_covering_indexes.py.
 
 -- Covers ORDER BY trade_date across multiple queries
 CREATE INDEX IF NOT EXISTS idx_trade_date
     ON trade_transaction (trade_date);
 
--- Covers get_all_traded_symbols:
---   SELECT DISTINCT symbol ORDER BY symbol
-CREATE INDEX IF NOT EXISTS idx_trade_symbol
-    ON trade_transaction (symbol);
-
 -- Covers filtered queries by account
 CREATE INDEX IF NOT EXISTS idx_trade_account
     ON trade_transaction (account);
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+One-time schema migration: add covering indexes for the trade_transaction
+access paths and drop the indexes they supersede.
+
+Why: get_raw_trade_data, get_current_holdings, get_trade_stats_summary and
+DatabaseInserter.transaction_exists filter on symbol, action, trade_date,
+account and activity_id, and without a matching index every one of them is
+a full table scan. idx_trade_symbol_date serves the per-symbol reads (in the
+analyzer's sort order, so no temp b-tree) and the CSV dedupe lookup;
+idx_trade_action_symbol_covering carries every column the holdings and stats
+aggregates read, so they never touch the table. The activity_id dedupe
+lookup uses the unique index from bin/migrate_add_activity_id.py.
+
+The older idx_trade_symbol, idx_trade_symbol_action_date and
+idx_trade_action_symbol_type (bin/create_views_and_indexes.sql) are prefixes
+or reorderings of these, so they are dropped rather than maintained on
+every insert.
+
+tests/test_query_plans.py runs EXPLAIN QUERY PLAN on each repository query
+against the model schema (app/models/models.py declares the same indexes).
+
+Idempotent — safe to run more than once. Backs up the database first.
+
+Usage:
+    python bin/migrate_add_covering_indexes.py
+"""
+import logging
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger(__name__)
+
+DB_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'stock_trades.db')
+)
+
+INDEXES = {
+    'idx_trade_symbol_date': (
+        'CREATE INDEX idx_trade_symbol_date '
+        'ON trade_transaction (symbol, trade_date, action, trade_type, account)'
+    ),
+    'idx_trade_action_symbol_covering': (
+        'CREATE INDEX idx_trade_action_symbol_covering '
+        'ON trade_transaction (action, symbol, trade_type, label, quantity, amount, price)'
+    ),
+}
+SUPERSEDED_INDEXES = (
+    'idx_trade_symbol',
+    'idx_trade_symbol_action_date',
+    'idx_trade_action_symbol_type',
+)
+ACTIVITY_INDEX = 'unique_trade_transaction_activity_index'
+
+
+def _indexes(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    try:
+        indexes = _indexes(cursor)
+        if ACTIVITY_INDEX not in indexes:
+            log.warning('No %s — run bin/migrate_add_activity_id.py too.', ACTIVITY_INDEX)
+
+        if INDEXES.keys() <= indexes and not indexes & set(SUPERSEDED_INDEXES):
+            log.info('Already migrated — nothing to do.')
+            return
+
+        for index_name, ddl in INDEXES.items():
+            if index_name not in indexes:
+                cursor.execute(ddl)
+                log.info('Created index %s', index_name)
+
+        for index_name in SUPERSEDED_INDEXES:
+            if index_name in indexes:
+                cursor.execute(f'DROP INDEX {index_name}')
+                log.info('Dropped index %s', index_name)
+
+        conn.commit()
+        log.info('Migration complete.')
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def main():
+    if not os.path.exists(DB_PATH):
+        log.error('Database not found at %s', DB_PATH)
+        return
+    backup_path = f'{DB_PATH}.bak-migrate-{datetime.now().strftime("%Y%m%d-%H%M%S")}'
+    shutil.copy2(DB_PATH, backup_path)
+    log.info('Backed up database to %s', backup_path)
+    migrate()
+
+
+if __name__ == '__main__':
+    main()
@@ -45,7 +45,8 @@ def migrate(db_path=DB_PATH):
                 inserted INTEGER,
                 skipped_existing INTEGER,
                 skipped_invalid INTEGER,
-                error_message TEXT
+                error_message TEXT,
+                warmup_seconds REAL
             )
         ''')
         log.info('Created table sync_job')
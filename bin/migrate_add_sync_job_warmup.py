@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+One-time schema migration: add warmup_seconds to the sync_job table.
+
+Why: after a sync started from the UI, the analysis cache is re-warmed
+before the job is marked done (see app/services/sync_service.py), and the
+time that took is recorded per job so slow warm-ups show up in the job
+history.
+
+Idempotent — safe to run more than once. Backs up the database first.
+
+Usage:
+    python bin/migrate_add_sync_job_warmup.py
+"""
+import logging
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger(__name__)
+
+DB_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'stock_trades.db')
+)
+
+
+def migrate(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    try:
+        cursor.execute('PRAGMA table_info(sync_job)')
+        columns = {row[1] for row in cursor.fetchall()}
+        if not columns:
+            log.error('No sync_job table — run bin/migrate_add_sync_job.py first.')
+            return
+        if 'warmup_seconds' in columns:
+            log.info('Already migrated — nothing to do.')
+            return
+
+        cursor.execute('ALTER TABLE sync_job ADD COLUMN warmup_seconds REAL')
+        log.info('Added column warmup_seconds')
+
+        conn.commit()
+        log.info('Migration complete.')
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def main():
+    if not os.path.exists(DB_PATH):
+        log.error('Database not found at %s', DB_PATH)
+        return
+    backup_path = f'{DB_PATH}.bak-migrate-{datetime.now().strftime("%Y%m%d-%H%M%S")}'
+    shutil.copy2(DB_PATH, backup_path)
+    log.info('Backed up database to %s', backup_path)
+    migrate()
+
+
+if __name__ == '__main__':
+    main()
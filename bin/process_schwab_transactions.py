@@ -1,3 +1,4 @@
+import argparse
 import logging
 import os
 from datetime import datetime
@@ -9,6 +10,26 @@ log = logging.getLogger(__name__)
 
 SKIPPED_ROWS = []
 
+OUTPUT_HEADER = [
+    "Symbol",
+    "Name",
+    "Action",
+    "Label",
+    "Trade Type",
+    "Quantity",
+    "Price",
+    "Fees",
+    "Trade Date",
+    "Expiration Date",
+    "Amount",
+    "Target Price",
+    "Stop@",
+    "Sell@",
+    "P/L",
+    "Act.",
+]
+
+
 def write_skipped_rows(file_path, skipped_rows):
     """Writes skipped rows to a CSV file."""
     if skipped_rows:
@@ -139,7 +160,7 @@ def process_schwab_transactions_row(csv_processor, row, **kwargs):
     return trade_transaction
 
 
-def main():
+def main(bulk=False):
     logging.basicConfig(
         level=os.getenv("LOG_LEVEL", "INFO").upper(),
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -159,32 +180,20 @@ def main():
     if input_files:
         output_filename = f"transaction_record_{timestamp}.csv"
 
-        output_header = [
-            "Symbol",
-            "Name",
-            "Action",
-            "Label",
-            "Trade Type",
-            "Quantity",
-            "Price",
-            "Fees",
-            "Trade Date",
-            "Expiration Date",
-            "Amount",
-            "Target Price",
-            "Stop@",
-            "Sell@",
-            "P/L",
-            "Act.",
-        ]
-
-        processor.process_files(
-            input_files,
-            output_filename,
-            output_header,
-            process_schwab_transactions_row,
-            db_inserter=db_inserter,
-        )
+        if bulk:
+            from lib.schwab_csv_import import bulk_import
+            _, skipped = bulk_import(
+                processor, input_files, output_filename, OUTPUT_HEADER, db_inserter
+            )
+            SKIPPED_ROWS.extend(skipped)
+        else:
+            processor.process_files(
+                input_files,
+                output_filename,
+                OUTPUT_HEADER,
+                process_schwab_transactions_row,
+                db_inserter=db_inserter,
+            )
         log.info(f"Completed writing to: {output_filename}")
     else:
         log.warning("No Transaction files to process!")
@@ -197,4 +206,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Import Schwab transaction CSV exports")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Normalize whole files at once and insert in one transaction")
+    args = parser.parse_args()
+    main(bulk=args.bulk)
@@ -18,6 +18,13 @@ Usage:
     # watermark, or does a full ~1-year lookback the first time it's synced.
     python bin/sync_schwab_api.py --symbol AAPL
 
+    # Fetch accounts/windows concurrently (rate limited to Schwab's budget),
+    # e.g. for a multi-account backfill:
+    python bin/sync_schwab_api.py --start-date 2015-01-01 --workers 4
+
+    # A sync that failed part-way (after retrying transient API errors) is
+    # resumed by rerunning it: account windows it already stored are skipped.
+
     # Preview without inserting:
     python bin/sync_schwab_api.py --dry-run
 
@@ -100,7 +107,7 @@ def _report_fatal_error(exc):
 
     log.error('%s\n(Full error details logged to %s)', friendly, LOG_PATH)
 
-from lib.schwab_transactions import sync
+from lib.schwab_transactions import DEFAULT_FETCH_WORKERS, SCHWAB_REQUESTS_PER_MINUTE, sync
 
 DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'stock_trades.db')
 DB_PATH = os.path.normpath(DB_PATH)
@@ -131,6 +138,10 @@ def main():
                         help='Only sync this stock and its options, resuming from that '
                              'symbol\'s own watermark (default date range on first run: '
                              'full ~1-year lookback)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Fetch account/window requests from this many threads '
+                             f'(rate limited to {SCHWAB_REQUESTS_PER_MINUTE} requests/min; '
+                             f'try {DEFAULT_FETCH_WORKERS} for long backfills)')
     args = parser.parse_args()
 
     try:
@@ -146,7 +157,8 @@ def main():
         if args.end_date:
             end = datetime.strptime(args.end_date, '%Y-%m-%d').replace(tzinfo=timezone.utc)
 
-        sync(start_date=start, end_date=end, dry_run=args.dry_run, symbol=args.symbol, db_path=DB_PATH)
+        sync(start_date=start, end_date=end, dry_run=args.dry_run, symbol=args.symbol,
+             db_path=DB_PATH, max_workers=args.workers)
     except Exception as exc:
         _report_fatal_error(exc)
         sys.exit(1)
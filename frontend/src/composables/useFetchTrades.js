@@ -4,6 +4,7 @@ import axios from "axios";
 export function useFetchTrades() {
   const data = ref(null);
   const loading = ref(false);
+  const loadingMore = ref(false);
   const error = ref(null);
 
   const fetchData = async (url) => {
@@ -23,10 +24,35 @@ export function useFetchTrades() {
     }
   };
 
+  // Appends the next page of one section's all_trades (stock or option)
+  // from a cursor-paginated positions URL, and takes over its page info.
+  const fetchMore = async (url, section) => {
+    try {
+      loadingMore.value = true;
+      error.value = null;
+      const response = await axios.get(url, {
+        headers: { Accept: "application/json" },
+        timeout: 5000,
+      });
+      const incoming = response.data?.transaction_stats?.[section];
+      const current = data.value?.transaction_stats?.[section];
+      if (incoming && current) {
+        current.all_trades = [...(current.all_trades ?? []), ...incoming.all_trades];
+        current.page = incoming.page;
+      }
+    } catch (err) {
+      error.value = err.message || `Failed to fetch: ${url}`;
+    } finally {
+      loadingMore.value = false;
+    }
+  };
+
   return {
     data,
     loading,
+    loadingMore,
     error,
     fetchData,
+    fetchMore,
   };
 }
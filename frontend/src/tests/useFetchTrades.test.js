@@ -64,4 +64,34 @@ describe('useFetchTrades', () => {
     expect(data1.value).toBe('first');
     expect(data2.value).toBeNull();
   });
+
+  it('fetchMore appends the next page to one section', async () => {
+    axios.get.mockResolvedValueOnce({
+      data: {
+        transaction_stats: {
+          stock: { all_trades: [{ trade_id: 1 }], page: { next_cursor: 'c1' } },
+          option: { all_trades: [{ trade_id: 9 }], page: { next_cursor: null } },
+        },
+      },
+    });
+    const { data, fetchData, fetchMore, loadingMore } = useFetchTrades();
+    await fetchData('http://test/page1');
+
+    axios.get.mockResolvedValueOnce({
+      data: {
+        transaction_stats: {
+          stock: { all_trades: [{ trade_id: 2 }], page: { next_cursor: null } },
+        },
+      },
+    });
+    const promise = fetchMore('http://test/page2', 'stock');
+    expect(loadingMore.value).toBe(true);
+    await promise;
+
+    expect(loadingMore.value).toBe(false);
+    const stats = data.value.transaction_stats;
+    expect(stats.stock.all_trades.map((t) => t.trade_id)).toEqual([1, 2]);
+    expect(stats.stock.page.next_cursor).toBeNull();
+    expect(stats.option.all_trades).toHaveLength(1);
+  });
 });
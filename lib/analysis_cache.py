@@ -0,0 +1,167 @@
+"""
+Analysis results shared across worker processes, stored in SQLite.
+
+Each gunicorn worker used to keep its own in-process result dict, so every
+worker recomputed the same symbols after a sync and memory grew with the
+worker count. The analysis_cache table holds one serialized result per
+(symbol, status) together with the data version it was computed from; a
+row only counts as a hit when that version matches the caller's current
+one, so a new version needs no explicit invalidation — the stale row is
+replaced on the next write, or evicted.
+
+Payloads are zlib-compressed JSON. The table is bounded by total payload
+size: when a write pushes it over max_bytes, the least recently read rows
+are evicted. Reads refresh last_access at most once per TOUCH_INTERVAL so a
+busy endpoint doesn't turn every read into a write.
+"""
+import json
+import logging
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+TOUCH_INTERVAL = 60
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS analysis_cache (
+        symbol TEXT NOT NULL,
+        status TEXT NOT NULL,
+        version TEXT NOT NULL,
+        payload BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL,
+        PRIMARY KEY (symbol, status)
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_access
+        ON analysis_cache (last_access)
+    ''',
+)
+
+MISS = object()
+
+
+def _dumps(result) -> bytes:
+    return zlib.compress(json.dumps(result, separators=(',', ':')).encode('utf-8'))
+
+
+def _loads(payload: bytes):
+    return json.loads(zlib.decompress(payload))
+
+
+class AnalysisCache:
+    """Reads and writes the analysis_cache table through a DatabaseInserter."""
+
+    def __init__(self, db, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db = db
+        self.max_bytes = max_bytes
+        for statement in SCHEMA:
+            self.db.cursor.execute(statement)
+
+    def get(self, symbol: str, status: str, version: str, max_age: Optional[float] = None):
+        """Return the cached result (which may be None) or MISS."""
+        return self.get_many({symbol: version}, status, max_age).get(symbol, MISS)
+
+    def get_many(self, versions: Dict[str, str], status: str,
+                 max_age: Optional[float] = None) -> Dict[str, object]:
+        """Return {symbol: result} for the symbols cached at their current version.
+
+        Args:
+            versions: {symbol: current data version} to look up.
+            status: Analysis status the results were computed for.
+            max_age: Entries older than this many seconds count as misses.
+        """
+        cursor = self.db.cursor
+        now = time.time()
+        oldest = now - max_age if max_age is not None else 0
+        if len(versions) > 500:
+            # Past SQLite's bound-parameter comfort zone — read the status whole
+            cursor.execute(
+                'SELECT symbol, version, payload, last_access FROM analysis_cache '
+                'WHERE status = ? AND created_at >= ?',
+                (status, oldest),
+            )
+        else:
+            placeholders = ', '.join('?' for _ in versions)
+            cursor.execute(
+                'SELECT symbol, version, payload, last_access FROM analysis_cache '
+                'WHERE status = ? AND created_at >= ? '
+                f'AND symbol IN ({placeholders})',
+                (status, oldest, *versions),
+            )
+
+        results = {}
+        touch = []
+        for symbol, version, payload, last_access in cursor.fetchall():
+            if versions.get(symbol) != version:
+                continue
+            try:
+                results[symbol] = _loads(payload)
+            except (zlib.error, ValueError) as e:
+                log.warning(f'[analysis_cache] Dropping unreadable entry {symbol}/{status}: {e}')
+                continue
+            if now - last_access >= TOUCH_INTERVAL:
+                touch.append((now, symbol, status))
+
+        if touch:
+            with self.db.transaction():
+                cursor.executemany(
+                    'UPDATE analysis_cache SET last_access = ? WHERE symbol = ? AND status = ?',
+                    touch,
+                )
+        return results
+
+    def put(self, symbol: str, status: str, version: str, result) -> None:
+        self.put_many({symbol: (version, result)}, status)
+
+    def put_many(self, entries: Dict[str, Tuple[str, object]], status: str) -> None:
+        """Store {symbol: (version, result)}, then enforce the size bound."""
+        now = time.time()
+        rows = []
+        for symbol, (version, result) in entries.items():
+            payload = _dumps(result)
+            rows.append((symbol, status, version, payload, len(payload), now, now))
+
+        with self.db.transaction():
+            self.db.cursor.executemany(
+                'INSERT OR REPLACE INTO analysis_cache '
+                '(symbol, status, version, payload, size, created_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+            self._evict()
+
+    def clear(self) -> None:
+        with self.db.transaction():
+            self.db.cursor.execute('DELETE FROM analysis_cache')
+
+    def total_bytes(self) -> int:
+        self.db.cursor.execute('SELECT COALESCE(SUM(size), 0) FROM analysis_cache')
+        return self.db.cursor.fetchone()[0]
+
+    def _evict(self) -> None:
+        """Drop least recently read rows until the table fits in max_bytes."""
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        cursor = self.db.cursor
+        cursor.execute(
+            'SELECT symbol, status, size FROM analysis_cache ORDER BY last_access, created_at'
+        )
+        victims: List[Tuple[str, str]] = []
+        for symbol, status, size in cursor.fetchall():
+            if excess <= 0:
+                break
+            victims.append((symbol, status))
+            excess -= size
+        cursor.executemany(
+            'DELETE FROM analysis_cache WHERE symbol = ? AND status = ?', victims
+        )
+        log.debug(f'[analysis_cache] Evicted {len(victims)} entries')
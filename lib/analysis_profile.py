@@ -0,0 +1,154 @@
+"""
+Stage timings for TradingAnalyzer runs.
+
+A slow symbol used to be a single number in the logs. Each analyzer now
+carries a StageTimer that records wall time and a row count per stage:
+
+    convert    _convert_to_trade over every transaction row
+    sort       Trades.sort_trades (stock and option)
+    match      _create_buy_trades_collection (lot matching)
+    filter     BuyTrades.filter_buy_trades
+    summarize  TradeSummary.create_from_buy_trades_collection
+    finalize   TradeSummary.process_all_trades
+    serialize  get_profit_loss_data_json
+
+A stage that runs once per security type is summed across both. Every
+stage is also added to `stage_stats`, this process's running totals per
+stage and per symbol, so the symbols that dominate analysis time stand out
+(see /api/debug/analysis_profile). Analyses run in a process-pool worker
+(ANALYSIS_WORKERS) are counted in that worker's totals, not the web
+process's.
+
+Stage times also count toward the current web request's "analysis" time
+(lib/request_timing.py), reported in its Server-Timing header.
+
+A stage costs two perf_counter calls and one short lock, which is noise
+next to the stage itself.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from lib import request_timing
+
+STAGES = ("convert", "sort", "match", "filter", "summarize", "finalize", "serialize")
+
+# Symbols listed in a stats snapshot, slowest first
+DEFAULT_TOP_SYMBOLS = 20
+
+
+class StageStats:
+    """Thread-safe running totals per stage and per symbol."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages: Dict[str, Dict[str, Any]] = {}
+            self._symbols: Dict[str, Dict[str, Any]] = {}
+            self._since = time.time()
+
+    def add(self, symbol: str, stage: str, seconds: float, rows: int = 0) -> None:
+        with self._lock:
+            totals = self._stages.get(stage)
+            if totals is None:
+                totals = self._stages[stage] = {
+                    "calls": 0, "seconds": 0.0, "rows": 0,
+                    "max_seconds": 0.0, "max_symbol": None,
+                }
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            totals["rows"] += rows
+            if seconds > totals["max_seconds"]:
+                totals["max_seconds"] = seconds
+                totals["max_symbol"] = symbol
+
+            per_symbol = self._symbols.get(symbol)
+            if per_symbol is None:
+                per_symbol = self._symbols[symbol] = {"runs": 0, "seconds": 0.0, "stages": {}}
+            if stage == STAGES[0]:
+                per_symbol["runs"] += 1
+            per_symbol["seconds"] += seconds
+            per_symbol["stages"][stage] = per_symbol["stages"].get(stage, 0.0) + seconds
+
+    def snapshot(self, top: int = DEFAULT_TOP_SYMBOLS) -> Dict[str, Any]:
+        """Totals so far: per stage, and the `top` symbols by total time."""
+        with self._lock:
+            stages = {
+                stage: {
+                    **totals,
+                    "seconds": round(totals["seconds"], 6),
+                    "max_seconds": round(totals["max_seconds"], 6),
+                    "mean_seconds": round(totals["seconds"] / totals["calls"], 6),
+                }
+                for stage, totals in self._stages.items()
+            }
+            slowest = sorted(
+                self._symbols.items(), key=lambda item: item[1]["seconds"], reverse=True
+            )[:top]
+            symbols = [
+                {
+                    "symbol": symbol,
+                    "runs": totals["runs"],
+                    "seconds": round(totals["seconds"], 6),
+                    "stages": {s: round(v, 6) for s, v in totals["stages"].items()},
+                }
+                for symbol, totals in slowest
+            ]
+            return {
+                "pid": os.getpid(),
+                "since": self._since,
+                "symbols_profiled": len(self._symbols),
+                "stages": {stage: stages[stage] for stage in STAGES if stage in stages},
+                "slowest_symbols": symbols,
+            }
+
+
+# This process's totals
+stage_stats = StageStats()
+
+
+class StageTimer:
+    """Wall time and row count per stage of one analyzer's runs."""
+
+    def __init__(self, symbol: str, stats: Optional[StageStats] = stage_stats):
+        self.symbol = symbol
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._stats = stats
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0) -> Iterator[None]:
+        """Time the block as stage `name`; recorded even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, rows)
+
+    def add(self, name: str, seconds: float, rows: int = 0) -> None:
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {"seconds": 0.0, "rows": 0}
+        entry["seconds"] += seconds
+        entry["rows"] += rows
+        request_timing.record(request_timing.ANALYSIS, seconds)
+        if self._stats is not None:
+            self._stats.add(self.symbol, name, seconds, rows)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """{"total_seconds": ..., "stages": [{"stage", "seconds", "rows"}, ...]} in stage order."""
+        stages = [
+            {"stage": name, "seconds": round(entry["seconds"], 6), "rows": entry["rows"]}
+            for name, entry in sorted(
+                self.stages.items(),
+                key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES),
+            )
+        ]
+        return {
+            "total_seconds": round(sum(e["seconds"] for e in self.stages.values()), 6),
+            "stages": stages,
+        }
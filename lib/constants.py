@@ -21,6 +21,13 @@ class Action(str, Enum):
     QUAL_DIV_REINVEST = "QDR"
 
 
+# Actions that represent trade entries (buys) or exits (sells) — the rows
+# the analysis pipeline matches
+COMMON_ACTIONS = (
+    Action.BUY, Action.BUY_TO_OPEN, Action.EXERCISED,
+    Action.EXPIRED, Action.REINVEST_SHARES, Action.SELL, Action.SELL_TO_CLOSE,
+)
+
 # Quantity multipliers
 OPTIONS_MULTIPLIER = 100
 STOCK_MULTIPLIER = 1
@@ -1,13 +1,38 @@
 import logging
 import sqlite3
 from sqlite3 import Connection, Cursor
-from typing import Dict, Optional, Any, Union
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 from contextlib import contextmanager
+from operator import itemgetter
 from lib.models.ActionMapping import ActionMapping
 from lib.constants import Action
 
 logger = logging.getLogger(__name__)
 
+INSERT_TRANSACTION_QUERY = """
+    INSERT INTO trade_transaction (
+        symbol, action, label, trade_type, trade_date, expiration_date,
+        reason, quantity, price, amount, target_price,
+        initial_stop_price, projected_sell_price, account,
+        activity_id, leg_index
+    ) VALUES (
+        :symbol, :action, :label, :trade_type, :trade_date, :expiration_date,
+        :reason, :quantity, :price, :amount, :target_price,
+        :initial_stop_price, :projected_sell_price, :account,
+        :activity_id, :leg_index
+    )
+"""
+
+# Largest IN (...) list bound in one statement
+MAX_IN_PARAMS = 500
+
+# The columns transaction_exists matches a record without an activity_id on
+BUSINESS_KEY_FIELDS = (
+    "symbol", "action", "label", "trade_type", "trade_date",
+    "quantity", "price", "amount", "account",
+)
+_business_key = itemgetter(*BUSINESS_KEY_FIELDS)
+
 class DatabaseConnection:
     """Base class for database connection handling."""
 
@@ -61,9 +86,26 @@ class DatabaseConnection:
 class DatabaseInserter(DatabaseConnection):
     """Handles database insert operations with transaction support."""
 
+    # Nesting depth of transaction() blocks
+    _transaction_depth = 0
+
     @contextmanager
     def transaction(self):
-        """Context manager for transaction handling."""
+        """Context manager for transaction handling.
+
+        Blocks nest: an inner one joins the outermost, which alone commits
+        or rolls back, so a caller can make several writes (each in its own
+        transaction() block) land in a single commit.
+        """
+        if self._transaction_depth:
+            self._transaction_depth += 1
+            try:
+                yield self.cursor
+            finally:
+                self._transaction_depth -= 1
+            return
+
+        self._transaction_depth = 1
         try:
             yield self.cursor
             self.connection.commit()
@@ -71,6 +113,8 @@ class DatabaseInserter(DatabaseConnection):
             self.connection.rollback()
             logger.error("Transaction rolled back: %s", e)
             raise
+        finally:
+            self._transaction_depth = 0
 
     def insert_security(self, security: Dict[str, str]) -> None:
         """
@@ -110,6 +154,16 @@ class DatabaseInserter(DatabaseConnection):
         Returns:
             bool: True if transaction exists
         """
+        query, params = self._exists_query(trade_transaction)
+        try:
+            self.cursor.execute(query, params)
+            return bool(self.cursor.fetchone())
+        except sqlite3.Error as e:
+            logger.error("Error checking transaction existence: %s", e)
+            return False
+
+    def _exists_query(self, trade_transaction: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """SQL and parameters for transaction_exists's identity check."""
         activity_id = trade_transaction.get("activity_id")
         if activity_id is not None:
             query = """
@@ -147,14 +201,7 @@ class DatabaseInserter(DatabaseConnection):
                 "amount": trade_transaction["amount"],
                 "account": trade_transaction.get("account", "U"),
             }
-
-        try:
-            with self.transaction():
-                self.cursor.execute(query, params)
-                return bool(self.cursor.fetchone())
-        except sqlite3.Error as e:
-            logger.error("Error checking transaction existence: %s", e)
-            return False
+        return query, params
 
     def insert_transaction(self, trade_transaction: Dict[str, Any]) -> None:
         """
@@ -167,25 +214,12 @@ class DatabaseInserter(DatabaseConnection):
             ValueError: For invalid price formats
             sqlite3.Error: On database operation failure
         """
-        query = """
-            INSERT INTO trade_transaction (
-                symbol, action, label, trade_type, trade_date, expiration_date,
-                reason, quantity, price, amount, target_price,
-                initial_stop_price, projected_sell_price, account,
-                activity_id, leg_index
-            ) VALUES (
-                :symbol, :action, :label, :trade_type, :trade_date, :expiration_date,
-                :reason, :quantity, :price, :amount, :target_price,
-                :initial_stop_price, :projected_sell_price, :account,
-                :activity_id, :leg_index
-            )
-        """
         params = self._prepare_transaction_params(trade_transaction)
         logger.debug(f"Inserting Params: {params}")
 
         try:
             with self.transaction():
-                self.cursor.execute(query, params)
+                self.cursor.execute(INSERT_TRANSACTION_QUERY, params)
         except sqlite3.IntegrityError:
             logger.warning(
                 "Transaction for %s already exists", trade_transaction.get("symbol")
@@ -197,6 +231,108 @@ class DatabaseInserter(DatabaseConnection):
                 f"Failed to insert transaction for {trade_transaction['symbol']}: {e}"
             )
 
+    def insert_securities(self, securities: Iterable[Dict[str, str]]) -> None:
+        """Insert many securities in one transaction (see insert_security)."""
+        securities = list(securities)
+        if not securities:
+            return
+        query = """
+            INSERT OR IGNORE INTO security (symbol, name)
+            VALUES (:symbol, :name)
+        """
+        try:
+            with self.transaction():
+                self.cursor.executemany(query, securities)
+        except sqlite3.Error as e:
+            logger.error("Error inserting securities: %s", e)
+            raise RuntimeError(f"Failed to insert securities: {e}")
+
+    def insert_transactions(
+        self, trade_transactions: Iterable[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert a batch of transactions in one database transaction, skipping
+        the ones already stored.
+
+        The bulk form of transaction_exists + insert_transaction, which
+        commit once per call: a year of API history is one commit per window
+        here instead of two per fill. Records are deduped against the
+        stored rows (and each other) set-wise — by activity_id/leg_index
+        when they carry one, else by the business fields transaction_exists
+        compares — with one lookup per MAX_IN_PARAMS ids or symbols, then
+        written with a single executemany. ON CONFLICT DO NOTHING backs that
+        up wherever a unique index exists.
+
+        Args:
+            trade_transactions: Dictionaries with transaction details
+
+        Returns:
+            The records that were inserted, in input order.
+
+        Raises:
+            ValueError: For invalid price formats (nothing is inserted)
+            RuntimeError: On database operation failure (nothing is inserted)
+        """
+        records = list(trade_transactions)
+        insert_query = INSERT_TRANSACTION_QUERY + " ON CONFLICT DO NOTHING"
+        inserted = []
+        batch = []
+        try:
+            with self.transaction():
+                seen_activity = self._existing_activity_keys(
+                    {r["activity_id"] for r in records if r.get("activity_id") is not None}
+                )
+                seen_business = self._existing_business_keys(
+                    {r["symbol"] for r in records if r.get("activity_id") is None}
+                )
+                for record in records:
+                    params = self._prepare_transaction_params(record)
+                    if params["activity_id"] is not None:
+                        key = (params["activity_id"], record.get("leg_index", 0))
+                        if key in seen_activity:
+                            continue
+                        seen_activity.add(key)
+                    else:
+                        # The lookup parameters, as transaction_exists binds them
+                        if _business_key(self._exists_query(record)[1]) in seen_business:
+                            continue
+                        seen_business.add(_business_key(params))
+                    batch.append(params)
+                    inserted.append(record)
+                self.cursor.executemany(insert_query, batch)
+        except sqlite3.Error as e:
+            logger.error("Error inserting %d transactions: %s", len(records), e)
+            raise RuntimeError(f"Failed to insert transactions: {e}")
+        return inserted
+
+    def _existing_activity_keys(self, activity_ids: Iterable[int]) -> Set[Tuple[int, int]]:
+        """(activity_id, leg_index) of the stored rows carrying any of activity_ids."""
+        activity_ids = list(activity_ids)
+        keys = set()
+        for i in range(0, len(activity_ids), MAX_IN_PARAMS):
+            chunk = activity_ids[i:i + MAX_IN_PARAMS]
+            self.cursor.execute(
+                "SELECT activity_id, leg_index FROM trade_transaction "
+                f"WHERE activity_id IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            )
+            keys.update(self.cursor.fetchall())
+        return keys
+
+    def _existing_business_keys(self, symbols: Iterable[str]) -> Set[tuple]:
+        """_business_key of every stored row for any of symbols."""
+        symbols = list(symbols)
+        keys = set()
+        for i in range(0, len(symbols), MAX_IN_PARAMS):
+            chunk = symbols[i:i + MAX_IN_PARAMS]
+            self.cursor.execute(
+                f"SELECT {', '.join(BUSINESS_KEY_FIELDS)} FROM trade_transaction "
+                f"WHERE symbol IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            )
+            keys.update(self.cursor.fetchall())
+        return keys
+
     def _prepare_transaction_params(
         self, trade_transaction: Dict[str, Any]
     ) -> Dict[str, Any]:
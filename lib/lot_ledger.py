@@ -0,0 +1,473 @@
+"""
+Persisted FIFO lot ledger, extended incrementally as trade rows arrive.
+
+TradingAnalyzer matches every sell against every buy from the start of a
+symbol's history on each run. The ledger keeps the outcome of that matching
+in the lot_match table instead, per (symbol, account, security type, option
+label) queue:
+
+  kind='buy'   one row per buy lot, with the quantity still open
+  kind='sell'  one row per sell, with the quantity not yet matched
+  kind='match' one row per applied sell portion (buy_id, sell_id, units)
+
+FIFO matching of a buy queue against a sell queue is prefix-stable:
+appending to either queue never changes the matches already made. So new
+trade rows (from DatabaseInserter.insert_transaction, sync(), the CSV
+import) only extend the ledger — the cost is proportional to the new fills.
+
+lot_ledger records, per symbol, the highest trade_transaction id it has
+seen and the symbol's symbol_version at that point (see
+lib/symbol_version.py). The triggers bump the version once per inserted
+row and again for every update or delete, so when the version has moved by
+exactly the number of rows added past last_id, rows were only appended;
+any other change — an edit to a consumed row's account, quantity, price or
+date, a delete, a row moved between symbols — means a full replay of the
+symbol. So does a new row that sorts *before* the tail of its queue in
+analyzer sort order (a back-dated insert).
+
+Extending writes, so it belongs to the write side (the sync, the import,
+trade edits). Request handlers call read() / read_all() instead, which
+never write: a ledger that is only behind by appended rows has them
+matched in memory against its open lots, and one that needs a replay
+returns None so the caller matches that symbol in full.
+
+Quantities are stored in integer 1/QTY_SCALE units, the same grid
+lib/lot_matching.py matches on, so the stored allocations can be applied
+with lot_matching.apply_allocations and give the same per-lot results as
+the object and columnar engines.
+"""
+import logging
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from lib.constants import Action, COMMON_ACTIONS
+from lib.lot_matching import QTY_SCALE, Allocation
+from lib.models.ActionMapping import ActionMapping
+
+log = logging.getLogger(__name__)
+
+ACTION_MAP = ActionMapping()
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS lot_match (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        symbol TEXT NOT NULL,
+        account TEXT NOT NULL,
+        security_type TEXT NOT NULL,
+        label TEXT NOT NULL DEFAULT '',
+        kind TEXT NOT NULL,
+        trade_id INTEGER,
+        trade_date TEXT,
+        action TEXT,
+        trade_type TEXT,
+        units INTEGER NOT NULL,
+        remaining INTEGER,
+        buy_id INTEGER,
+        sell_id INTEGER,
+        buy_filled INTEGER,
+        sell_exhausted INTEGER
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_lot_match_symbol_kind
+        ON lot_match (symbol, kind, remaining)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS lot_ledger (
+        symbol TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL,
+        row_count INTEGER NOT NULL,
+        version INTEGER,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+)
+
+_ACTION_PLACEHOLDERS = ', '.join('?' for _ in COMMON_ACTIONS)
+
+# Ledger state of each symbol with trade rows (or ledger rows) — the
+# version is read in the same statement as the rows counted against it
+_STATE_QUERY = (
+    'SELECT s.symbol, l.last_id, l.row_count, l.version, v.version, '
+    '  (SELECT COUNT(*) FROM trade_transaction t '
+    '   WHERE t.symbol = s.symbol AND t.id > COALESCE(l.last_id, 0)), '
+    '  (SELECT MAX(id) FROM trade_transaction t WHERE t.symbol = s.symbol) '
+    'FROM ({symbols}) s '
+    'LEFT JOIN lot_ledger l ON l.symbol = s.symbol '
+    'LEFT JOIN symbol_version v ON v.symbol = s.symbol'
+)
+_ONE_SYMBOL = 'SELECT ? AS symbol'
+_ALL_SYMBOLS = 'SELECT symbol FROM symbol_version UNION SELECT symbol FROM lot_ledger'
+
+
+class _State(NamedTuple):
+    """A symbol's lot_ledger row (None fields if it has none) against its trade rows."""
+    symbol: str
+    last_id: Optional[int]
+    row_count: Optional[int]
+    ledger_version: Optional[int]
+    version: Optional[int]
+    new_rows: int   # trade_transaction rows past last_id, any action
+    max_id: Optional[int]
+
+    @property
+    def has_ledger(self):
+        return self.last_id is not None
+
+    @property
+    def is_current(self):
+        """Nothing about the symbol's rows changed since the ledger was written."""
+        return (self.has_ledger and self.version is not None
+                and self.ledger_version == self.version)
+
+    @property
+    def is_appended(self):
+        """Rows were only added past last_id since the ledger was written."""
+        return (self.has_ledger and self.version is not None
+                and self.ledger_version is not None
+                and self.version - self.ledger_version == self.new_rows)
+
+
+def _sort_key(row):
+    """Position of a row within its queue, matching Trades._sort_trades
+    (account and is_option are constant within a queue) with the row id as
+    the tie-breaker, as in get_raw_trade_data's ORDER BY."""
+    return (row['trade_date'], row['action'], row['trade_type'], row['trade_id'])
+
+
+def _normalize_date(value):
+    """trade_date is stored both as 'YYYY-MM-DD' and as a full timestamp."""
+    return datetime.fromisoformat(str(value)).isoformat()
+
+
+def _ledger_row(trade_id, account, label, trade_type, trade_date, action, quantity):
+    """Normalize a trade_transaction row into a lot_match queue entry."""
+    is_option = trade_type in ('C', 'P') or action in (Action.EXPIRED, Action.EXERCISED)
+    return {
+        'trade_id': trade_id,
+        'account': account,
+        'security_type': 'option' if is_option else 'stock',
+        # Stock sells match any stock buy in the account; option
+        # sells only buys of the same contract
+        'label': (label or '') if is_option else '',
+        'kind': 'buy' if ACTION_MAP.is_buy_type_action(action) else 'sell',
+        'trade_date': _normalize_date(trade_date),
+        'action': action,
+        'trade_type': trade_type or '',
+        'units': int(round(quantity * QTY_SCALE)),
+    }
+
+
+def _match_rows(open_entries, new_rows, add_entry):
+    """FIFO-match new rows against the open queue entries, in place.
+
+    Args:
+        open_entries: {'buy'|'sell': {queue: deque([entry_id, trade_id, remaining])}}.
+        new_rows: _ledger_row dicts in _sort_key order.
+        add_entry: Called with (queue, row) for each new row; returns the
+            row's entry id (None when nothing is persisted).
+
+    Returns:
+        (matches, touched): matches as (queue, buy_id, sell_id, units,
+        buy_filled, sell_exhausted) in matching order, and the remaining
+        units of every entry they drew on, by entry id.
+    """
+    touched = {}
+    matches = []
+    for row in new_rows:
+        queue = (row['account'], row['security_type'], row['label'])
+        entry_id = add_entry(queue, row)
+        if row['units'] > 0:
+            open_entries[row['kind']][queue].append([entry_id, row['trade_id'], row['units']])
+
+        buys = open_entries['buy'][queue]
+        sells = open_entries['sell'][queue]
+        while buys and sells:
+            buy, sell = buys[0], sells[0]
+            units = min(buy[2], sell[2])
+            buy[2] -= units
+            sell[2] -= units
+            touched[buy[0]] = buy[2]
+            touched[sell[0]] = sell[2]
+            matches.append((queue, buy[1], sell[1], units, buy[2] == 0, sell[2] == 0))
+            if buy[2] == 0:
+                buys.popleft()
+            if sell[2] == 0:
+                sells.popleft()
+    return matches, touched
+
+
+class LotLedger:
+    """Reads and extends the lot_match ledger through a DatabaseInserter.
+
+    The database must have the symbol_version table and triggers
+    (lib.symbol_version.ensure_symbol_versions).
+    """
+
+    def __init__(self, db):
+        self.db = db
+        for statement in SCHEMA:
+            self.db.cursor.execute(statement)
+        self.db.cursor.execute('PRAGMA table_info(lot_ledger)')
+        if 'version' not in {column[1] for column in self.db.cursor.fetchall()}:
+            # Ledgers written before versions were recorded replay once
+            self.db.cursor.execute('ALTER TABLE lot_ledger ADD COLUMN version INTEGER')
+
+    def extend(self, symbol: str) -> List[Allocation]:
+        """Bring the symbol's ledger up to date and return its allocations.
+
+        Only trade rows added since the last call are matched; a back-dated
+        row or any change to rows already seen triggers a full replay.
+        Runs in one IMMEDIATE transaction so concurrent workers can't both
+        extend the same symbol.
+        """
+        with self.db.transaction():
+            if not self.db.connection.in_transaction:
+                self.db.cursor.execute('BEGIN IMMEDIATE')
+            self._bring_up_to_date(self._state(symbol))
+            return self._allocations(symbol)
+
+    def replay(self, symbol: str) -> List[Allocation]:
+        """Discard the symbol's ledger and rebuild it from every trade row."""
+        with self.db.transaction():
+            if not self.db.connection.in_transaction:
+                self.db.cursor.execute('BEGIN IMMEDIATE')
+            self._clear(symbol)
+            self._bring_up_to_date(self._state(symbol))
+            return self._allocations(symbol)
+
+    def invalidate(self, symbol: str) -> None:
+        """Drop the symbol's ledger so the next extend() replays it in full."""
+        with self.db.transaction():
+            self._clear(symbol)
+
+    def extend_all(self) -> Dict[str, List[Allocation]]:
+        """extend() every symbol at once and return {symbol: allocations}.
+
+        When nothing changed this is two queries however many symbols there
+        are, and only symbols with new or changed trade rows are matched.
+        """
+        with self.db.transaction():
+            if not self.db.connection.in_transaction:
+                self.db.cursor.execute('BEGIN IMMEDIATE')
+            states = [state for state in self._states() if not state.is_current]
+
+            # Symbols that only gained rows are extended from one query
+            appended = {state.symbol: state for state in states if state.is_appended}
+            for state in states:
+                if state.symbol not in appended:
+                    self._bring_up_to_date(state)
+            if appended:
+                self.db.cursor.execute(
+                    'SELECT t.symbol, t.id, t.account, t.label, t.trade_type, t.trade_date, '
+                    't.action, t.quantity FROM trade_transaction t '
+                    'JOIN lot_ledger l ON l.symbol = t.symbol '
+                    f'WHERE t.action IN ({_ACTION_PLACEHOLDERS}) AND t.id > l.last_id',
+                    COMMON_ACTIONS,
+                )
+                new_rows = defaultdict(list)
+                for symbol, *row in self.db.cursor.fetchall():
+                    if symbol in appended:
+                        new_rows[symbol].append(_ledger_row(*row))
+                for symbol, state in appended.items():
+                    rows = sorted(new_rows[symbol], key=_sort_key)
+                    self._extend_with(state, rows)
+
+            return self._all_allocations()
+
+    def read(self, symbol: str) -> Optional[List[Allocation]]:
+        """The symbol's allocations for its current trade rows, without writing.
+
+        Returns None if the ledger has no usable prefix for the symbol (never
+        extended, or rows changed in a way that needs a replay): match the
+        symbol in full instead.
+        """
+        state = self._state(symbol)
+        if state.is_current:
+            return self._allocations(symbol)
+        if not state.is_appended:
+            return None
+        return self._read_appended(state, self._allocations(symbol))
+
+    def read_all(self) -> Dict[str, List[Allocation]]:
+        """read() for every symbol at once: {symbol: allocations}.
+
+        Symbols read() would return None for are left out. On an up-to-date
+        ledger this is two queries however many symbols there are.
+        """
+        allocations = self._all_allocations()
+        usable = {}
+        for state in self._states():
+            if state.is_current:
+                usable[state.symbol] = allocations.get(state.symbol, [])
+            elif state.is_appended:
+                result = self._read_appended(state, allocations.get(state.symbol, []))
+                if result is not None:
+                    usable[state.symbol] = result
+        return usable
+
+    def _state(self, symbol) -> _State:
+        self.db.cursor.execute(_STATE_QUERY.format(symbols=_ONE_SYMBOL), (symbol,))
+        return _State(*self.db.cursor.fetchone())
+
+    def _states(self) -> List[_State]:
+        self.db.cursor.execute(_STATE_QUERY.format(symbols=_ALL_SYMBOLS))
+        return [_State(*row) for row in self.db.cursor.fetchall()]
+
+    def _bring_up_to_date(self, state):
+        if state.is_current or (not state.has_ledger and state.max_id is None):
+            return
+        if state.has_ledger and not state.is_appended:
+            log.info('[%s] Trade rows changed under the lot ledger — replaying', state.symbol)
+            self._clear(state.symbol)
+            state = self._state(state.symbol)
+        after_id = state.last_id if state.has_ledger else 0
+        self._extend_with(state, self._fetch_rows(state.symbol, after_id, state.max_id))
+
+    def _extend_with(self, state, new_rows):
+        """Append rows newer than the ledger state, replaying if one is back-dated."""
+        symbol = state.symbol
+        row_count = state.row_count if state.has_ledger else 0
+        if state.has_ledger and self._is_back_dated(symbol, new_rows):
+            log.info('[%s] Back-dated trade row — replaying the lot ledger', symbol)
+            self._clear(symbol)
+            new_rows = self._fetch_rows(symbol, 0, state.max_id)
+            row_count = 0
+
+        if new_rows:
+            self._append(symbol, new_rows)
+        if state.max_id is None:
+            # No trade rows left at all
+            self._clear(symbol)
+            return
+        self.db.cursor.execute(
+            'INSERT INTO lot_ledger (symbol, last_id, row_count, version) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(symbol) DO UPDATE SET last_id = excluded.last_id, '
+            'row_count = excluded.row_count, version = excluded.version, '
+            'updated_at = CURRENT_TIMESTAMP',
+            (symbol, state.max_id, row_count + len(new_rows), state.version),
+        )
+        log.debug('[%s] Lot ledger extended by %d rows', symbol, len(new_rows))
+
+    def _read_appended(self, state, allocations):
+        """allocations plus the matches of rows appended past the ledger, in memory."""
+        new_rows = self._fetch_rows(state.symbol, state.last_id, state.max_id)
+        if not new_rows:
+            return allocations
+        if self._is_back_dated(state.symbol, new_rows):
+            return None
+        matches, _ = _match_rows(
+            self._open_entries(state.symbol), new_rows, lambda queue, row: None
+        )
+        return allocations + [match[1:] for match in matches]
+
+    def _clear(self, symbol):
+        self.db.cursor.execute('DELETE FROM lot_match WHERE symbol = ?', (symbol,))
+        self.db.cursor.execute('DELETE FROM lot_ledger WHERE symbol = ?', (symbol,))
+
+    def _fetch_rows(self, symbol, after_id, up_to_id):
+        """Trade rows with after_id < id <= up_to_id, in queue order."""
+        self.db.cursor.execute(
+            'SELECT id, account, label, trade_type, trade_date, action, quantity '
+            'FROM trade_transaction '
+            f'WHERE symbol = ? AND action IN ({_ACTION_PLACEHOLDERS}) AND id > ? AND id <= ? '
+            'ORDER BY id',
+            (symbol, *COMMON_ACTIONS, after_id, up_to_id or 0),
+        )
+        rows = [_ledger_row(*row) for row in self.db.cursor.fetchall()]
+        rows.sort(key=_sort_key)
+        return rows
+
+    def _is_back_dated(self, symbol, new_rows):
+        """True if any new row sorts before the tail of its buy or sell queue."""
+        self.db.cursor.execute(
+            'SELECT account, security_type, label, kind, trade_date, action, trade_type, '
+            'trade_id FROM lot_match WHERE id IN ('
+            '    SELECT MAX(id) FROM lot_match '
+            "    WHERE symbol = ? AND kind IN ('buy', 'sell') "
+            '    GROUP BY account, security_type, label, kind)',
+            (symbol,),
+        )
+        tails = {
+            (account, security_type, label, kind): (trade_date, action, trade_type, trade_id)
+            for account, security_type, label, kind, trade_date, action, trade_type, trade_id
+            in self.db.cursor.fetchall()
+        }
+        for row in new_rows:
+            tail = tails.get((row['account'], row['security_type'], row['label'], row['kind']))
+            if tail is not None and _sort_key(row) < tail:
+                return True
+        return False
+
+    def _open_entries(self, symbol):
+        """The symbol's buy and sell entries with units left, per queue in FIFO order."""
+        open_entries = {
+            'buy': defaultdict(deque),
+            'sell': defaultdict(deque),
+        }
+        self.db.cursor.execute(
+            'SELECT id, account, security_type, label, kind, trade_id, remaining '
+            "FROM lot_match WHERE symbol = ? AND kind IN ('buy', 'sell') AND remaining > 0 "
+            'ORDER BY id',
+            (symbol,),
+        )
+        for row_id, account, security_type, label, kind, trade_id, remaining in (
+            self.db.cursor.fetchall()
+        ):
+            open_entries[kind][(account, security_type, label)].append(
+                [row_id, trade_id, remaining]
+            )
+        return open_entries
+
+    def _append(self, symbol, new_rows):
+        """Add new buy/sell rows to their queues and match what now overlaps."""
+        cursor = self.db.cursor
+
+        def add_entry(queue, row):
+            cursor.execute(
+                'INSERT INTO lot_match (symbol, account, security_type, label, kind, '
+                'trade_id, trade_date, action, trade_type, units, remaining) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (symbol, *queue, row['kind'], row['trade_id'], row['trade_date'],
+                 row['action'], row['trade_type'], row['units'], row['units']),
+            )
+            return cursor.lastrowid
+
+        matches, touched = _match_rows(self._open_entries(symbol), new_rows, add_entry)
+        cursor.executemany(
+            'INSERT INTO lot_match (symbol, account, security_type, label, kind, '
+            'buy_id, sell_id, units, buy_filled, sell_exhausted) '
+            "VALUES (?, ?, ?, ?, 'match', ?, ?, ?, ?, ?)",
+            [(symbol, *queue, *match) for queue, *match in matches],
+        )
+        cursor.executemany(
+            'UPDATE lot_match SET remaining = ? WHERE id = ?',
+            [(remaining, row_id) for row_id, remaining in touched.items()],
+        )
+
+    def _allocations(self, symbol) -> List[Allocation]:
+        self.db.cursor.execute(
+            'SELECT buy_id, sell_id, units, buy_filled, sell_exhausted FROM lot_match '
+            "WHERE symbol = ? AND kind = 'match' ORDER BY id",
+            (symbol,),
+        )
+        return [
+            (buy_id, sell_id, units, bool(buy_filled), bool(sell_exhausted))
+            for buy_id, sell_id, units, buy_filled, sell_exhausted in self.db.cursor.fetchall()
+        ]
+
+    def _all_allocations(self) -> Dict[str, List[Allocation]]:
+        cursor = self.db.cursor
+        cursor.execute('SELECT symbol FROM lot_ledger')
+        allocations = {symbol: [] for symbol, in cursor.fetchall()}
+        cursor.execute(
+            'SELECT symbol, buy_id, sell_id, units, buy_filled, sell_exhausted FROM lot_match '
+            "WHERE kind = 'match' ORDER BY id"
+        )
+        for symbol, buy_id, sell_id, units, buy_filled, sell_exhausted in cursor.fetchall():
+            allocations.setdefault(symbol, []).append(
+                (buy_id, sell_id, units, bool(buy_filled), bool(sell_exhausted))
+            )
+        return allocations
@@ -0,0 +1,256 @@
+"""Columnar FIFO lot matching.
+
+An alternative to BuyTrade.apply_sell_trades for symbols with thousands of
+fills. Instead of walking each buy against the sell list (deep-copying the
+sell for every partial match), each (account[, option label]) group is
+turned into quantity/price columns and matched in one vectorized pass:
+buy i covers the cumulative-quantity interval [B[i-1], B[i]), sell j covers
+[S[j-1], S[j]), and every non-empty overlap of the two is one applied sell.
+
+Quantities are matched in integer units of 1/QTY_SCALE — the same 4-decimal
+grid BuyTrade.apply_sell_trade rounds to after every partial fill — so the
+matching itself is exact and lands on the same lots as the object engine.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+import numpy as np
+
+from lib.models.Trade import BuyTrade, SellAllocation, SellTrade
+from lib.models.Trades import Trades
+
+# apply_sell_trade rounds quantities to 4 decimals
+QTY_SCALE = 10_000
+
+# A persisted match: (buy trade_id, sell trade_id, units, buy_filled, sell_exhausted)
+Allocation = Tuple[int, int, int, bool, bool]
+
+
+class AllocationMismatchError(ValueError):
+    """Pre-computed allocations don't fit the trades they are applied to."""
+
+
+@dataclass
+class LotMatches:
+    """One row per (buy, sell) overlap, in FIFO order.
+
+    buy_idx / sell_idx index into the group's buy and sell lists, units is the
+    matched quantity in 1/QTY_SCALE units, buy_filled marks the row that
+    closes its buy and sell_exhausted the row that uses up its sell.
+    """
+
+    buy_idx: np.ndarray
+    sell_idx: np.ndarray
+    units: np.ndarray
+    buy_filled: np.ndarray
+    sell_exhausted: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+
+def to_units(quantities: List[float]) -> np.ndarray:
+    """Convert share/contract quantities to integer 1/QTY_SCALE units."""
+    return np.rint(np.asarray(quantities, dtype=np.float64) * QTY_SCALE).astype(
+        np.int64
+    )
+
+
+def match_fifo(buy_units: np.ndarray, sell_units: np.ndarray) -> LotMatches:
+    """Match a queue of buys against a queue of sells, first in first out.
+
+    Args:
+        buy_units: Buy quantities (1/QTY_SCALE units) in matching order.
+        sell_units: Sell quantities (1/QTY_SCALE units) in matching order.
+
+    Returns:
+        LotMatches: The overlaps of the buys' and sells' cumulative quantity
+        intervals, covering min(total bought, total sold).
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    if not len(buy_units) or not len(sell_units):
+        no_flags = np.zeros(0, dtype=bool)
+        return LotMatches(empty, empty, empty, no_flags, no_flags)
+
+    buy_cum = np.cumsum(buy_units)
+    sell_cum = np.cumsum(sell_units)
+    matched_total = min(buy_cum[-1], sell_cum[-1])
+
+    edges = np.unique(np.concatenate(([0], buy_cum, sell_cum)))
+    edges = edges[edges <= matched_total]
+    starts = edges[:-1]
+    ends = edges[1:]
+
+    buy_idx = np.searchsorted(buy_cum, starts, side="right")
+    sell_idx = np.searchsorted(sell_cum, starts, side="right")
+
+    return LotMatches(
+        buy_idx=buy_idx,
+        sell_idx=sell_idx,
+        units=ends - starts,
+        buy_filled=ends == buy_cum[buy_idx],
+        sell_exhausted=ends == sell_cum[sell_idx],
+    )
+
+
+def _round_cents(values: np.ndarray) -> np.ndarray:
+    return np.array([round(v, 2) for v in values.tolist()], dtype=np.float64)
+
+
+def _group_trades(trades: Trades, match_label: bool):
+    """Split buys and sells into matching queues, preserving sorted order."""
+    buys_by_key: Dict[Hashable, List[BuyTrade]] = defaultdict(list)
+    for buy in trades.buy_trades:
+        buys_by_key[Trades.match_key(buy, match_label)].append(buy)
+
+    return buys_by_key, trades.sell_queues(match_label)
+
+
+def _apply_group(buys: List[BuyTrade], sells: List[SellTrade]) -> None:
+    """Match one queue and write the results onto the buy trades."""
+    matches = match_fifo(
+        to_units([b.quantity for b in buys]), to_units([s.quantity for s in sells])
+    )
+    if len(matches):
+        _write_matches(buys, sells, matches)
+
+
+def _write_matches(
+    buys: List[BuyTrade], sells: List[SellTrade], matches: LotMatches
+) -> None:
+    """Price the matched rows and write them onto the buy trades."""
+    buy_idx = matches.buy_idx
+    sell_idx = matches.sell_idx
+    qty = matches.units / QTY_SCALE
+
+    buy_price = np.array([b.price for b in buys], dtype=np.float64)[buy_idx]
+    buy_mult = np.array([b.multiplier for b in buys], dtype=np.float64)[buy_idx]
+    sell_price = np.array([s.price for s in sells], dtype=np.float64)[sell_idx]
+    sell_mult = np.array([s.multiplier for s in sells], dtype=np.float64)[sell_idx]
+
+    basis_amt = qty * buy_price * buy_mult
+    amount_diff = (np.abs(sell_price) - buy_price) * qty * sell_mult
+    percent = np.zeros_like(amount_diff)
+    np.divide(amount_diff, basis_amt, out=percent, where=basis_amt != 0)
+    # Python's round(), not np.round: np.round scales by 100 first and can land
+    # on the other side of a half-cent, drifting from the object engine.
+    amount = _round_cents(qty * sell_price * buy_mult)
+    profit_loss = _round_cents(amount_diff)
+    percent = _round_cents(percent * 100)
+
+    # Per-buy running totals (bincount accumulates in row order, like +=)
+    n_buys = len(buys)
+    sold_units = np.bincount(buy_idx, weights=matches.units, minlength=n_buys)
+    sold_amt = np.bincount(buy_idx, weights=amount, minlength=n_buys)
+    basis_sold_amt = np.bincount(buy_idx, weights=basis_amt, minlength=n_buys)
+    buy_pl = np.bincount(buy_idx, weights=profit_loss, minlength=n_buys)
+
+    rows = zip(
+        buy_idx.tolist(),
+        sell_idx.tolist(),
+        qty.tolist(),
+        amount.tolist(),
+        basis_amt.tolist(),
+        profit_loss.tolist(),
+        percent.tolist(),
+        matches.buy_filled.tolist(),
+        matches.sell_exhausted.tolist(),
+    )
+    for b, s, q, amt, basis, pl, pct, buy_filled, sell_exhausted in rows:
+        buy = buys[b]
+        sell = sells[s]
+        buy.sells.append(
+            SellAllocation(
+                sell,
+                quantity=round(q, 4),
+                amount=amt,
+                basis_price=buy.price,
+                basis_amt=basis,
+                is_done=sell_exhausted,
+                profit_loss=pl,
+                percent_profit_loss=pct,
+            )
+        )
+        if buy_filled and buy.closed_date is None:
+            buy.closed_date = sell.trade_date
+
+    for b, buy in enumerate(buys):
+        if not buy.sells:
+            continue
+        buy.current_sold_qty = round(float(sold_units[b]) / QTY_SCALE, 4)
+        buy.current_sold_amt = float(sold_amt[b])
+        buy.current_basis_sold_amt = float(basis_sold_amt[b])
+        buy.current_profit_loss = float(buy_pl[b])
+        buy.current_percent_profit_loss = (
+            (buy.current_profit_loss / buy.current_basis_sold_amt) * 100
+            if buy.current_basis_sold_amt != 0
+            else 0
+        )
+        buy.is_done = buy.current_sold_qty >= buy.quantity
+
+
+def apply_columnar_matching(trades: Trades, match_label: bool = False) -> None:
+    """Match every buy in a sorted Trades collection against its sells.
+
+    Columnar equivalent of calling apply_sell_trades on each buy in order:
+    each BuyTrade ends up with the same current_sold_qty, current_profit_loss,
+    closed_date and applied sells (with basis and P&L). The source sell trades
+    in trades.sells_by_account are left untouched.
+
+    Args:
+        trades: A Trades collection, already sorted with sort_trades().
+        match_label: If True, sells only match buys with the same trade_label
+            (option contracts), as in BuyTrade.apply_sell_trades.
+    """
+    buys_by_key, sells_by_key = _group_trades(trades, match_label)
+    for key, buys in buys_by_key.items():
+        sells = sells_by_key.get(key)
+        if sells:
+            _apply_group(buys, sells)
+
+
+def apply_allocations(trades: Trades, allocations: Iterable[Allocation]) -> None:
+    """Write pre-computed matches (e.g. from the lot ledger) onto a Trades collection.
+
+    Allocations whose buy isn't in this collection are ignored, so one list
+    can be applied to both the stock and the option collection.
+
+    Raises:
+        AllocationMismatchError: If an allocation references a sell that isn't
+            in the collection, or allocates more than a buy or sell holds —
+            i.e. the allocations were computed from different trade rows.
+    """
+    buys = trades.buy_trades
+    sells = [s for account_sells in trades.sells_by_account.values() for s in account_sells]
+    buy_pos = {buy.trade_id: i for i, buy in enumerate(buys)}
+    sell_pos = {sell.trade_id: i for i, sell in enumerate(sells)}
+
+    rows = [a for a in allocations if a[0] in buy_pos]
+    if not rows:
+        return
+    try:
+        sell_idx = np.array([sell_pos[a[1]] for a in rows], dtype=np.int64)
+    except KeyError as e:
+        raise AllocationMismatchError(f"Allocation references unknown sell {e}")
+    buy_idx = np.array([buy_pos[a[0]] for a in rows], dtype=np.int64)
+    units = np.array([a[2] for a in rows], dtype=np.int64)
+
+    buy_units = to_units([b.quantity for b in buys])
+    sell_units = to_units([s.quantity for s in sells])
+    bought = np.bincount(buy_idx, weights=units, minlength=len(buys))
+    sold = np.bincount(sell_idx, weights=units, minlength=len(sells))
+    if np.any(bought > buy_units) or np.any(sold > sell_units):
+        raise AllocationMismatchError("Allocations exceed the traded quantities")
+
+    _write_matches(
+        buys,
+        sells,
+        LotMatches(
+            buy_idx=buy_idx,
+            sell_idx=sell_idx,
+            units=units,
+            buy_filled=np.array([bool(a[3]) for a in rows]),
+            sell_exhausted=np.array([bool(a[4]) for a in rows]),
+        ),
+    )
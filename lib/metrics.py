@@ -0,0 +1,87 @@
+"""
+In-process latency histograms, rendered in the Prometheus text format.
+
+A small stand-in for prometheus_client: histograms with fixed buckets and
+string labels, kept per process. Under gunicorn every worker has its own
+registry, so a scrape reports the worker that served it.
+"""
+import math
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; the Prometheus client's default buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram per label combination."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [count per bucket (non-cumulative, +Inf last), sum]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets)
+        )
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> Iterable[str]:
+        """Lines of this histogram in the Prometheus text exposition format."""
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            labels = ",".join(
+                f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key)
+            )
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                yield f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}'
+            suffix = f"{{{labels}}}" if labels else ""
+            yield f"{self.name}_sum{suffix} {total!r}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+class Registry:
+    """The histograms a /metrics scrape returns."""
+
+    def __init__(self):
+        self._metrics: List[Histogram] = []
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str],
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def reset(self) -> None:
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self) -> str:
+        return "".join(line + "\n" for metric in self._metrics for line in metric.render())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -2,6 +2,17 @@ from dataclasses import dataclass
 from typing import Dict
 from lib.constants import Action
 
+BUY_TYPE_ACTIONS = frozenset({
+    Action.BUY, Action.BUY_TO_OPEN, Action.REINVEST_SHARES,
+    Action.REINVEST_DIVIDEND, Action.PRIOR_YR_DIV_REINVEST,
+    Action.QUAL_DIV_REINVEST, Action.SELL_TO_OPEN,
+})
+
+SELL_TYPE_ACTIONS = frozenset({
+    Action.SELL, Action.EXERCISED, Action.EXPIRED,
+    Action.BUY_TO_CLOSE, Action.SELL_TO_CLOSE,
+})
+
 
 @dataclass
 class ActionMapping:
@@ -48,18 +59,11 @@ class ActionMapping:
 
     def is_buy_type_action(self, acronym: str) -> bool:
         """Check if the acronym is a buy type action (Buy, Buy to Open, Sell to Open)"""
-        return acronym in {
-            Action.BUY, Action.BUY_TO_OPEN, Action.REINVEST_SHARES,
-            Action.REINVEST_DIVIDEND, Action.PRIOR_YR_DIV_REINVEST,
-            Action.QUAL_DIV_REINVEST, Action.SELL_TO_OPEN,
-        }
+        return acronym in BUY_TYPE_ACTIONS
 
     def is_sell_type_action(self, acronym: str) -> bool:
         """Check if the acronym is a sell type action (Sell, Sell to Close, Buy to Close)"""
-        return acronym in {
-            Action.SELL, Action.EXERCISED, Action.EXPIRED,
-            Action.BUY_TO_CLOSE, Action.SELL_TO_CLOSE,
-        }
+        return acronym in SELL_TYPE_ACTIONS
 
     def get_full_name(self, acronym: str) -> str | None:
         """Get full action name from acronym or None"""
@@ -1,7 +1,8 @@
 from __future__ import annotations
-import copy
 import logging
 from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter
 from typing import List, Optional, Dict, Any, TypedDict
 from lib.models.ActionMapping import ActionMapping
 from lib.constants import Action, OPTIONS_MULTIPLIER, STOCK_MULTIPLIER
@@ -42,8 +43,63 @@ class TradeData(RequiredTradeData, OptionalTradeData):
     pass
 
 
+@lru_cache(maxsize=8192)
+def _parse_trade_date(trade_date_str: str) -> datetime:
+    """Parse a trade date string; memoized since a symbol's trades share few dates."""
+    # Fast path for the zero-padded forms the database and imports produce
+    length = len(trade_date_str)
+    if (
+        (length == 10 or (length == 19 and trade_date_str[10] == "T"))
+        and trade_date_str[4] == "-"
+        and trade_date_str[7] == "-"
+    ):
+        try:
+            return datetime.fromisoformat(trade_date_str)
+        except ValueError:
+            pass
+
+    for fmt in ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(trade_date_str, fmt)
+        except ValueError:
+            continue
+
+    raise ValueError(
+        f"trade.trade_date_str format must be: '%Y-%m-%d' or '%Y-%m-%dT%H:%M:%S', got: {trade_date_str}"
+    )
+
+
 class Trade:
-    """Base class for all trade types with type-safe initialization"""
+    """Base class for all trade types with type-safe initialization
+
+    Trades are slotted: an analyzed symbol can hold thousands of them, and
+    a per-instance __dict__ roughly doubles their size. _FIELDS lists the
+    public attributes in serialization order (to_dict, __repr__).
+    """
+
+    __slots__ = (
+        "symbol",
+        "action",
+        "trade_date",
+        "trade_id",
+        "trade_type",
+        "quantity",
+        "price",
+        "amount",
+        "account",
+        "is_option",
+        "is_done",
+        "expiration_date",
+        "target_price",
+        "reason",
+        "initial_stop_price",
+        "projected_sell_price",
+        "trade_label",
+        "_multiplier",
+    )
+
+    _FIELDS = tuple(f for f in __slots__ if not f.startswith("_"))
+    _get_fields = attrgetter(*_FIELDS)
 
     # Explicitly declare attributes for type checking
     trade_id: str
@@ -67,48 +123,37 @@ class Trade:
     id: Optional[str]  # Can use "id" or "trade_id"
     label: Optional[str]  # Can use "label" or "trade_label"
 
-    _DEFAULTS = {
-        "trade_type": "",
-        "quantity": 0.0,
-        "price": 0.0,
-        "amount": 0.0,
-        "account": "X",
-        "is_option": False,
-        "is_done": False,
-        "expiration_date": "",
-        "target_price": None,
-        "reason": None,
-        "initial_stop_price": None,
-        "projected_sell_price": None,
-    }
-
     def __init__(self, trade_data: TradeData):
         """
         Initialize trade from dictionary with validation and defaults
         """
+        get = trade_data.get
         # Set required attributes
         self.symbol = trade_data["symbol"]
         self.action = trade_data["action"]
         self.trade_date = trade_data["trade_date"]
         # The Database trade_transaction table uses "id"
-        setattr(self, "trade_id", trade_data.get("trade_id", trade_data.get("id")))
+        self.trade_id = get("trade_id", get("id"))
         if not self.trade_id:
             raise KeyError("Trade ID is required")
 
         # Set optional attributes with defaults
-        # TODO: Test that this works
-        for field, default in self._DEFAULTS.items():
-            setattr(self, field, trade_data.get(field, default))
+        self.trade_type = get("trade_type", "")
+        self.quantity = get("quantity", 0.0)
+        self.price = get("price", 0.0)
+        self.amount = get("amount", 0.0)
+        self.account = get("account", "X")
+        self.is_done = get("is_done", False)
+        self.expiration_date = get("expiration_date", None)
+        self.target_price = get("target_price", None)
+        self.reason = get("reason", None)
+        self.initial_stop_price = get("initial_stop_price", None)
+        self.projected_sell_price = get("projected_sell_price", None)
         # The Database trade_transaction table uses "label"
-        setattr(
-            self,
-            "trade_label",
-            trade_data.get("trade_label", trade_data.get("label", "")),
-        )
-
-        self.expiration_date = trade_data.get("expiration_date", None)
+        self.trade_label = get("trade_label", get("label", ""))
 
         self.is_option = self._determine_if_option()
+        self._multiplier = OPTIONS_MULTIPLIER if self.is_option else STOCK_MULTIPLIER
 
         # Validation
         if ACTION_MAP.get_full_name(self.action) is None:
@@ -130,11 +175,7 @@ class Trade:
     def __repr__(self) -> str:
         """Human-readable representation showing all attributes with detailed list items"""
         attrs = []
-        for key, value in self.__dict__.items():
-            # Skip internal attributes
-            if key.startswith("_"):
-                continue
-
+        for key, value in zip(self._FIELDS, self._get_fields(self)):
             # Format datetime objects
             if isinstance(value, datetime):
                 value = value.strftime("%Y-%m-%d %H:%M:%S")
@@ -148,7 +189,7 @@ class Trade:
                     items = []
                     for i, item in enumerate(value):
                         # For Trade objects, show their full representation
-                        if isinstance(item, Trade):
+                        if isinstance(item, (Trade, SellAllocation)):
                             # Create a compact representation
                             trade_repr = (
                                 f"\n{item.__class__.__name__}("
@@ -159,7 +200,7 @@ class Trade:
                                 f"account={item.account}, "
                             )
                             # Add profit/loss for SellTrades
-                            if isinstance(item, SellTrade):
+                            if isinstance(item, (SellTrade, SellAllocation)):
                                 trade_repr += f", basis_price={item.basis_price}"
                                 trade_repr += f", basis_amt={item.basis_amt}"
                                 trade_repr += f", profit_loss={item.profit_loss}"
@@ -193,48 +234,24 @@ class Trade:
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to a JSON-serializable dictionary"""
-        result = {}
-        for key, value in self.__dict__.items():
-            # Skip private attributes
-            if key.startswith("_"):
-                continue
-
+        result = dict(zip(self._FIELDS, self._get_fields(self)))
+        for key, value in result.items():
             # Convert datetimes to ISO strings
             if isinstance(value, datetime):
                 result[key] = value.isoformat()
-            elif key == "sells" and isinstance(value, list):
-                result[key] = [sell.to_dict() for sell in value]
-            else:
-                result[key] = value
         return result
 
-
     @staticmethod
     def _convert_to_datetime(trade_date_str: str) -> datetime:
-
-        for fmt in ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"):
-            try:
-                trade_date = datetime.strptime(trade_date_str, fmt)
-                return trade_date
-            except ValueError:
-                continue
-
-        raise ValueError(
-            f"trade.trade_date_str format must be: '%Y-%m-%d' or '%Y-%m-%dT%H:%M:%S', got: {trade_date_str}"
-        )
+        return _parse_trade_date(trade_date_str)
 
     @property
     def multiplier(self) -> int:
-        """Return multiplier based on security type"""
-        return OPTIONS_MULTIPLIER if self.is_option else STOCK_MULTIPLIER
+        """Return multiplier based on security type (fixed at construction)"""
+        return self._multiplier
 
     def _determine_if_option(self) -> bool:
         """Determine if this trade is for an option based on trade type or action"""
-        if not hasattr(self, "trade_type"):
-            raise AttributeError(
-                f"Trade {self.trade_id} is missing trade_type attribute"
-            )
-
         # Option if trade type is Call/Put or action is expiration/exercise
         return self.trade_type in ("C", "P") or self.action in (Action.EXPIRED, Action.EXERCISED)
 
@@ -276,6 +293,20 @@ class Trade:
 class BuyTrade(Trade):
     """Class representing a buy trade with position management"""
 
+    __slots__ = (
+        "is_buy_trade",
+        "current_sold_qty",
+        "current_basis_sold_amt",
+        "current_sold_amt",
+        "current_profit_loss",
+        "current_percent_profit_loss",
+        "closed_date",
+        "sells",
+    )
+
+    _FIELDS = Trade._FIELDS + __slots__
+    _get_fields = attrgetter(*_FIELDS)
+
     def __init__(self, trade_data: TradeData):
         super().__init__(trade_data)
         self.is_buy_trade: bool = True
@@ -285,7 +316,7 @@ class BuyTrade(Trade):
         self.current_profit_loss: float = 0.0
         self.current_percent_profit_loss: float = 0.0
         self.closed_date: Optional[datetime] = None
-        self.sells: List[SellTrade] = []
+        self.sells: List[SellAllocation] = []
 
     def __repr__(self) -> str:
         """Enhanced representation for buy trades"""
@@ -302,21 +333,20 @@ class BuyTrade(Trade):
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to JSON-serializable dictionary"""
-        return super().to_dict()
+        result = super().to_dict()
+        result["sells"] = [sell.to_dict() for sell in self.sells]
+        return result
 
-    def apply_sell_trade(self, sell_trade: "SellTrade") -> "SellTrade":
+    def apply_sell_trade(self, sell_trade: "SellTrade") -> "SellAllocation":
         """Apply a sell trade to this position and return applied portion"""
-        applied_sell = copy.deepcopy(sell_trade)
         qty_to_close = self.quantity - self.current_sold_qty
         applied_qty = round(min(sell_trade.quantity, qty_to_close), 4)
         logging.debug(
             f"[{self.symbol}] Apply sell {sell_trade.trade_id} to buy {self.trade_id} - applied_qty: {applied_qty}"
         )
 
-        applied_sell.quantity = applied_qty
-        applied_sell.amount = round(
-            applied_qty * applied_sell.price * self.multiplier, 2
-        )
+        applied_amt = round(applied_qty * sell_trade.price * self.multiplier, 2)
+        basis_amt = applied_qty * self.price * self.multiplier
 
         # Round after every accumulation, not just on the sell side — without
         # this, repeated partial fills can leave current_sold_qty a hair below
@@ -324,12 +354,10 @@ class BuyTrade(Trade):
         # becomes True and apply_sell_trades spins forever applying 0.0 qty.
         self.current_sold_qty = round(self.current_sold_qty + applied_qty, 4)
         sell_trade.quantity = round(sell_trade.quantity - applied_qty, 4)
-        sell_trade.amount -= applied_sell.amount
+        sell_trade.amount -= applied_amt
         # TODO test in test_trade.py
-        self.current_sold_amt += applied_sell.amount
-        self.current_basis_sold_amt += applied_qty * self.price * self.multiplier
-        applied_sell.basis_price = self.price
-        applied_sell.basis_amt = applied_qty * self.price * self.multiplier
+        self.current_sold_amt += applied_amt
+        self.current_basis_sold_amt += basis_amt
 
         logging.debug(
             f"[{self.symbol}] Buy current_sold_qty: {self.current_sold_qty} buy original quantity: {self.quantity}"
@@ -341,9 +369,16 @@ class BuyTrade(Trade):
         logging.debug(f"[{self.symbol}] Sell trade_quantity: {sell_trade.quantity}")
         # Sell trade is removed if it's done
         sell_trade.is_done = sell_trade.quantity == 0
-        # Applied sell will track the sell trades status.
-        applied_sell.is_done = sell_trade.quantity == 0
 
+        # Applied portion tracks the sell trade's status
+        applied_sell = SellAllocation(
+            sell_trade,
+            quantity=applied_qty,
+            amount=applied_amt,
+            basis_price=self.price,
+            basis_amt=basis_amt,
+            is_done=sell_trade.is_done,
+        )
         applied_sell.calculate_profit_loss()
 
         self.sells.append(applied_sell)  # This portion of sell is included with buy
@@ -385,6 +420,16 @@ class BuyTrade(Trade):
 class SellTrade(Trade):
     """Class representing a sell trade with P&L calculation"""
 
+    __slots__ = (
+        "basis_price",
+        "basis_amt",
+        "profit_loss",
+        "percent_profit_loss",
+    )
+
+    _FIELDS = Trade._FIELDS + __slots__
+    _get_fields = attrgetter(*_FIELDS)
+
     def __init__(self, trade_data: TradeData):
         super().__init__(trade_data)
         # TODO: Add basis price  and basis_amt to test_trade.py
@@ -404,10 +449,6 @@ class SellTrade(Trade):
             + f")\n",
         )
 
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to JSON-serializable dictionary"""
-        return super().to_dict()
-
     def calculate_profit_loss(self) -> None:
         """Calculate profit/loss against this sell's basis (set when applied to a buy)."""
         price_diff = abs(self.price) - self.basis_price
@@ -416,3 +457,64 @@ class SellTrade(Trade):
         self.percent_profit_loss = (
             round((amount_diff / self.basis_amt) * 100, 2) if self.basis_amt != 0 else 0
         )
+
+
+class SellAllocation:
+    """The portion of a sell trade matched against one buy.
+
+    A sell that closes several buys used to be deep-copied once per buy;
+    an allocation instead references the parent SellTrade and stores only
+    what differs per match — quantity, amount, basis and P&L. Every other
+    attribute (trade_id, trade_date, price, account, ...) is read from the
+    parent, and to_dict emits the same fields as SellTrade.to_dict.
+    """
+
+    __slots__ = (
+        "sell",
+        "quantity",
+        "amount",
+        "is_done",
+        "basis_price",
+        "basis_amt",
+        "profit_loss",
+        "percent_profit_loss",
+    )
+
+    _FIELDS = SellTrade._FIELDS
+    _get_fields = attrgetter(*_FIELDS)
+
+    def __init__(
+        self,
+        sell: SellTrade,
+        quantity: float,
+        amount: float,
+        basis_price: float,
+        basis_amt: float,
+        is_done: bool,
+        profit_loss: float = 0.0,
+        percent_profit_loss: float = 0.0,
+    ):
+        self.sell = sell
+        self.quantity = quantity
+        self.amount = amount
+        self.is_done = is_done
+        self.basis_price = basis_price
+        self.basis_amt = basis_amt
+        self.profit_loss = profit_loss
+        self.percent_profit_loss = percent_profit_loss
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not stored on the allocation
+        if name == "sell":
+            raise AttributeError(name)
+        return getattr(self.sell, name)
+
+    def __repr__(self) -> str:
+        return (
+            f"SellAllocation(trade_id={self.sell.trade_id}, quantity={self.quantity}, "
+            f"amount={self.amount}, basis_price={self.basis_price}, "
+            f"profit_loss={self.profit_loss}, is_done={self.is_done})"
+        )
+
+    to_dict = Trade.to_dict
+    calculate_profit_loss = SellTrade.calculate_profit_loss
@@ -2,7 +2,7 @@ from dataclasses import dataclass, field
 from dataclasses_json import dataclass_json
 from datetime import datetime
 import logging
-from typing import List, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 from lib.models.Trade import BuyTrade, SellTrade
 from lib.models.Trades import BuyTrades
 from lib.constants import OPTIONS_MULTIPLIER, STOCK_MULTIPLIER
@@ -119,6 +119,41 @@ class TradeSummary:
 
         return trade_summary
 
+    @classmethod
+    def create_from_trade_rows(
+        cls,
+        symbol: str,
+        is_option: bool,
+        buy_rows: List[Dict[str, Any]],
+        account: Optional[str] = None,
+        after_date: Optional[str] = None,
+    ) -> "TradeSummary":
+        """Summarize already-matched buy trades from their serialized form.
+
+        Counterpart of create_from_buy_trades_collection followed by
+        process_all_trades, for BuyTrade.to_dict() rows (with their "sells")
+        taken from an analysis result — used to derive a filtered view of a
+        symbol without converting and re-matching its trades. The rows must
+        be in the order the analysis produced them.
+        """
+        trade_summary = cls(
+            symbol=symbol, is_option=is_option, account=account, after_date=after_date
+        )
+        for row in buy_rows:
+            trade_summary.bought_quantity += row["quantity"]
+            trade_summary.bought_amount += row["amount"]
+            for sell in row["sells"]:
+                trade_summary.sold_quantity += sell["quantity"]
+                trade_summary.sold_amount += sell["amount"]
+
+        trade_summary.get_average_bought_price()
+        trade_summary.get_average_sold_price()
+        trade_summary._add_final_totals(
+            (row["quantity"], row["price"], row["is_done"], row["current_profit_loss"])
+            for row in buy_rows
+        )
+        return trade_summary
+
     def get_average_bought_price(self) -> float:
         """Calculate the average bought price."""
         if self.bought_quantity == 0:
@@ -238,77 +273,70 @@ class TradeSummary:
         security_type = "option" if self.is_option else "stock"
         logging.info(f"[{symbol}] Adding final totals to {security_type} summary")
 
-        multiplier = (
-            OPTIONS_MULTIPLIER if security_type == "option" else STOCK_MULTIPLIER
-        )
-        running_bought_quantity = 0
-        running_sold_quantity = 0
-        running_sold_amount = 0
-        all_buy_trades = []
-
         if not len(self.buy_trades):
             logging.info(f"[{symbol}] {security_type} has no buy trades")
             if self.bought_quantity > 0:
-                missing = self.bought_quantity - running_bought_quantity
                 raise Exception(
-                    f"[{symbol}] Is missing {missing} {security_type} buy trades"
+                    f"[{symbol}] Is missing {self.bought_quantity} {security_type} buy trades"
                 )
 
         logging.info(
             f"[{symbol}] {security_type} Buy  trade count: {len(self.buy_trades)}"
         )
 
-        for current_buy_record in self.buy_trades:
-            running_bought_quantity += current_buy_record.quantity
+        # The caller keeps the returned list; clear our copy so the summary
+        # serializes without embedding every trade (matches prior behavior).
+        all_buy_trades = self.buy_trades
+        self.buy_trades = []
+
+        self._add_final_totals(
+            (t.quantity, t.price, t.is_done, t.current_profit_loss)
+            for t in all_buy_trades
+        )
+
+        return all_buy_trades
 
-            logging.debug(
-                f"[{symbol}] Buy Trade: {current_buy_record.trade_id}"
-                + f"[{symbol}] Running {security_type} bought qty: {running_bought_quantity}"
-            )
+    def _add_final_totals(self, lots: Iterable[Tuple[float, float, bool, float]]) -> None:
+        """Closed/open totals and win/loss counts, from each buy trade's
+        (quantity, price, is_done, current_profit_loss) in matching order.
+
+        The sold quantity is assigned to buys first-in-first-out: each buy
+        takes as much of what is still unassigned as its own quantity.
+        """
+        running_sold_quantity = 0
+        running_sold_amount = 0
+        winning_trades_count = 0
+        losing_trades_count = 0
 
+        for quantity, price, is_done, profit_loss in lots:
             # The sold Quantity that can be matched with this buy record
             unmatched_sold_quantity = self.sold_quantity - running_sold_quantity
-            sold_quantity_this_trade = 0
-
-            if current_buy_record.quantity <= unmatched_sold_quantity:
+            if quantity <= unmatched_sold_quantity:
                 # This Buy record has matching sells
-                sold_quantity_this_trade = current_buy_record.quantity
+                sold_quantity_this_trade = quantity
             else:
                 # Buy record will have some open trades after this
                 sold_quantity_this_trade = unmatched_sold_quantity
 
             running_sold_quantity += sold_quantity_this_trade
-
-            logging.debug(
-                f"[{symbol}] Unmatched {security_type} sold quantity: {unmatched_sold_quantity}"
-                + f"[{symbol}] Current closed_{security_type} bought_quantity: {sold_quantity_this_trade}"
-                + f"[{symbol}] Running {security_type} sold quantity: {running_sold_quantity}"
-            )
-
             # The 'bought' amount for these matching sells. Bought amount is negative.
-            running_sold_amount += (
-                -current_buy_record.price * sold_quantity_this_trade * multiplier
-            )
+            running_sold_amount += -price * sold_quantity_this_trade * self.multiplier
 
-            all_buy_trades.append(current_buy_record)
-
-        # The caller keeps the returned list; clear our copy so the summary
-        # serializes without embedding every trade (matches prior behavior).
-        self.buy_trades = []
+            # Win/loss counts come from fully closed trades
+            if is_done and profit_loss > 0:
+                winning_trades_count += 1
+            elif is_done and profit_loss < 0:
+                losing_trades_count += 1
 
         self.calculate_final_totals(running_sold_quantity, running_sold_amount)
 
-        # Compute win/loss counts from fully closed trades
-        done_trades = [t for t in all_buy_trades if t.is_done]
-        self.winning_trades_count = sum(1 for t in done_trades if t.current_profit_loss > 0)
-        self.losing_trades_count = sum(1 for t in done_trades if t.current_profit_loss < 0)
-        total_decided = self.winning_trades_count + self.losing_trades_count
+        self.winning_trades_count = winning_trades_count
+        self.losing_trades_count = losing_trades_count
+        total_decided = winning_trades_count + losing_trades_count
         self.batting_average = (
-            round(self.winning_trades_count / total_decided, 3) if total_decided > 0 else 0.0
+            round(winning_trades_count / total_decided, 3) if total_decided > 0 else 0.0
         )
 
-        return all_buy_trades
-
     def security_summary_sanity_check(self, symbol: str) -> None:
 
         if self.symbol != symbol:
@@ -2,7 +2,7 @@ from __future__ import annotations
 import logging
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict, List, Optional, TypeVar, MutableSequence
+from typing import Any, Dict, Hashable, List, Optional, TypeVar, MutableSequence
 from lib.models.Trade import Trade, BuyTrade, SellTrade
 
 
@@ -89,6 +89,28 @@ class Trades(TradeCollection):
             )
             self._sort_trades(self.sells_by_account[account])
 
+    @staticmethod
+    def match_key(trade: Trade, match_label: bool = False) -> Hashable:
+        """Key a buy and a sell must share to match: the account, plus the
+        trade_label (option contract) when match_label is set."""
+        return (trade.account, trade.trade_label) if match_label else trade.account
+
+    def sell_queues(self, match_label: bool = False) -> Dict[Hashable, List[SellTrade]]:
+        """Bucket the sells by match_key, keeping each bucket in sorted order.
+
+        A buy then only walks the sells that can match it, instead of
+        skipping past every other contract in its account. Call after
+        sort_trades(); the queues are new lists, so consuming them leaves
+        sells_by_account intact.
+        """
+        if not match_label:
+            return {account: list(sells) for account, sells in self.sells_by_account.items()}
+        queues: Dict[Hashable, List[SellTrade]] = {}
+        for account_sells in self.sells_by_account.values():
+            for sell in account_sells:
+                queues.setdefault(self.match_key(sell, True), []).append(sell)
+        return queues
+
 
 @dataclass
 class BuyTrades(TradeCollection):
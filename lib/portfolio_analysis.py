@@ -0,0 +1,181 @@
+"""
+Cross-symbol analysis, serially or fanned out over a process pool.
+
+A portfolio-wide analysis is hundreds of independent TradingAnalyzer runs —
+CPU-bound Python that a single gunicorn worker runs on one core. With
+workers > 1, symbol groups are handed to a ProcessPoolExecutor as
+pre-fetched row batches (symbol, transaction dicts, lot-ledger allocations);
+the workers never touch the database and return the JSON-serializable
+results, which are merged back in symbol order.
+
+Shipping rows to another process and the results back costs more than
+analyzing a small portfolio in place, so groups below min_parallel run
+serially. bin/benchmark_parallel_analysis.py measures the crossover point.
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from lib.lot_matching import Allocation, AllocationMismatchError
+from lib.trading_analyzer import TradingAnalyzer
+
+log = logging.getLogger(__name__)
+
+# Symbol groups below this run serially even when workers > 1
+DEFAULT_MIN_PARALLEL = 50
+
+# Batches per worker: enough to even out symbols of very different sizes
+BATCHES_PER_WORKER = 4
+
+# (symbol, transactions, allocations or None)
+SymbolGroup = Tuple[str, List[dict], Optional[List[Allocation]]]
+# (symbol, result or None, error or None, ledger_stale)
+SymbolResult = Tuple[str, Optional[dict], Optional[str], bool]
+
+_pool_lock = threading.Lock()
+_pool = None
+_pool_workers = 0
+
+
+def analyze_transactions(symbol, transactions, allocations, status="all",
+                         account=None, after_date=None):
+    """Analyze fetched rows, on the lot ledger's allocations when given.
+
+    Raises AllocationMismatchError if the allocations don't fit the rows.
+    """
+    analyzer = TradingAnalyzer(symbol, transactions)
+    if allocations is None:
+        analyzer.analyze_trades(status=status, account=account, after_date=after_date)
+    else:
+        analyzer.analyze_trades(
+            status=status, account=account, after_date=after_date,
+            engine="ledger", allocations=allocations,
+        )
+    return analyzer
+
+
+def analyze_group(symbol, transactions, allocations, status="all",
+                  summary_only=False) -> SymbolResult:
+    """Analyze one symbol without raising.
+
+    With summary_only, the result has no all_trades lists (see
+    TradingAnalyzer.get_profit_loss_data_json).
+
+    Allocations that don't fit the rows fall back to matching in full, and
+    the result is flagged so the caller knows that symbol's ledger is behind.
+    """
+    try:
+        try:
+            analyzer = analyze_transactions(symbol, transactions, allocations, status=status)
+            ledger_stale = False
+        except AllocationMismatchError as e:
+            log.info(f"[{symbol}] Lot ledger out of date ({e}), matching in full")
+            analyzer = analyze_transactions(symbol, transactions, None, status=status)
+            ledger_stale = True
+        return (
+            symbol, analyzer.get_profit_loss_data_json(summary_only=summary_only),
+            None, ledger_stale,
+        )
+    except Exception as e:
+        return symbol, None, str(e), False
+
+
+def analyze_batch(batch: List[SymbolGroup], status="all",
+                  summary_only=False) -> List[SymbolResult]:
+    """Process-pool task: analyze a batch of symbol groups."""
+    return [analyze_group(*group, status=status, summary_only=summary_only) for group in batch]
+
+
+def analyze_groups(
+    groups: Iterable[SymbolGroup],
+    status="all",
+    workers=0,
+    min_parallel=DEFAULT_MIN_PARALLEL,
+    summary_only=False,
+) -> Iterator[SymbolResult]:
+    """Analyze symbol groups, in parallel when it pays off.
+
+    Args:
+        groups: (symbol, transactions, allocations) tuples. Consumed lazily
+            when running serially.
+        status: Analyzer status filter ('all', 'open' or 'closed').
+        workers: Process-pool size; 0 or 1 always runs serially.
+        min_parallel: Fewer groups than this run serially.
+        summary_only: Results without all_trades lists.
+
+    Yields:
+        (symbol, result, error, ledger_stale) per group, in input order.
+    """
+    if workers <= 1:
+        for group in groups:
+            yield analyze_group(*group, status=status, summary_only=summary_only)
+        return
+
+    groups = list(groups)
+    if len(groups) < min_parallel:
+        for group in groups:
+            yield analyze_group(*group, status=status, summary_only=summary_only)
+        return
+
+    try:
+        results = _run_in_pool(groups, status, workers, summary_only)
+    except BrokenProcessPool as e:
+        log.warning(f"[analyze_groups] Process pool failed ({e}), running serially")
+        shutdown_pool()
+        results = {
+            group[0]: analyze_group(*group, status=status, summary_only=summary_only)
+            for group in groups
+        }
+    for group in groups:
+        yield results[group[0]]
+
+
+def _run_in_pool(groups, status, workers, summary_only=False):
+    """Split groups into size-balanced batches and run them on the pool."""
+    n_batches = min(len(groups), workers * BATCHES_PER_WORKER)
+    batches = [[] for _ in range(n_batches)]
+    # Largest symbols first, dealt round-robin, so no batch ends up with all the big ones
+    for i, group in enumerate(sorted(groups, key=lambda g: len(g[1]), reverse=True)):
+        batches[i % n_batches].append(group)
+
+    pool = _get_pool(workers)
+    futures = [pool.submit(analyze_batch, batch, status, summary_only) for batch in batches]
+    return {result[0]: result for future in futures for result in future.result()}
+
+
+def _get_pool(workers):
+    """Shared pool, created on first use (after any gunicorn fork)."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # Not fork: the web process has threads and an open database
+            method = (
+                "forkserver"
+                if "forkserver" in multiprocessing.get_all_start_methods()
+                else "spawn"
+            )
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context(method)
+            )
+            _pool_workers = workers
+            log.info(f"[analyze_groups] Started {workers} analysis worker processes")
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the shared worker pool, if one was started."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+
+
+atexit.register(shutdown_pool)
@@ -0,0 +1,150 @@
+"""
+Profilers for a single request: cProfile (pstats) and a stack sampler
+(speedscope).
+
+cProfile hooks every function call, so it gives exact call counts but
+inflates call-heavy code such as lot matching. StackSampler instead
+snapshots one thread's stack every `interval` seconds from a background
+thread (sys._current_frames), which barely slows the thread it watches and
+keeps whole call stacks, so the result opens as a flame graph in
+https://www.speedscope.app.
+
+Both are stdlib-only; neither costs anything until it is started.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Seconds between stack samples
+DEFAULT_SAMPLE_INTERVAL = 0.002
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# (function name, file, first line) of a stack frame
+FrameKey = Tuple[str, str, int]
+
+
+class StackSampler:
+    """Samples one thread's call stack on a timer."""
+
+    def __init__(self, thread_id: Optional[int] = None,
+                 interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.interval = interval
+        # (perf_counter time, stack outermost-first) per sample
+        self.samples: List[Tuple[float, Tuple[FrameKey, ...]]] = []
+        self.started: Optional[float] = None
+        self.stopped: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.samples.append((time.perf_counter(), tuple(stack)))
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        """The samples as a speedscope "sampled" profile document.
+
+        Each sample is weighted by the time since the previous one, so the
+        flame graph's widths add up to wall time.
+        """
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[FrameKey, int] = {}
+        samples = []
+        weights = []
+        previous = self.started
+        for sampled_at, stack in self.samples:
+            indices = []
+            for key in stack:
+                index = frame_index.get(key)
+                if index is None:
+                    index = frame_index[key] = len(frames)
+                    frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                indices.append(index)
+            samples.append(indices)
+            weights.append(sampled_at - previous)
+            previous = sampled_at
+
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "lib.profiling",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": (self.stopped or previous) - self.started,
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def save(self, path: str, name: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.speedscope(name), f)
+
+
+class CallProfiler:
+    """cProfile over the calls made between start() and stop() on this thread."""
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def save(self, path: str, name: str) -> None:
+        """Write pstats data (read it with pstats.Stats(path) or snakeviz)."""
+        self._profile.dump_stats(path)
+
+
+# X-Profile header value -> (profiler class, file suffix)
+PROFILERS = {
+    "pstats": (CallProfiler, ".pstats"),
+    "speedscope": (StackSampler, ".speedscope.json"),
+}
+
+
+def prune_profiles(directory: str, keep: int) -> List[str]:
+    """Delete all but the `keep` newest profiles in directory; returns the deleted names."""
+    suffixes = tuple(suffix for _, suffix in PROFILERS.values())
+    entries = sorted(
+        (entry for entry in os.scandir(directory)
+         if entry.is_file() and entry.name.endswith(suffixes)),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    deleted = []
+    for entry in entries[keep:]:
+        os.remove(entry.path)
+        deleted.append(entry.name)
+    return deleted
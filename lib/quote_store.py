@@ -0,0 +1,141 @@
+"""
+Latest market prices, stored in SQLite with a per-entry expiry.
+
+Holdings used to price every open position through YahooFinance: one JSON
+file per ticker under data/yfinance, an mtime check per call, and a
+Ticker.info round trip per stale ticker, eight at a time — so the page got
+slower with every position opened. quote_cache holds one price per ticker
+instead, shared by every worker process. A lookup reads all of them in one
+query and refreshes the expired ones with a single multi-ticker fetch
+(lib.yfinance.download_prices in production, an offline fake in tests).
+
+Each row carries its own expires_at: a price is trusted for
+QUOTE_TTL_SECONDS, while a ticker Yahoo had no price for (an illiquid or
+expired option) is retried sooner, after MISSING_QUOTE_TTL_SECONDS. So is
+a ticker the fetch could not reach at all: it keeps its last price, or gets
+a placeholder row with no price if it never had one, so a Yahoo outage
+costs one failed fetch per MISSING_QUOTE_TTL_SECONDS rather than one per
+lookup.
+"""
+import logging
+import time
+from collections import namedtuple
+from typing import Callable, Dict, Iterable, Mapping, Optional
+
+from lib.db_utils import MAX_IN_PARAMS
+
+log = logging.getLogger(__name__)
+
+QUOTE_TTL_SECONDS = 5 * 60
+MISSING_QUOTE_TTL_SECONDS = 60
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS quote_cache (
+        symbol TEXT PRIMARY KEY,
+        price REAL,
+        fetched_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    ''',
+)
+
+# price is None when Yahoo had no price for the ticker
+Quote = namedtuple('Quote', 'price fetched_at expires_at')
+
+# tickers -> {ticker: price or None}; tickers missing from the result failed
+QuoteFetcher = Callable[[list], Mapping[str, Optional[float]]]
+
+
+class QuoteStore:
+    """Reads and writes the quote_cache table through a DatabaseInserter."""
+
+    def __init__(self, db, ttl: float = QUOTE_TTL_SECONDS,
+                 missing_ttl: float = MISSING_QUOTE_TTL_SECONDS):
+        self.db = db
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        for statement in SCHEMA:
+            self.db.cursor.execute(statement)
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, Quote]:
+        """Return {symbol: Quote} for every stored symbol, expired or not."""
+        symbols = list(dict.fromkeys(symbols))
+        quotes = {}
+        for i in range(0, len(symbols), MAX_IN_PARAMS):
+            chunk = symbols[i:i + MAX_IN_PARAMS]
+            self.db.cursor.execute(
+                'SELECT symbol, price, fetched_at, expires_at FROM quote_cache '
+                f'WHERE symbol IN ({", ".join("?" for _ in chunk)})',
+                chunk,
+            )
+            for symbol, *quote in self.db.cursor.fetchall():
+                quotes[symbol] = Quote(*quote)
+        return quotes
+
+    @staticmethod
+    def expired(symbols: Iterable[str], quotes: Mapping[str, Quote], now: float) -> list:
+        """The symbols in quotes (from get_many) with no quote or an expired one, in order."""
+        return [s for s in dict.fromkeys(symbols) if s not in quotes or quotes[s].expires_at <= now]
+
+    def put_many(self, prices: Mapping[str, Optional[float]],
+                 now: Optional[float] = None) -> Dict[str, Quote]:
+        """Store freshly fetched prices (None for no price); returns them as Quotes."""
+        now = time.time() if now is None else now
+        quotes = {
+            symbol: Quote(price, now, now + (self.ttl if price is not None else self.missing_ttl))
+            for symbol, price in prices.items()
+        }
+        if quotes:
+            with self.db.transaction():
+                self.db.cursor.executemany(
+                    'INSERT OR REPLACE INTO quote_cache (symbol, price, fetched_at, expires_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    [(symbol, *quote) for symbol, quote in quotes.items()],
+                )
+        return quotes
+
+    def retry_later(self, symbols: Iterable[str],
+                    now: Optional[float] = None) -> Dict[str, Quote]:
+        """Put off the next fetch of symbols a refresh failed for by missing_ttl.
+
+        A stored price is kept as it is (fetched_at included, so its age still
+        shows); a symbol with none gets a placeholder row with no price.
+        """
+        now = time.time() if now is None else now
+        symbols = list(dict.fromkeys(symbols))
+        if symbols:
+            with self.db.transaction():
+                self.db.cursor.executemany(
+                    'INSERT INTO quote_cache (symbol, price, fetched_at, expires_at) '
+                    'VALUES (?, NULL, ?, ?) '
+                    'ON CONFLICT(symbol) DO UPDATE SET expires_at = excluded.expires_at',
+                    [(symbol, now, now + self.missing_ttl) for symbol in symbols],
+                )
+        return self.get_many(symbols)
+
+    def refresh(self, symbols: Iterable[str], fetch: QuoteFetcher,
+                now: Optional[float] = None) -> Dict[str, Quote]:
+        """Fetch symbols in one call and store the results.
+
+        Returns:
+            {symbol: Quote} for every symbol. Those the fetch failed for or
+            left out are logged and put off with retry_later.
+        """
+        now = time.time() if now is None else now
+        symbols = list(dict.fromkeys(symbols))
+        started = time.monotonic()
+        try:
+            fetched = fetch(symbols)
+        except Exception as e:
+            log.warning(f'[quotes] Fetching {len(symbols)} quotes failed: {e}')
+            fetched = {}
+        quotes = self.put_many({s: fetched[s] for s in symbols if s in fetched}, now=now)
+        log.info(
+            f'[quotes] Refreshed {len(quotes)}/{len(symbols)} quotes '
+            f'in {time.monotonic() - started:.2f}s'
+        )
+        failed = [s for s in symbols if s not in quotes]
+        if failed:
+            quotes.update(self.retry_later(failed, now=now))
+        return quotes
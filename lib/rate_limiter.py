@@ -0,0 +1,44 @@
+"""
+Client-side rate limiting for outbound API calls.
+
+A TokenBucket refills at `rate` tokens per second up to `capacity`; each
+request takes one token and blocks until one is available. Safe to share
+across threads, so a pool of fetch workers stays under a single request
+budget however many of them are in flight.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/second, bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0 or capacity < 1:
+            raise ValueError('rate must be positive and capacity at least 1')
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, waiting for it if the bucket is empty.
+
+        Returns:
+            Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
@@ -0,0 +1,191 @@
+"""
+Realized P&L per close date, materialized in SQLite.
+
+The P&L-over-time dashboard used to re-analyze every symbol and bucket each
+closed buy trade in Python on every request. realized_pnl_daily instead
+holds one row per (close_date, symbol, asset_type, account) with the
+win/loss counts and P&L sums of the buy lots closed that day, so any period
+— day, week, month, quarter, year, or an arbitrary date range — is a single
+GROUP BY.
+
+Rows are rebuilt a symbol at a time. realized_pnl_version records the
+symbol_version each symbol was materialized at; a symbol whose version has
+moved (a sync, an import, an edit) is stale and is recomputed from its
+closed-trade analysis, while every other symbol is left alone.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS realized_pnl_daily (
+        close_date TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        asset_type TEXT NOT NULL,
+        account TEXT NOT NULL,
+        winning_trades INTEGER NOT NULL,
+        losing_trades INTEGER NOT NULL,
+        trade_count INTEGER NOT NULL,
+        pnl_dollars REAL NOT NULL,
+        pnl_pct_sum REAL NOT NULL,
+        PRIMARY KEY (close_date, symbol, asset_type, account)
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_realized_pnl_daily_symbol
+        ON realized_pnl_daily (symbol)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS realized_pnl_version (
+        symbol TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    ''',
+)
+
+# SQL for each period's bucket key, computed from close_date ('YYYY-MM-DD')
+PERIOD_KEYS = {
+    "day": "close_date",
+    # Monday of the close date's week
+    "week": "date(close_date, 'weekday 0', '-6 days')",
+    "month": "substr(close_date, 1, 7)",
+    "quarter": (
+        "substr(close_date, 1, 4) || '-Q' || "
+        "((CAST(substr(close_date, 6, 2) AS INTEGER) + 2) / 3)"
+    ),
+    "year": "substr(close_date, 1, 4)",
+}
+
+DailyKey = Tuple[str, str, str]  # (close_date, asset_type, account)
+
+
+def daily_rows(result: Optional[dict]) -> Dict[DailyKey, List[float]]:
+    """Aggregate one symbol's closed-trade analysis into daily rows.
+
+    Args:
+        result: A TradingAnalyzer.get_profit_loss_data_json() result for
+            status="closed", or None for a symbol without one.
+
+    Returns:
+        {(close_date, asset_type, account): [wins, losses, count, pnl, pct_sum]}.
+        A closed lot with zero P&L counts as a loss, as on the dashboard.
+    """
+    rows: Dict[DailyKey, List[float]] = defaultdict(lambda: [0, 0, 0, 0.0, 0.0])
+    for asset_type in ("stock", "option"):
+        section = (result or {}).get(asset_type, {})
+        if not section.get("has_trades"):
+            continue
+        for trade in section.get("all_trades", []):
+            if not trade.get("is_buy_trade") or not trade.get("is_done"):
+                continue
+            try:
+                close_date = datetime.fromisoformat(trade.get("closed_date")).date()
+            except (ValueError, TypeError):
+                continue
+
+            pnl = trade.get("current_profit_loss", 0.0) or 0.0
+            row = rows[(close_date.isoformat(), asset_type, trade.get("account") or "")]
+            row[0 if pnl > 0 else 1] += 1
+            row[2] += 1
+            row[3] += pnl
+            row[4] += trade.get("current_percent_profit_loss", 0.0) or 0.0
+    return rows
+
+
+class RealizedPnl:
+    """Reads and writes the realized_pnl_daily table through a DatabaseInserter."""
+
+    def __init__(self, db):
+        self.db = db
+        for statement in SCHEMA:
+            self.db.cursor.execute(statement)
+
+    def stale_symbols(self, versions: Dict[str, int]) -> Set[str]:
+        """Symbols to rebuild: version moved, never materialized, or gone.
+
+        Args:
+            versions: {symbol: current symbol_version} for every traded symbol.
+        """
+        self.db.cursor.execute('SELECT symbol, version FROM realized_pnl_version')
+        materialized = dict(self.db.cursor.fetchall())
+        stale = {s for s, v in versions.items() if materialized.get(s) != v}
+        return stale | (materialized.keys() - versions.keys())
+
+    def replace(self, entries: Dict[str, Tuple[Optional[int], Dict[DailyKey, List[float]]]]) -> None:
+        """Swap in new daily rows for each symbol in one transaction.
+
+        Args:
+            entries: {symbol: (version, daily_rows(...))}. A version of None
+                forgets the symbol entirely (it no longer has trades).
+        """
+        cursor = self.db.cursor
+        with self.db.transaction():
+            cursor.executemany(
+                'DELETE FROM realized_pnl_daily WHERE symbol = ?', [(s,) for s in entries]
+            )
+            cursor.executemany(
+                'INSERT INTO realized_pnl_daily (close_date, symbol, asset_type, account, '
+                'winning_trades, losing_trades, trade_count, pnl_dollars, pnl_pct_sum) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (close_date, symbol, asset_type, account, *row)
+                    for symbol, (_, rows) in entries.items()
+                    for (close_date, asset_type, account), row in rows.items()
+                ],
+            )
+            cursor.executemany(
+                'DELETE FROM realized_pnl_version WHERE symbol = ?',
+                [(s,) for s, (version, _) in entries.items() if version is None],
+            )
+            cursor.executemany(
+                'INSERT OR REPLACE INTO realized_pnl_version (symbol, version) VALUES (?, ?)',
+                [(s, version) for s, (version, _) in entries.items() if version is not None],
+            )
+
+    def clear(self) -> None:
+        with self.db.transaction():
+            self.db.cursor.execute('DELETE FROM realized_pnl_daily')
+            self.db.cursor.execute('DELETE FROM realized_pnl_version')
+
+    def buckets(
+        self,
+        period: str,
+        asset_types: Iterable[str] = ("stock", "option"),
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> List[dict]:
+        """Sum the daily rows into period buckets, oldest first.
+
+        Args:
+            period: One of PERIOD_KEYS.
+            asset_types: Sections to include ('stock', 'option').
+            start, end: Inclusive 'YYYY-MM-DD' close-date bounds.
+
+        Returns:
+            [{period, winning_trades, losing_trades, trade_count, pnl_dollars,
+              pnl_pct_sum}] with period the bucket key (e.g. '2024-Q3').
+        """
+        asset_types = list(asset_types)
+        where = [f"asset_type IN ({', '.join('?' for _ in asset_types)})"]
+        params: list = asset_types
+        if start:
+            where.append('close_date >= ?')
+            params.append(start)
+        if end:
+            where.append('close_date <= ?')
+            params.append(end)
+
+        self.db.cursor.execute(
+            f'SELECT {PERIOD_KEYS[period]} AS period, SUM(winning_trades), '
+            'SUM(losing_trades), SUM(trade_count), SUM(pnl_dollars), SUM(pnl_pct_sum) '
+            f'FROM realized_pnl_daily WHERE {" AND ".join(where)} '
+            'GROUP BY period ORDER BY period',
+            params,
+        )
+        columns = ('period', 'winning_trades', 'losing_trades', 'trade_count',
+                   'pnl_dollars', 'pnl_pct_sum')
+        return [dict(zip(columns, row)) for row in self.db.cursor.fetchall()]
@@ -0,0 +1,57 @@
+"""
+Time spent per category (SQL, analysis, Yahoo) within one web request.
+
+The request middleware opens a tally with start() and reads it back with
+current() when the response goes out; code anywhere below it adds to the
+tally with record() or the timed() context manager. The tally lives in a
+ContextVar, so concurrent requests on different threads each see their
+own, and work done outside a request — the CLI, a background thread such
+as the quote refresher — finds no tally and records nothing.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, Optional
+
+# Categories the middleware reports, in Server-Timing order
+SQL = "sql"
+ANALYSIS = "analysis"
+YAHOO = "yahoo"
+CATEGORIES = (SQL, ANALYSIS, YAHOO)
+
+_tally: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timing", default=None)
+
+
+def start() -> Token:
+    """Open an empty tally for the current context; pass the token to finish()."""
+    return _tally.set({})
+
+
+def finish(token: Token) -> None:
+    """Close the tally opened by start()."""
+    _tally.reset(token)
+
+
+def current() -> Dict[str, float]:
+    """Seconds recorded per category so far ({} outside a request)."""
+    return dict(_tally.get() or {})
+
+
+def record(category: str, seconds: float) -> None:
+    """Add seconds to the current request's category, if there is a request."""
+    tally = _tally.get()
+    if tally is not None:
+        tally[category] = tally.get(category, 0.0) + seconds
+
+
+@contextmanager
+def timed(category: str) -> Iterator[None]:
+    """Record the block's wall time under category."""
+    if _tally.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(category, time.perf_counter() - started)
@@ -0,0 +1,201 @@
+"""
+Bulk import of Schwab transaction CSV exports.
+
+bin/process_schwab_transactions.py normally runs each CSV row through
+process_schwab_transactions_row: CSVProcessor's regex/strptime helpers, then
+an existence check and an insert that each commit on their own. That is
+minutes for a multi-year export. This module does the same normalization a
+column at a time with pandas — symbol fallback, price/quantity parsing,
+option-label extraction, amounts — and hands the whole batch to
+DatabaseInserter.insert_transactions, which dedupes set-wise and inserts
+with executemany in one transaction.
+
+The result matches the row pipeline row for row: the same rows are skipped,
+the same records are stored and written to the output CSV. Dates are parsed
+once per distinct value with CSVProcessor.convert_trade_date (an export has
+a few hundred distinct dates), and amounts are rounded with Python's round
+like calculate_amount does.
+"""
+import csv
+import logging
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lib.csv_processing_utils import CSVProcessor, default_symbol, option_label_pattern
+
+log = logging.getLogger(__name__)
+
+# Actions CSVProcessor.is_option_trade treats as option trades
+OPTION_ACTION_PATTERN = "Open|Close|Expired|Exercise"
+
+
+def read_export(path: str) -> pd.DataFrame:
+    """Read a Schwab CSV export with every field as a string, like csv.DictReader."""
+    return pd.read_csv(path, dtype=str, keep_default_na=False).fillna("")
+
+
+def _to_float(column: pd.Series) -> pd.Series:
+    """CSVProcessor.convert_to_float over a column; NaN where it returns None."""
+    return pd.to_numeric(column.str.replace(r"[^\d\.]", "", regex=True), errors="coerce")
+
+
+def _map_distinct(column: pd.Series, fn) -> pd.Series:
+    """Apply fn once per distinct value of column."""
+    return column.map({value: fn(value) for value in column.unique()})
+
+
+def _round_cents(values: np.ndarray) -> List[float]:
+    return [round(v, 2) for v in values.tolist()]
+
+
+def normalize_transactions(
+    frame: pd.DataFrame, account: str, processor: CSVProcessor
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Turn one export's rows into trade_transaction records.
+
+    Args:
+        frame: Rows as read by read_export.
+        account: Account code the export belongs to ('C', 'R', 'I').
+        processor: Supplies the action mapping and date parsing.
+
+    Returns:
+        (records, skipped rows) — records in input order, shaped like
+        process_schwab_transactions_row's return value (amount None for
+        non-trade actions); skipped rows are the raw row dicts.
+    """
+    action = frame["Action"]
+    description = frame["Description"]
+
+    # CSVProcessor.extract_symbol_from_description for rows without a Symbol
+    from_description = description.str.extract(r"\((.*?)\)", expand=False).astype(object)
+    symbol = frame["Symbol"].where(
+        frame["Symbol"] != "", from_description.str.strip().fillna(default_symbol)
+    )
+
+    # Price: invalid (empty, unparseable or zero) skips buys/sells, else is 0
+    price_num = _to_float(frame["Price"])
+    price_valid = price_num.notna() & (price_num != 0)
+    short_trade = action.str.startswith(("B", "S")) & (action.str.len() <= 3)
+    skip_price = ~price_valid & short_trade
+    price = frame["Price"].astype(object).where(price_valid, 0)
+
+    # Option label in the Symbol field, e.g. "CORZ 09/20/2024 9.00 C"
+    label = symbol.str.extract(f"({option_label_pattern})", expand=False).fillna("").str.strip()
+    has_label = label != ""
+    parts = label.str.split()
+    is_option = action.str.contains(OPTION_ACTION_PATTERN)
+    skip_option = is_option & ~has_label
+    symbol = symbol.where(~has_label, parts.str[0])
+    expiration = _map_distinct(
+        parts.str[1].where(has_label, ""),
+        lambda value: processor.convert_trade_date(value, "%m/%d/%Y") if value else None,
+    )
+    target_price = _to_float(parts.str[2].where(has_label, ""))
+
+    # CSVProcessor.determine_trade_type
+    trade_type = _map_distinct(
+        action, lambda value: processor.action_mapping.get_acronym(value) or "UK"
+    )
+    trade_type = trade_type.where(~(has_label & is_option), parts.str[-1])
+    trade_type = trade_type.where(~action.isin(("Buy", "Sell")), "L")
+
+    # CSVProcessor.calculate_amount; None for non-trade actions
+    quantity_num = _to_float(frame["Quantity"])
+    value = quantity_num.fillna(0.0) * price_num.where(price_valid, 0.0)
+    value = value.where(~is_option, value * 100)
+    amount = pd.Series(_round_cents(value.to_numpy()), index=frame.index, dtype=object)
+    amount = amount.where(~action.str.startswith("Buy"), -amount)
+    amount = amount.where(action.str.startswith(("Buy", "Sell", "Reinvest")), None)
+    amount = amount.astype(object).where(amount.notna(), None)
+    amount = amount.where(action != "Expired", 0)
+
+    skip_quantity = quantity_num.isna() & action.str.startswith(("B", "S"))
+    quantity = quantity_num.astype(object).where(quantity_num.notna(), 0)
+
+    trade_date = _map_distinct(frame["Date"], processor.convert_trade_date)
+
+    skipped_mask = skip_price | skip_option | skip_quantity | trade_date.isna()
+
+    raw_rows = frame.to_dict("records")
+    records = []
+    skipped = []
+    columns = zip(
+        skipped_mask, raw_rows, symbol, description, action, label, has_label,
+        trade_type, trade_date, expiration, quantity, price, amount, target_price,
+    )
+    for (skip, row, sym, name, act, lbl, labelled, ttype, date, expires,
+         qty, prc, amt, target) in columns:
+        if skip:
+            skipped.append(row)
+            continue
+        records.append({
+            "symbol": sym,
+            "name": name,
+            "action": act,
+            "label": lbl if labelled else None,
+            "trade_type": ttype,
+            "trade_date": date,
+            "expiration_date": expires if labelled else None,
+            "reason": row.get("Reason", ""),
+            "quantity": qty,
+            "price": prc,
+            "amount": amt,
+            "target_price": target if labelled else None,
+            "initial_stop_price": row.get("Initial Stop Price") or None,
+            "projected_sell_price": row.get("Projected Sell Price") or None,
+            "account": account,
+        })
+    return records, skipped
+
+
+def bulk_import(processor: CSVProcessor, input_files, output_filename, output_header,
+                db_inserter) -> Tuple[int, List[Dict]]:
+    """
+    Import Schwab transaction exports in one database transaction.
+
+    The bulk counterpart of processor.process_files with
+    process_schwab_transactions_row: the same cross-file duplicate-row
+    filter, the same output CSV, and inputs moved to the processed directory
+    once the batch is stored.
+
+    Returns:
+        (number of records inserted, skipped raw rows)
+    """
+    records = []
+    skipped = []
+    seen = set()
+    for input_file in input_files:
+        log.info(f"Reading file path: {input_file}")
+        account = processor.determine_account_type(os.path.basename(input_file))
+        frame = read_export(input_file)
+        # CSVProcessor.is_duplicate_row, across every file of the run
+        keys = [tuple(row) + (account,) for row in frame.itertuples(index=False)]
+        keep = []
+        for key in keys:
+            keep.append(key not in seen)
+            seen.add(key)
+        file_records, file_skipped = normalize_transactions(frame[keep], account, processor)
+        records.extend(file_records)
+        skipped.extend(file_skipped)
+        log.info(f"{input_file}: {len(file_records)} records, {len(file_skipped)} skipped")
+
+    db_inserter.insert_securities(records)
+    # Non-trade rows (dividends, transfers) have no amount: written to the
+    # output file but not stored, as insert_transaction's NOT NULL failure did
+    inserted = db_inserter.insert_transactions(r for r in records if r["amount"] is not None)
+    log.info(f"Inserted {len(inserted)} of {len(records)} transactions")
+
+    output_file = os.path.join(processor.output_dir, output_filename)
+    with open(output_file, "w", newline="") as out_csv:
+        writer = csv.writer(out_csv)
+        writer.writerow(output_header)
+        writer.writerows(processor.format_trade_transaction(record) for record in records)
+    processor.redo_output_file(output_file, len(records))
+
+    for input_file in input_files:
+        os.rename(input_file, os.path.join(processor.processed_dir, os.path.basename(input_file)))
+    return len(inserted), skipped
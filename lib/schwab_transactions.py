@@ -17,7 +17,18 @@ themselves.
 import json
 import logging
 import os
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from operator import attrgetter
+
+import httpx
+
+from lib.rate_limiter import TokenBucket
 
 log = logging.getLogger(__name__)
 
@@ -43,6 +54,24 @@ SYNC_WATERMARK_KEY = 'schwab_api_last_sync'
 # than 365 to leave a one-day margin for timezone/rounding.
 MAX_API_WINDOW_DAYS = 364
 
+# Schwab's Trader API allows 120 requests per minute per app. Concurrent
+# fetches share one token bucket at that rate, bursting up to the pool size.
+SCHWAB_REQUESTS_PER_MINUTE = 120
+DEFAULT_FETCH_WORKERS = 4
+
+# Responses worth retrying: rate limited, or a transient server/gateway
+# failure. Each retry waits a random delay of up to RETRY_BACKOFF_SECONDS *
+# 2**attempt (capped at RETRY_BACKOFF_MAX_SECONDS), or the server's
+# Retry-After if it sent one.
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+MAX_FETCH_RETRIES = 5
+RETRY_BACKOFF_SECONDS = 1.0
+RETRY_BACKOFF_MAX_SECONDS = 60.0
+
+# One account's transactions for one time window. records is None for an
+# account window skipped because a previous run already stored it.
+AccountWindow = namedtuple('AccountWindow', 'window_start window_end account_hash records')
+
 
 def load_account_map():
     """Load the Schwab account hash -> single-letter code mapping, or {} if unset."""
@@ -375,7 +404,8 @@ def _resolve_start_date(db, end_date, symbol=None):
     return max(start, earliest)
 
 
-def sync(start_date=None, end_date=None, dry_run=False, symbol=None, db_path=None):
+def sync(start_date=None, end_date=None, dry_run=False, symbol=None, db_path=None,
+         max_workers=1):
     """
     Sync Schwab API transactions into the local SQLite database.
 
@@ -396,12 +426,22 @@ def sync(start_date=None, end_date=None, dry_run=False, symbol=None, db_path=Non
     backfill from account inception) is walked internally in
     MAX_API_WINDOW_DAYS-sized chunks by SchwabTransactionFetcher — callers
     never need to split a long range themselves.
+
+    max_workers > 1 fetches the account/window requests concurrently, rate
+    limited to Schwab's request budget (see SchwabTransactionFetcher);
+    results are still inserted in window order.
+
+    Each account window's securities, fills and checkpoint
+    (lib/sync_checkpoint.py) are committed together, and the watermark once
+    its whole window is stored. A run that dies part-way — a crash, a
+    restarted worker, a request still failing after its retries — is resumed
+    by the next sync of the same scope that gives no end_date (and no
+    start_date, or the same one): it reuses the interrupted run's range and
+    skips the account windows already stored.
     """
     from lib.schwab_client import get_client
     from lib.db_utils import DatabaseInserter
-
-    if end_date is None:
-        end_date = datetime.now(timezone.utc)
+    from lib.sync_checkpoint import SyncCheckpoints
 
     client = get_client()
     account_map = load_account_map()
@@ -411,48 +451,77 @@ def sync(start_date=None, end_date=None, dry_run=False, symbol=None, db_path=Non
     resp.raise_for_status()
     accounts = resp.json()
 
-    fetcher = SchwabTransactionFetcher(client, accounts, account_map)
+    fetcher = SchwabTransactionFetcher(client, accounts, account_map, max_workers=max_workers)
 
     inserted = 0
     skipped_existing = 0
+    inserted_symbols = set()
 
     with DatabaseInserter(db_path=db_path or DB_PATH) as db:
+        checkpoints = None
+        completed = set()
+        if not dry_run:
+            checkpoints = SyncCheckpoints(db, _watermark_key(symbol))
+            pending = checkpoints.pending_run()
+            if pending and end_date is None and start_date in (None, pending[0]):
+                start_date, end_date = pending
+                log.info('Resuming interrupted sync of %s to %s',
+                         start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        if end_date is None:
+            end_date = datetime.now(timezone.utc)
         if start_date is None:
             start_date = _resolve_start_date(db, end_date, symbol=symbol)
+        if checkpoints is not None:
+            completed = checkpoints.begin(start_date, end_date)
+            if completed:
+                log.info('%d account windows already stored — skipping them', len(completed))
 
-        for window_end, records in fetcher.fetch(start_date, end_date, symbol=symbol):
-            for record in records:
-                if dry_run:
-                    log.info('[DRY RUN] Would insert: %s %s %s qty=%s price=%s',
-                             record['trade_date'], record['action'],
-                             record['symbol'], record['quantity'], record['price'])
-                    inserted += 1
+        account_windows = fetcher.fetch_account_windows(
+            start_date, end_date, symbol=symbol, completed=completed
+        )
+        for window_end, parts in groupby(account_windows, key=attrgetter('window_end')):
+            for part in parts:
+                if part.records is None:
                     continue
-
-                # Ensure security exists
-                db.insert_security({
-                    'symbol': record['symbol'],
-                    'name': record.get('security_name') or record['symbol'],
-                })
-
-                if db.transaction_exists(record):
-                    skipped_existing += 1
-                    log.debug('Already exists: %s %s %s', record['trade_date'],
-                              record['symbol'], record['action'])
+                records = part.records
+                if dry_run:
+                    for record in records:
+                        log.info('[DRY RUN] Would insert: %s %s %s qty=%s price=%s',
+                                 record['trade_date'], record['action'],
+                                 record['symbol'], record['quantity'], record['price'])
+                    inserted += len(records)
                     continue
 
-                db.insert_transaction(record)
-                inserted += 1
-                log.info('Inserted: %s %s %s qty=%s',
-                         record['trade_date'], record['action'],
-                         record['symbol'], record['quantity'])
+                # One transaction per account window: its securities, its
+                # fills (deduped by activity_id in bulk) and its checkpoint
+                # commit together, so a crash leaves the window either fully
+                # stored and checkpointed or not at all (and re-fetched)
+                with db.transaction():
+                    db.insert_securities(
+                        {'symbol': record['symbol'],
+                         'name': record.get('security_name') or record['symbol']}
+                        for record in records
+                    )
+                    new_records = db.insert_transactions(records)
+                    checkpoints.mark_done(part.account_hash, part.window_start,
+                                          part.window_end, len(records))
+                skipped_existing += len(records) - len(new_records)
+                inserted += len(new_records)
+                for record in new_records:
+                    inserted_symbols.add(record['symbol'])
+                    log.info('Inserted: %s %s %s qty=%s',
+                             record['trade_date'], record['action'],
+                             record['symbol'], record['quantity'])
 
-            # Checkpoint after every window (not just the last) so an
-            # interrupted multi-window backfill resumes near where it left
-            # off instead of re-fetching from the original start date.
+            # Save the watermark after every window (not just the last) so
+            # a later sync starts near where this one got to
             if not dry_run:
                 save_watermark(db, window_end, symbol=symbol)
 
+        if checkpoints is not None:
+            checkpoints.finish()
+        _extend_lot_ledger(db, inserted_symbols)
+
     skipped_invalid = fetcher.stats['skipped_non_trade'] + fetcher.stats['skipped_invalid_leg']
     log.info('Sync complete. Inserted: %d, Already existed: %d, Skipped invalid: %d',
              inserted, skipped_existing, skipped_invalid)
@@ -463,6 +532,28 @@ def sync(start_date=None, end_date=None, dry_run=False, symbol=None, db_path=Non
     }
 
 
+def _extend_lot_ledger(db, symbols):
+    """
+    Match the newly inserted fills into the persisted lot ledger now, so the
+    next analysis request doesn't pay for it. Best-effort: a symbol that
+    fails here is simply extended lazily on its next analysis.
+    """
+    from lib.lot_ledger import LotLedger
+
+    if not symbols:
+        return
+    try:
+        ledger = LotLedger(db)
+    except Exception as exc:
+        log.warning('Lot ledger unavailable, skipping extension: %s', exc)
+        return
+    for sym in sorted(symbols):
+        try:
+            ledger.extend(sym)
+        except Exception as exc:
+            log.warning('Could not extend lot ledger for %s: %s', sym, exc)
+
+
 class SchwabTransactionFetcher:
     """
     Walks Schwab transaction history across account x time-window pairs,
@@ -470,16 +561,34 @@ class SchwabTransactionFetcher:
     build_transaction_record().
 
     Callers drive what happens with the results: bin/sync_schwab_api.py
-    inserts as it goes and checkpoints the watermark once per window;
+    inserts and checkpoints the watermark a window at a time;
     util/rebuild_trade_transactions.py collects everything into one list
     before touching the database. Neither concern belongs here.
     """
 
-    def __init__(self, client, accounts, account_map):
+    def __init__(self, client, accounts, account_map, max_workers=1, rate_limiter=None,
+                 max_retries=MAX_FETCH_RETRIES, sleep=time.sleep):
+        """
+        max_workers > 1 fetches account/window pairs from a thread pool of
+        that size; rate_limiter (a TokenBucket) then defaults to Schwab's
+        request budget. A sequential fetcher is only rate limited if given
+        one.
+
+        A request failing with a RETRYABLE_STATUSES response or a transport
+        error (connection reset, timeout) is retried up to max_retries
+        times with jittered exponential backoff, waiting with sleep.
+        """
         self.client = client
         self.accounts = accounts
         self.account_codes = build_account_codes(accounts, account_map)
-        self.stats = {'skipped_non_trade': 0, 'skipped_invalid_leg': 0}
+        self.stats = {'skipped_non_trade': 0, 'skipped_invalid_leg': 0, 'retries': 0}
+        self.max_workers = max(1, max_workers)
+        if rate_limiter is None and self.max_workers > 1:
+            rate_limiter = TokenBucket(SCHWAB_REQUESTS_PER_MINUTE / 60, capacity=self.max_workers)
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self._sleep = sleep
+        self._stats_lock = threading.Lock()
 
     def fetch(self, start_date, end_date, symbol=None):
         """
@@ -489,6 +598,26 @@ class SchwabTransactionFetcher:
         symbol is given, only records resolving to that ticker (underlying
         ticker for options) are kept — legs for other symbols are silently
         dropped, not counted as skipped.
+
+        With max_workers > 1 the requests run concurrently, a few windows
+        ahead of the consumer, but windows are still yielded in order with
+        their accounts in order — exactly what a sequential fetch yields —
+        so callers can checkpoint per window. A failed request raises when
+        its window is reached, after every earlier window has been yielded.
+        """
+        account_windows = self.fetch_account_windows(start_date, end_date, symbol=symbol)
+        for window_end, parts in groupby(account_windows, key=attrgetter('window_end')):
+            yield window_end, [record for part in parts for record in part.records]
+
+    def fetch_account_windows(self, start_date, end_date, symbol=None, completed=()):
+        """
+        Yield an AccountWindow per account per time window, in the order
+        fetch() pools them, so a caller can store each account's records as
+        soon as they arrive. A failed request raises when its account window
+        is reached, after every earlier one has been yielded.
+
+        completed holds (account_hash, window_start.isoformat()) pairs that
+        are not fetched at all; they are yielded with records None.
         """
         symbol = symbol.upper() if symbol else None
         windows = list(iter_windows(start_date, end_date))
@@ -496,20 +625,71 @@ class SchwabTransactionFetcher:
             log.info('Range spans %d windows of up to %d days each',
                      len(windows), MAX_API_WINDOW_DAYS)
 
-        for window_num, (window_start, window_end) in enumerate(windows, start=1):
+        pairs = self._account_pairs()
+        todo = [
+            [(hash_val, window_start.isoformat()) not in completed for hash_val, _code in pairs]
+            for window_start, _window_end in windows
+        ]
+        if self.max_workers > 1:
+            window_results = self._fetch_windows_concurrently(windows, todo, symbol)
+        else:
+            window_results = (
+                self._fetch_window(start, end, fetch, symbol)
+                for (start, end), fetch in zip(windows, todo)
+            )
+
+        for window_num, ((window_start, window_end), results) in enumerate(
+            zip(windows, window_results), start=1
+        ):
+            count = 0
+            for (hash_val, _code), records in zip(pairs, results):
+                count += len(records or ())
+                yield AccountWindow(window_start, window_end, hash_val, records)
             if len(windows) > 1:
-                log.info('=== Window %d/%d: %s to %s ===', window_num, len(windows),
-                         window_start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d'))
-
-            records = []
-            for acct in self.accounts:
-                hash_val = acct.get('hashValue')
-                code = self.account_codes[hash_val]
-                records.extend(
-                    self._fetch_account_window(hash_val, code, window_start, window_end, symbol)
-                )
-
-            yield window_end, records
+                log.info('=== Window %d/%d: %s to %s — %d records ===', window_num, len(windows),
+                         window_start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d'),
+                         count)
+
+    def _account_pairs(self):
+        return [(acct.get('hashValue'), self.account_codes[acct.get('hashValue')])
+                for acct in self.accounts]
+
+    def _fetch_window(self, window_start, window_end, fetch, symbol):
+        """Lazily yield each account's records for one window (None where not fetched)."""
+        for (hash_val, code), wanted in zip(self._account_pairs(), fetch):
+            yield (self._fetch_account_window(hash_val, code, window_start, window_end, symbol)
+                   if wanted else None)
+
+    def _fetch_windows_concurrently(self, windows, todo, symbol):
+        """Yield each window's per-account results in order, fetched from a thread pool."""
+        pairs = self._account_pairs()
+        # Keep roughly one pool's worth of requests queued past the window
+        # being consumed, so a failure doesn't fire off the whole backfill
+        lookahead = self.max_workers // max(len(pairs), 1) + 1
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix='schwab-fetch') as pool:
+            pending = deque()
+
+            def submit(i):
+                window_start, window_end = windows[i]
+                pending.append([
+                    pool.submit(self._fetch_account_window,
+                                hash_val, code, window_start, window_end, symbol)
+                    if wanted else None
+                    for (hash_val, code), wanted in zip(pairs, todo[i])
+                ])
+
+            try:
+                for i in range(min(lookahead, len(windows))):
+                    submit(i)
+                for i in range(len(windows)):
+                    futures = pending.popleft()
+                    if i + lookahead < len(windows):
+                        submit(i + lookahead)
+                    yield (future.result() if future else None for future in futures)
+            finally:
+                pool.shutdown(cancel_futures=True)
 
     def _fetch_account_window(self, account_hash, account_code, window_start, window_end, symbol):
         log.info('Fetching transactions for account %s (code=%s) from %s to %s%s',
@@ -517,34 +697,75 @@ class SchwabTransactionFetcher:
                  window_start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d'),
                  f' (filtering to {symbol})' if symbol else '')
 
-        resp = self.client.get_transactions(
-            account_hash=account_hash,
-            start_date=window_start,
-            end_date=window_end,
-            transaction_types=[
-                self.client.Transactions.TransactionType.TRADE,
-                self.client.Transactions.TransactionType.RECEIVE_AND_DELIVER,
-            ],
-        )
-        resp.raise_for_status()
+        resp = self._get_transactions(account_hash, window_start, window_end)
         transactions = resp.json()
         log.info('  Retrieved %d transactions', len(transactions))
 
         records = []
+        skipped_non_trade = skipped_invalid_leg = 0
         for txn in transactions:
             if txn.get('type', '') not in PROCESSED_TRANSACTION_TYPES:
-                self.stats['skipped_non_trade'] += 1
+                skipped_non_trade += 1
                 continue
             legs = extract_trade_legs(txn.get('transferItems', []))
             if not legs:
-                self.stats['skipped_non_trade'] += 1
+                skipped_non_trade += 1
                 continue
             for i, leg in enumerate(legs):
                 record = build_transaction_record(txn, leg, account_code, leg_index=i)
                 if record is None:
-                    self.stats['skipped_invalid_leg'] += 1
+                    skipped_invalid_leg += 1
                 elif symbol and record['symbol'] != symbol:
                     continue
                 else:
                     records.append(record)
+
+        with self._stats_lock:
+            self.stats['skipped_non_trade'] += skipped_non_trade
+            self.stats['skipped_invalid_leg'] += skipped_invalid_leg
         return records
+
+    def _get_transactions(self, account_hash, window_start, window_end):
+        """client.get_transactions, retried with backoff while it fails transiently."""
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                resp = self.client.get_transactions(
+                    account_hash=account_hash,
+                    start_date=window_start,
+                    end_date=window_end,
+                    transaction_types=[
+                        self.client.Transactions.TransactionType.TRADE,
+                        self.client.Transactions.TransactionType.RECEIVE_AND_DELIVER,
+                    ],
+                )
+            except httpx.TransportError as exc:
+                if attempt == self.max_retries:
+                    raise
+                error, delay = repr(exc), _backoff_delay(attempt)
+            else:
+                if resp.status_code not in RETRYABLE_STATUSES or attempt == self.max_retries:
+                    resp.raise_for_status()
+                    return resp
+                error = f'HTTP {resp.status_code}'
+                delay = _retry_after(resp) or _backoff_delay(attempt)
+
+            log.warning('  %s for account %s... — retry %d/%d in %.1fs', error,
+                        account_hash[:8], attempt + 1, self.max_retries, delay)
+            with self._stats_lock:
+                self.stats['retries'] += 1
+            self._sleep(delay)
+
+
+def _backoff_delay(attempt):
+    """Full-jitter exponential backoff: uniform in [0, base * 2**attempt], capped."""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** attempt))
+
+
+def _retry_after(resp):
+    """The response's Retry-After delay in seconds, if it gives one as a number."""
+    try:
+        return min(float(resp.headers.get('Retry-After')), RETRY_BACKOFF_MAX_SECONDS)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,68 @@
+"""
+Per-symbol data versions, kept current by SQLite triggers.
+
+symbol_version holds a counter per symbol that the triggers below bump on
+every INSERT, UPDATE or DELETE of one of its trade_transaction rows. Cached
+analysis results are keyed by that counter, so a change to one symbol —
+a one-symbol Schwab sync, a CSV import, a trade edit from the UI — only
+invalidates that symbol's results. Because the triggers live in the
+database they also see writes from processes outside the app (the sync
+script, the CSV importer, manual sqlite3 edits).
+
+The table and triggers are created idempotently at app startup; the app
+reads the table through the SymbolVersion model.
+"""
+_BUMP = (
+    "INSERT INTO symbol_version (symbol, version) VALUES ({row}.symbol, 1) "
+    "ON CONFLICT(symbol) DO UPDATE SET version = version + 1;"
+)
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS symbol_version (
+        symbol VARCHAR(30) PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_symbol_version_insert
+    AFTER INSERT ON trade_transaction
+    BEGIN
+        {_BUMP.format(row='NEW')}
+    END
+    ''',
+    # Bump both sides: an edit can move a row to another symbol
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_symbol_version_update
+    AFTER UPDATE ON trade_transaction
+    BEGIN
+        {_BUMP.format(row='OLD')}
+        {_BUMP.format(row='NEW')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_symbol_version_delete
+    AFTER DELETE ON trade_transaction
+    BEGIN
+        {_BUMP.format(row='OLD')}
+    END
+    ''',
+)
+
+
+def ensure_symbol_versions(db) -> None:
+    """Create the symbol_version table and triggers if missing.
+
+    Symbols that already have trade rows start at version 1, so a database
+    migrated from the global token begins with a consistent table.
+
+    Args:
+        db: A DatabaseInserter on the trades database.
+    """
+    with db.transaction():
+        for statement in SCHEMA:
+            db.cursor.execute(statement)
+        db.cursor.execute(
+            'INSERT OR IGNORE INTO symbol_version (symbol, version) '
+            'SELECT DISTINCT symbol, 1 FROM trade_transaction'
+        )
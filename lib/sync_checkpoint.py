@@ -0,0 +1,108 @@
+"""
+Per-(account, window) progress of a Schwab API sync, persisted in SQLite.
+
+sync() saves its watermark only once every account of a window is stored,
+so a run that dies part-way through a window — a crash, a worker restart, a
+request that is still failing after its retries — used to lose the accounts
+it had already fetched for that window. sync_checkpoint records each
+account window as its fills are stored, and sync_checkpoint_run pins the
+run's [start_date, end_date] range: windows are cut from that range, so a
+resumed run has to reuse it to land on the same window boundaries.
+
+A scope is the run's watermark key (global, or per-symbol), so the global
+sync and each symbol's sync resume independently. A run that completes
+clears its scope.
+"""
+from datetime import datetime, timezone
+from typing import Optional, Set, Tuple
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS sync_checkpoint_run (
+        scope TEXT PRIMARY KEY,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        started_at TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sync_checkpoint (
+        scope TEXT NOT NULL,
+        account_hash TEXT NOT NULL,
+        window_start TEXT NOT NULL,
+        window_end TEXT NOT NULL,
+        records INTEGER NOT NULL,
+        completed_at TEXT NOT NULL,
+        PRIMARY KEY (scope, account_hash, window_start)
+    )
+    ''',
+)
+
+# (account_hash, window_start.isoformat()) of a stored account window
+AccountWindowKey = Tuple[str, str]
+
+
+class SyncCheckpoints:
+    """Reads and writes one scope's sync checkpoints through a DatabaseInserter."""
+
+    def __init__(self, db, scope: str):
+        self.db = db
+        self.scope = scope
+        for statement in SCHEMA:
+            self.db.cursor.execute(statement)
+
+    def pending_run(self) -> Optional[Tuple[datetime, datetime]]:
+        """The (start_date, end_date) of an interrupted run, or None."""
+        self.db.cursor.execute(
+            'SELECT start_date, end_date FROM sync_checkpoint_run WHERE scope = ?',
+            (self.scope,),
+        )
+        row = self.db.cursor.fetchone()
+        if not row:
+            return None
+        return datetime.fromisoformat(row[0]), datetime.fromisoformat(row[1])
+
+    def begin(self, start_date: datetime, end_date: datetime) -> Set[AccountWindowKey]:
+        """Start (or resume) a run over [start_date, end_date].
+
+        Returns:
+            The account windows already stored by an interrupted run over the
+            same range; empty for a new range, whose stale checkpoints (if
+            any) are dropped.
+        """
+        if self.pending_run() == (start_date, end_date):
+            self.db.cursor.execute(
+                'SELECT account_hash, window_start FROM sync_checkpoint WHERE scope = ?',
+                (self.scope,),
+            )
+            return set(self.db.cursor.fetchall())
+
+        with self.db.transaction() as cursor:
+            cursor.execute('DELETE FROM sync_checkpoint WHERE scope = ?', (self.scope,))
+            cursor.execute(
+                'INSERT OR REPLACE INTO sync_checkpoint_run '
+                '(scope, start_date, end_date, started_at) VALUES (?, ?, ?, ?)',
+                (self.scope, start_date.isoformat(), end_date.isoformat(), _now()),
+            )
+        return set()
+
+    def mark_done(self, account_hash: str, window_start: datetime, window_end: datetime,
+                  records: int) -> None:
+        """Record that an account window's fills are stored."""
+        with self.db.transaction() as cursor:
+            cursor.execute(
+                'INSERT OR REPLACE INTO sync_checkpoint (scope, account_hash, window_start, '
+                'window_end, records, completed_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (self.scope, account_hash, window_start.isoformat(),
+                 window_end.isoformat(), records, _now()),
+            )
+
+    def finish(self) -> None:
+        """Forget the scope's run once every window is stored."""
+        with self.db.transaction() as cursor:
+            cursor.execute('DELETE FROM sync_checkpoint WHERE scope = ?', (self.scope,))
+            cursor.execute('DELETE FROM sync_checkpoint_run WHERE scope = ?', (self.scope,))
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
@@ -1,19 +1,55 @@
 # lib/trading_analyzer.py
 from dotenv import load_dotenv
+import json
 import logging
 import os
+import time
 from datetime import datetime
-from typing import Any, cast, Dict, List, Optional
+from typing import Any, cast, Dict, Iterable, Iterator, List, Optional
 from lib.models.Trade import BuyTrade, SellTrade, TradeData
 from lib.models.Trades import Trades, BuyTrades
 from lib.models.TradeSummary import TradeSummary
-from lib.models.ActionMapping import ActionMapping
+from lib.models.ActionMapping import ActionMapping, BUY_TYPE_ACTIONS, SELL_TYPE_ACTIONS
+from lib.lot_matching import Allocation, apply_allocations, apply_columnar_matching
+from lib.analysis_profile import StageTimer
 from lib.constants import OPTIONS_MULTIPLIER, STOCK_MULTIPLIER
 
 load_dotenv()
 
 log = logging.getLogger(__name__)
 
+# Lot-matching engines accepted by analyze_trades(engine=...)
+VALID_ENGINES = ("object", "columnar", "ledger")
+
+# Approximate size of the text chunks iter_profit_loss_data_json yields
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_json_array(items: Iterable[Any]) -> Iterator[str]:
+    """Encode an iterable as a JSON array, one item at a time."""
+    yield "["
+    separator = ""
+    for item in items:
+        yield separator
+        yield json.dumps(item)
+        separator = ", "
+    yield "]"
+
+
+def _buffered(pieces: Iterable[str], size: int) -> Iterator[str]:
+    """Join small JSON fragments into chunks of roughly `size` characters."""
+    buffer: List[str] = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield "".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield "".join(buffer)
+
 
 class TradingAnalyzer:
 
@@ -53,6 +89,9 @@ class TradingAnalyzer:
 
         self.action_mapping = ActionMapping()
 
+        # Per-stage wall time and rows (see lib/analysis_profile.py)
+        self.timings = StageTimer(stock_symbol)
+
     def _convert_to_trade(self, trade: Dict[str, Any]) -> BuyTrade | SellTrade:
         """Validate a trade to ensure it has the required fields and valid data.
 
@@ -72,8 +111,10 @@ class TradingAnalyzer:
                     f"{self.stock_symbol} - is missing required field: {field}"
                 )
 
-        if (self.action_mapping.is_buy_type_action(trade["action"])
-                or self.action_mapping.is_sell_type_action(trade["action"])):
+        action = trade["action"]
+        is_buy = action in BUY_TYPE_ACTIONS
+        is_sell = not is_buy and action in SELL_TYPE_ACTIONS
+        if is_buy or is_sell:
             # if not isinstance(trade["price"], (int, float)) or trade["price"] <= 0:
             if not isinstance(trade["price"], (int, float)) or trade["price"] < 0:
                 raise ValueError(
@@ -86,9 +127,9 @@ class TradingAnalyzer:
                 f"{trade['symbol']} ID: {trade['id']} -Invalid trade date: {trade['trade_date']}, must be a string or datetime"
             )
 
-        if self.action_mapping.is_buy_type_action(trade["action"]):
+        if is_buy:
             return BuyTrade(cast(TradeData, trade))
-        elif self.action_mapping.is_sell_type_action(trade["action"]):
+        elif is_sell:
             return SellTrade(cast(TradeData, trade))
         else:
             log.error(f"[{self.stock_symbol}] Unknown action: {trade['action']}")
@@ -101,18 +142,21 @@ class TradingAnalyzer:
         account: Optional[str] = None,
         after_date: Optional[str] = None,
         status: str = "all",
+        engine: str = "object",
+        allocations: Optional[List[Allocation]] = None,
     ) -> None:
         symbol = self.stock_symbol
         stock_trades = Trades(security_type="stock")
         option_trades = Trades(security_type="option")
         try:
-            for trade_dict in self.trade_transactions:
-                trade = self._convert_to_trade(trade_dict)
-                (
-                    stock_trades.add_trade(trade)
-                    if not trade.is_option
-                    else option_trades.add_trade(trade)
-                )
+            with self.timings.stage("convert", rows=len(self.trade_transactions)):
+                for trade_dict in self.trade_transactions:
+                    trade = self._convert_to_trade(trade_dict)
+                    (
+                        stock_trades.add_trade(trade)
+                        if not trade.is_option
+                        else option_trades.add_trade(trade)
+                    )
         except Exception as e:
             log.error(f"[{symbol}] Error converting trades to Trade: {e}")
             raise
@@ -122,8 +166,9 @@ class TradingAnalyzer:
         )
 
         try:
-            stock_trades.sort_trades()
-            option_trades.sort_trades()
+            with self.timings.stage("sort", rows=len(self.trade_transactions)):
+                stock_trades.sort_trades()
+                option_trades.sort_trades()
         except Exception as e:
             log.error(f"[{symbol}] Error sorting trades: {e}")
             raise
@@ -138,13 +183,16 @@ class TradingAnalyzer:
                 continue
 
             try:
-                buy_trades = self._create_buy_trades_collection(
-                    trades,
-                    symbol,
-                    status=status,
-                    account=account,
-                    after_date=after_date,
-                )
+                with self.timings.stage("match", rows=len(trades.buy_trades)):
+                    buy_trades = self._create_buy_trades_collection(
+                        trades,
+                        symbol,
+                        status=status,
+                        account=account,
+                        after_date=after_date,
+                        engine=engine,
+                        allocations=allocations,
+                    )
             except Exception as e:
                 log.error(
                     f"[{symbol}] Error creating BuyTrades collection for {security_type}: {e}"
@@ -155,18 +203,20 @@ class TradingAnalyzer:
                 log.warning(f"[{symbol}] Has no {security_type} BuyTrades")
                 continue
 
-            buy_trades.filter_buy_trades()
+            with self.timings.stage("filter", rows=len(buy_trades.buy_trades)):
+                buy_trades.filter_buy_trades()
             log.debug(
                 f"[{symbol}] Filtered {security_type} BuyTrades: \n{buy_trades}"
             )
 
             try:
-                trade_summary = TradeSummary.create_from_buy_trades_collection(
-                    symbol=self.stock_symbol,
-                    buy_trades_collection=buy_trades,
-                    account=account,
-                    after_date=after_date,
-                )
+                with self.timings.stage("summarize", rows=len(buy_trades.buy_trades)):
+                    trade_summary = TradeSummary.create_from_buy_trades_collection(
+                        symbol=self.stock_symbol,
+                        buy_trades_collection=buy_trades,
+                        account=account,
+                        after_date=after_date,
+                    )
             except Exception as e:
                 log.error(
                     f"[{symbol}] Error creating {buy_trades.security_type} summary record: {e}"
@@ -190,9 +240,10 @@ class TradingAnalyzer:
                 raise
 
             # TODO - Check if we need ["all_buy_trades"]
-            self.profit_loss_data[security_type]["all_buy_trades"] = (
-                trade_summary.process_all_trades(symbol)
-            )
+            with self.timings.stage("finalize", rows=len(trade_summary.buy_trades)):
+                self.profit_loss_data[security_type]["all_buy_trades"] = (
+                    trade_summary.process_all_trades(symbol)
+                )
 
     def _create_buy_trades_collection(
         self,
@@ -201,8 +252,17 @@ class TradingAnalyzer:
         status: str = "all",
         account: Optional[str] = None,
         after_date: Optional[str] = None,
+        engine: str = "object",
+        allocations: Optional[List[Allocation]] = None,
     ) -> Optional[BuyTrades]:
-        """Group sell trades with their corresponding buy trades (stock or option)."""
+        """Group sell trades with their corresponding buy trades (stock or option).
+
+        engine="object" applies sells buy-by-buy via BuyTrade.apply_sell_trades;
+        engine="columnar" matches each account's quantity columns in one pass
+        (see lib/lot_matching.py) and produces the same per-lot results;
+        engine="ledger" applies allocations already matched by the persisted
+        lot ledger (see lib/lot_ledger.py).
+        """
 
         if not trades.buy_trades:
             log.info(f"[{symbol}] No {trades.security_type} buy trades")
@@ -217,14 +277,18 @@ class TradingAnalyzer:
 
         match_label = trades.security_type == "option"
 
+        if engine == "columnar":
+            apply_columnar_matching(trades, match_label=match_label)
+        elif engine == "ledger":
+            apply_allocations(trades, allocations)
+
+        # Each buy only walks the sells of its own account (and option contract)
+        sell_queues = trades.sell_queues(match_label) if engine == "object" else {}
+
         for current_buy_record in trades.buy_trades:
-            if current_buy_record.account in trades.sells_by_account and len(
-                trades.sells_by_account[current_buy_record.account]
-            ):
-                current_buy_record.apply_sell_trades(
-                    trades.sells_by_account[current_buy_record.account],
-                    match_label=match_label,
-                )
+            sell_queue = sell_queues.get(Trades.match_key(current_buy_record, match_label))
+            if sell_queue:
+                current_buy_record.apply_sell_trades(sell_queue)
 
             try:
                 FilteredBuyTrades.add_trade(current_buy_record)
@@ -241,6 +305,8 @@ class TradingAnalyzer:
         account: Optional[str] = None,
         after_date: Optional[str] = None,
         status: Optional[str] = None,
+        engine: str = "object",
+        allocations: Optional[List[Allocation]] = None,
     ) -> None:
         """
         Analyze trades and calculate profit/loss for each trade.
@@ -255,6 +321,15 @@ class TradingAnalyzer:
                 'open' - Only trades with unsold shares
                 'closed' - Only fully closed trades
                 None - All trades (default)
+
+            engine (str, optional): Lot-matching engine. Valid values:
+                'object' - Match sells buy-by-buy on Trade objects (default)
+                'columnar' - Match on NumPy quantity columns; faster on
+                    symbols with thousands of fills, same results
+                'ledger' - Apply pre-matched allocations (requires allocations)
+
+            allocations (list, optional): (buy_id, sell_id, units, buy_filled,
+                sell_exhausted) rows from LotLedger, for engine='ledger'.
         """
 
         # Validate status parameter
@@ -265,6 +340,14 @@ class TradingAnalyzer:
                 f"Invalid status: '{status}'. Must be one of {valid_statuses}"
             )
 
+        if engine not in VALID_ENGINES:
+            log.error(f"[{self.stock_symbol}] Invalid engine: {engine}")
+            raise ValueError(
+                f"Invalid engine: '{engine}'. Must be one of {list(VALID_ENGINES)}"
+            )
+        if engine == "ledger" and allocations is None:
+            raise ValueError("engine='ledger' requires allocations")
+
         if after_date is not None:
             try:
                 datetime.strptime(after_date, "%Y-%m-%d")
@@ -280,7 +363,13 @@ class TradingAnalyzer:
             f"[{self.stock_symbol}] Analyzing trades after: {after_date}, status: {status}"
         )
 
-        self._analyze_trades(account=account, after_date=after_date, status=status)
+        self._analyze_trades(
+            account=account,
+            after_date=after_date,
+            status=status,
+            engine=engine,
+            allocations=allocations,
+        )
 
     def get_profit_loss_data(self) -> Dict[str, Any]:
         """
@@ -305,7 +394,8 @@ class TradingAnalyzer:
 
         return self.profit_loss_data
 
-    def _convert_summary_to_dict(self, summary: Any) -> Dict[str, Any]:
+    @staticmethod
+    def _convert_summary_to_dict(summary: Any) -> Dict[str, Any]:
         """Convert TradeSummary to dictionary with proper serialization"""
         if not hasattr(summary, "__dict__"):
             return {}
@@ -318,17 +408,38 @@ class TradingAnalyzer:
 
             if key == "buy_trades" or key == "sell_trades":
                 result[key] = [t.to_dict() for t in value] if value else []
-            elif key == "sells_by_account":
-                result[key] = {k: [t.to_dict() for t in v] for k, v in value.items()}
-            elif isinstance(value, datetime):
-                result[key] = value.isoformat()
-            elif hasattr(value, "to_dict"):
-                result[key] = value.to_dict()
             else:
-                result[key] = value
+                result[key] = TradingAnalyzer._convert_summary_value(key, value)
         return result
 
-    def get_profit_loss_data_json(self, asset_type: str = "all") -> Dict[str, Any]:
+    @staticmethod
+    def _convert_summary_value(key: str, value: Any) -> Any:
+        """Serialize one TradeSummary field other than the trade lists"""
+        if key == "sells_by_account":
+            return {k: [t.to_dict() for t in v] for k, v in value.items()}
+        elif isinstance(value, datetime):
+            return value.isoformat()
+        elif hasattr(value, "to_dict"):
+            return value.to_dict()
+        return value
+
+    @staticmethod
+    def _iter_trade_rows(buy_trades: Iterable[Any]) -> Iterator[Any]:
+        """Yield each buy trade's dict followed by the dicts of its applied sells"""
+        for buy_trade in buy_trades:
+            if hasattr(buy_trade, "to_dict"):
+                # TODO Remove the 'sells' list when done.
+                yield buy_trade.to_dict()
+                for sell_trade in buy_trade.sells:
+                    yield sell_trade.to_dict()
+            else:
+                # Fallback for unexpected types
+                # TODO:  Flatten out the sell trades
+                yield str(buy_trade)
+
+    def get_profit_loss_data_json(
+        self, asset_type: str = "all", summary_only: bool = False
+    ) -> Dict[str, Any]:
         """
         Returns profit/loss data in fully JSON-serializable format.
 
@@ -337,37 +448,168 @@ class TradingAnalyzer:
                 'all' (default) - both stock and option sections
                 'stock' - stock section only
                 'option' - option section only
+            summary_only: Leave out each section's "all_trades" list, so no
+                per-trade dict is built (as derive_profit_loss_view's
+                summary_only).
 
         Returns:
             Dict[str, Any]: JSON-serializable profit_loss_data
         """
+        started = time.perf_counter()
         profit_loss_data = self.get_profit_loss_data()
         json_data = {}
+        rows = 0
 
         security_types = ["stock", "option"] if asset_type == "all" else [asset_type]
         for security_type in security_types:
             sec_data = profit_loss_data[security_type]
-
-            # Convert all_buy_trades to dictionaries
-            all_trades_dicts = []
-            for buy_trade in sec_data["all_buy_trades"]:
-                if hasattr(buy_trade, "to_dict"):
-                    # TODO Remove the 'sells' list when done.
-                    sell_trades = [t.to_dict() for t in buy_trade.sells]
-                    # del buy_trade.sells
-                    all_trades_dicts.append(buy_trade.to_dict())
-                    for sell_trade in sell_trades:
-                        all_trades_dicts.append(sell_trade)
-                else:
-                    # Fallback for unexpected types
-                    # TODO:  Flatten out the sell trades
-                    all_trades_dicts.append(str(buy_trade))
-
             json_sec = {
                 "has_trades": sec_data["has_trades"],
                 "summary": self._convert_summary_to_dict(sec_data["summary"]),
-                "all_trades": all_trades_dicts,
             }
+            if not summary_only:
+                # Flattened: each buy trade followed by its applied sells
+                json_sec["all_trades"] = list(
+                    self._iter_trade_rows(sec_data["all_buy_trades"])
+                )
+                rows += len(json_sec["all_trades"])
             json_data[security_type] = json_sec
 
+        self.timings.add("serialize", time.perf_counter() - started, rows)
         return json_data
+
+    def iter_profit_loss_data_json(
+        self, asset_type: str = "all", chunk_size: int = JSON_CHUNK_SIZE
+    ) -> Iterator[str]:
+        """
+        Stream get_profit_loss_data_json(asset_type) as JSON text.
+
+        Trades are encoded one at a time and the fragments joined into chunks
+        of about chunk_size characters, so a large symbol never holds the whole
+        dict graph or the whole encoded document in memory. The concatenated
+        chunks decode to the same value as get_profit_loss_data_json.
+        """
+        return _buffered(self._iter_profit_loss_json(asset_type), chunk_size)
+
+    def _iter_profit_loss_json(self, asset_type: str) -> Iterator[str]:
+        profit_loss_data = self.get_profit_loss_data()
+        security_types = ["stock", "option"] if asset_type == "all" else [asset_type]
+
+        yield "{"
+        for i, security_type in enumerate(security_types):
+            sec_data = profit_loss_data[security_type]
+            yield ", " if i else ""
+            yield f'{json.dumps(security_type)}: {{"has_trades": {json.dumps(sec_data["has_trades"])}, "summary": '
+            yield from self._iter_summary_json(sec_data["summary"])
+            yield ', "all_trades": '
+            yield from _iter_json_array(self._iter_trade_rows(sec_data["all_buy_trades"]))
+            yield "}"
+        yield "}"
+
+    def _iter_summary_json(self, summary: Any) -> Iterator[str]:
+        """Streaming counterpart of _convert_summary_to_dict"""
+        if not hasattr(summary, "__dict__"):
+            yield "{}"
+            return
+
+        yield "{"
+        separator = ""
+        for key, value in summary.__dict__.items():
+            if key.startswith("__") and key.endswith("__"):
+                continue
+            yield f"{separator}{json.dumps(key)}: "
+            separator = ", "
+            if key == "buy_trades" or key == "sell_trades":
+                yield from _iter_json_array(t.to_dict() for t in value or ())
+            else:
+                yield json.dumps(self._convert_summary_value(key, value))
+        yield "}"
+
+
+def derive_profit_loss_view(
+    profit_loss_json: Dict[str, Any],
+    status: Optional[str] = "all",
+    account: Optional[str] = None,
+    after_date: Optional[str] = None,
+    summary_only: bool = False,
+) -> Dict[str, Any]:
+    """
+    Filter an unfiltered get_profit_loss_data_json() result down to a view.
+
+    Status, account and after_date only select which matched buy trades a
+    result shows — lot matching always runs over every trade — so the view
+    is the unfiltered result's buy rows (each with its sells) that pass the
+    filters, and a summary recomputed from them. It equals what
+    analyze_trades(status, account, after_date) would produce, without
+    converting, sorting and matching the trades again.
+
+    Args:
+        profit_loss_json: Result of an analysis run with status 'all' and no
+            account or after_date filter. Not modified.
+        status, account, after_date: As for TradingAnalyzer.analyze_trades.
+        summary_only: Leave out each section's "all_trades" list, for
+            callers that only read the summaries (totals, win/loss counts,
+            batting average).
+
+    Returns:
+        A new dict; the trade rows in it are shared with profit_loss_json.
+    """
+    valid_statuses = ["all", "open", "closed", None]
+    if status not in valid_statuses:
+        raise ValueError(f"Invalid status: '{status}'. Must be one of {valid_statuses}")
+    after = None
+    if after_date is not None:
+        try:
+            after = datetime.strptime(after_date, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(
+                f"after_date must be in 'yyyy-mm-dd' format, got: {after_date}"
+            )
+
+    def keep(buy_row: Dict[str, Any]) -> bool:
+        if account and buy_row["account"] != account:
+            return False
+        if after and datetime.fromisoformat(buy_row["trade_date"]) < after:
+            return False
+        if status == "open" and buy_row["is_done"]:
+            return False
+        if status == "closed" and not buy_row["is_done"]:
+            return False
+        return True
+
+    view = {}
+    for security_type, section in profit_loss_json.items():
+        summary = section["summary"]
+        if not summary:
+            # No buy trades of this type at all: nothing to filter
+            view[security_type] = (
+                {"has_trades": False, "summary": {}} if summary_only else section
+            )
+            continue
+
+        buy_rows = []
+        all_trades = []
+        kept = False
+        for row in section["all_trades"]:
+            # Each buy row is followed by the rows of its applied sells
+            if row.get("is_buy_trade"):
+                kept = keep(row)
+                if kept:
+                    buy_rows.append(row)
+            if kept and not summary_only:
+                all_trades.append(row)
+
+        trade_summary = TradeSummary.create_from_trade_rows(
+            symbol=summary["symbol"],
+            is_option=summary["is_option"],
+            buy_rows=buy_rows,
+            account=account,
+            after_date=after_date,
+        )
+        view[security_type] = {
+            "has_trades": len(buy_rows) > 0,
+            "summary": TradingAnalyzer._convert_summary_to_dict(trade_summary),
+        }
+        if not summary_only:
+            view[security_type]["all_trades"] = all_trades
+    return view
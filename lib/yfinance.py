@@ -5,6 +5,8 @@ import logging
 import os
 import time
 
+from lib.request_timing import YAHOO, timed
+
 log = logging.getLogger(__name__)
 
 
@@ -57,7 +59,8 @@ class YahooFinance:
 
         # Fetch fresh data from Yahoo Finance
         log.info(f"Fetching fresh data for {self.stock_symbol}")
-        self.fetch_fresh_data(file_path)
+        with timed(YAHOO):
+            self.fetch_fresh_data(file_path)
 
     def is_cache_valid(self, file_path, max_age_minutes):
         """Check if the cached file is valid based on its age."""
@@ -147,3 +150,38 @@ def extract_price(info, is_option=False):
 def get_market_price(ticker, is_option=False):
     """Fetch the current market price for a ticker, or None if unavailable."""
     return extract_price(get_quote(ticker), is_option=is_option)
+
+
+def download_prices(tickers, downloader=yf.download):
+    """Fetch the latest price of many tickers in one multi-ticker download.
+
+    Takes each ticker's last close over the past few days, so a market-hours
+    call gets the live price and an option that didn't trade today still
+    has one. Returns {ticker: price or None}; a failed download (an error,
+    or nothing back at all) returns {} so callers can tell "no price" from
+    "couldn't ask".
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return {}
+    try:
+        with timed(YAHOO):
+            frame = downloader(
+                tickers, period="5d", interval="1d", group_by="ticker",
+                auto_adjust=False, progress=False, threads=True,
+            )
+    except Exception as e:
+        log.warning(f"Failed to download prices for {len(tickers)} tickers: {e}")
+        return {}
+    if frame is None or frame.empty:
+        log.warning(f"Price download for {len(tickers)} tickers returned nothing")
+        return {}
+
+    prices = {}
+    for ticker in tickers:
+        if ticker in frame.columns.get_level_values(0):
+            closes = frame[ticker]["Close"].dropna()
+        else:
+            closes = ()
+        prices[ticker] = float(closes.iloc[-1]) if len(closes) else None
+    return prices
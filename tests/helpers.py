@@ -6,11 +6,12 @@ from app import create_app
 from app.extensions import db
 
 
-def create_test_app(flask_env="dev"):
+def create_test_app(flask_env="dev", config=None):
     """App factory for tests — always uses an in-memory database.
 
     flask_env: "dev" (default) bypasses the API key check; pass None to leave
     FLASK_ENV unset so API auth enforcement itself can be tested.
+    config: extra app config, applied before the app is set up.
 
     The in-memory URI must be passed INTO create_app (as test_config) —
     assigning app.config["SQLALCHEMY_DATABASE_URI"] after create_app returns
@@ -23,6 +24,7 @@ def create_test_app(flask_env="dev"):
         os.environ["FLASK_ENV"] = flask_env
 
     app = create_app(test_config={
+        **(config or {}),
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
     })
@@ -34,3 +36,29 @@ def create_test_app(flask_env="dev"):
             f"Tests must run against an in-memory database, got: {engine_url}"
         )
     return app
+
+
+class FakeQuoteSource:
+    """Offline stand-in for lib.yfinance.download_prices.
+
+    Prices come from `prices` (or `default` for any other ticker); every
+    call's ticker list is recorded in `calls`. With `error` set, each call
+    raises it instead, like a download with the network down. With `gate`
+    (a threading.Event) set, each call waits for it first, like a slow
+    Yahoo response.
+    """
+
+    def __init__(self, prices=None, default=None, error=None, gate=None):
+        self.prices = dict(prices or {})
+        self.default = default
+        self.error = error
+        self.gate = gate
+        self.calls = []
+
+    def __call__(self, tickers):
+        self.calls.append(list(tickers))
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        if self.error is not None:
+            raise self.error
+        return {ticker: self.prices.get(ticker, self.default) for ticker in tickers}
@@ -2,8 +2,14 @@ import unittest
 from unittest.mock import patch
 
 from app.extensions import db
-from app.services import analysis_service
-from app.services.analysis_service import analyze_symbol_safe, clear_analysis_cache
+from app.services import analysis_service, dashboard_service, holdings_service
+from app.services.analysis_service import (
+    analyze_portfolio,
+    analyze_symbol_safe,
+    clear_analysis_cache,
+)
+from lib import portfolio_analysis
+from lib.analysis_cache import MISS, AnalysisCache
 from lib.db_utils import DatabaseInserter
 from tests.helpers import create_test_app
 
@@ -51,6 +57,18 @@ class TestAnalysisCache(unittest.TestCase):
         open_result = analyze_symbol_safe("CACHE1", status="open")
         self.assertIsNot(all_result, open_result)
 
+    def test_other_statuses_are_derived_without_reanalyzing(self):
+        self.db_inserter.insert_transaction(
+            stock_txn(action="S", trade_date="2026-02-01", quantity=4, amount=440.0, price=110.0)
+        )
+        analyze_symbol_safe("CACHE1", status="all")
+        with patch.object(analysis_service, "_run_analyzer") as mock_run:
+            open_result = analyze_symbol_safe("CACHE1", status="open")
+            closed_result = analyze_symbol_safe("CACHE1", status="closed")
+        mock_run.assert_not_called()
+        self.assertEqual(open_result, analysis_service.analyze_symbol("CACHE1", status="open"))
+        self.assertEqual(closed_result, analysis_service.analyze_symbol("CACHE1", status="closed"))
+
     def test_insert_invalidates_cache(self):
         first = analyze_symbol_safe("CACHE1")
         # New row changes the (MAX(id), COUNT(*)) data-version token
@@ -95,15 +113,331 @@ class TestAnalysisCache(unittest.TestCase):
         # After the transient failure, a real result is computed and returned
         self.assertIsNotNone(analyze_symbol_safe("CACHE1"))
 
-    def test_trade_update_endpoint_clears_cache(self):
+    def test_trade_update_invalidates_the_symbol(self):
         first = analyze_symbol_safe("CACHE1")
         trade_id = 1
-        response = self.client.patch(
-            f"/api/trade/update/{trade_id}", json={"reason": "cache test"}
-        )
+        with patch.object(analysis_service, "clear_analysis_cache") as mock_clear:
+            response = self.client.patch(
+                f"/api/trade/update/{trade_id}", json={"reason": "cache test"}
+            )
         self.assertEqual(response.status_code, 200)
+        mock_clear.assert_not_called()
         second = analyze_symbol_safe("CACHE1")
         self.assertIsNot(second, first)
+        self.assertEqual(second["stock"]["all_trades"][0]["reason"], "cache test")
+
+    def test_other_symbol_insert_keeps_cached_entry(self):
+        first = analyze_symbol_safe("CACHE1")
+        self.db_inserter.insert_security({"symbol": "OTHER", "name": "Other Co"})
+        self.db_inserter.insert_transaction(stock_txn(symbol="OTHER"))
+        with patch.object(analysis_service, "_run_analyzer") as mock_run:
+            second = analyze_symbol_safe("CACHE1")
+        mock_run.assert_not_called()
+        self.assertIs(second, first)
+
+    def test_delete_invalidates_the_symbol(self):
+        self.db_inserter.insert_transaction(
+            stock_txn(action="S", trade_date="2026-02-01", amount=1100.0, price=110.0)
+        )
+        first = analyze_symbol_safe("CACHE1")
+        self.db_inserter.cursor.execute("DELETE FROM trade_transaction WHERE action = 'S'")
+        self.db_inserter.connection.commit()
+        second = analyze_symbol_safe("CACHE1")
+        self.assertEqual(first["stock"]["summary"]["sold_quantity"], 10)
+        self.assertEqual(second["stock"]["summary"]["sold_quantity"], 0)
+
+    def _lot_match_rows(self):
+        self.db_inserter.cursor.execute("SELECT COUNT(*) FROM lot_match")
+        return self.db_inserter.cursor.fetchone()[0]
+
+    def test_analysis_reads_the_lot_ledger_without_writing(self):
+        self.db_inserter.insert_transaction(
+            stock_txn(action="S", trade_date="2026-02-01", amount=1100.0, price=110.0)
+        )
+        self.assertTrue(analysis_service.extend_lot_ledger())
+        ledger_rows = self._lot_match_rows()
+        with patch.object(
+            analysis_service.LotLedger, "read", autospec=True,
+            side_effect=analysis_service.LotLedger.read,
+        ) as mock_read, patch.object(
+            analysis_service.LotLedger, "extend",
+        ) as mock_extend:
+            result = analyze_symbol_safe("CACHE1")
+        mock_read.assert_called_once()
+        mock_extend.assert_not_called()
+        self.assertEqual(result["stock"]["summary"]["profit_loss"], 100.0)
+        self.assertEqual(self._lot_match_rows(), ledger_rows)
+
+    def test_rows_past_the_ledger_are_matched_in_memory(self):
+        self.assertTrue(analysis_service.extend_lot_ledger())
+        ledger_rows = self._lot_match_rows()
+        self.db_inserter.insert_transaction(
+            stock_txn(action="S", trade_date="2026-02-01", amount=1100.0, price=110.0)
+        )
+        result = analyze_symbol_safe("CACHE1")
+        self.assertEqual(result["stock"]["summary"]["profit_loss"], 100.0)
+        self.assertEqual(self._lot_match_rows(), ledger_rows)
+
+    def test_trade_update_extends_the_lot_ledger(self):
+        self.assertTrue(analysis_service.extend_lot_ledger())
+        trade_id = self.db_inserter.cursor.execute(
+            "SELECT id FROM trade_transaction WHERE symbol = 'CACHE1'"
+        ).fetchone()[0]
+        response = self.client.patch(f"/api/trade/update/{trade_id}", json={"reason": "Breakout"})
+        self.assertEqual(response.status_code, 200)
+        with DatabaseInserter(db=db) as conn:
+            self.assertIsNotNone(analysis_service.LotLedger(conn).read("CACHE1"))
+
+    def _cold_worker(self):
+        """Drop this process's entries, as if the request hit a fresh worker."""
+        analysis_service._cache.clear()
+        analysis_service._portfolio_symbols.clear()
+
+    def test_cold_worker_reads_the_shared_cache(self):
+        first = analyze_symbol_safe("CACHE1")
+        self._cold_worker()
+        with patch.object(analysis_service, "_run_analyzer") as mock_run:
+            second = analyze_symbol_safe("CACHE1")
+        mock_run.assert_not_called()
+        self.assertEqual(second, first)
+
+    def test_clear_analysis_cache_clears_the_shared_cache(self):
+        analyze_symbol_safe("CACHE1")
+        clear_analysis_cache()
+        self.db_inserter.cursor.execute("SELECT COUNT(*) FROM analysis_cache")
+        self.assertEqual(self.db_inserter.cursor.fetchone()[0], 0)
+
+
+class TestAnalysisCacheTable(unittest.TestCase):
+    def setUp(self):
+        self.db = DatabaseInserter(db_path=":memory:")
+        self.cache = AnalysisCache(self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_round_trip(self):
+        result = {"stock": {"has_trades": True, "summary": {"profit_loss": 12.5}}}
+        self.cache.put("AAA", "open", "10:10", result)
+        self.assertEqual(self.cache.get("AAA", "open", "10:10"), result)
+        self.assertIs(self.cache.get("AAA", "closed", "10:10"), MISS)
+
+    def test_none_result_is_a_hit(self):
+        self.cache.put("EMPTY", "all", "1:1", None)
+        self.assertIsNone(self.cache.get("EMPTY", "all", "1:1"))
+
+    def test_other_version_is_a_miss_and_replaced_on_write(self):
+        self.cache.put("AAA", "all", "1", {"n": 1})
+        self.assertIs(self.cache.get("AAA", "all", "2"), MISS)
+        self.cache.put("AAA", "all", "2", {"n": 2})
+        self.assertIs(self.cache.get("AAA", "all", "1"), MISS)
+        self.assertEqual(self.cache.get("AAA", "all", "2"), {"n": 2})
+
+    def test_max_age(self):
+        self.cache.put("AAA", "all", "1:1", {"n": 1})
+        with patch("lib.analysis_cache.time.time", return_value=10**10):
+            self.assertIs(self.cache.get("AAA", "all", "1:1", max_age=60), MISS)
+
+    def test_evicts_least_recently_read(self):
+        with patch("lib.analysis_cache.time.time", return_value=1000.0):
+            self.cache.put("OLD", "all", "1:1", {"n": 1})
+        with patch("lib.analysis_cache.time.time", return_value=2000.0):
+            self.cache.put("NEW", "all", "1:1", {"n": 2})
+        # Reading OLD makes NEW the least recently used
+        with patch("lib.analysis_cache.time.time", return_value=3000.0):
+            self.cache.get("OLD", "all", "1:1")
+        self.cache.max_bytes = self.cache.total_bytes()
+        self.cache.put("NEWEST", "all", "1:1", {"n": 3})
+        versions = {"OLD": "1:1", "NEW": "1:1", "NEWEST": "1:1"}
+        self.assertEqual(sorted(self.cache.get_many(versions, "all")), ["NEWEST", "OLD"])
+
+
+class TestAnalyzePortfolio(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app(flask_env="dev")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        clear_analysis_cache()
+        self.db_inserter = DatabaseInserter(db=db)
+        for symbol in ("CACHE1", "CACHE2"):
+            self.db_inserter.insert_security({"symbol": symbol, "name": symbol})
+            self.db_inserter.insert_transaction(stock_txn(symbol=symbol))
+            self.db_inserter.insert_transaction(stock_txn(
+                symbol=symbol, action="S", trade_date="2026-02-01",
+                quantity=4, amount=440.0, price=110.0,
+            ))
+        self.db_inserter.insert_security({"symbol": "NOTRADES", "name": "No Trades"})
+
+    def tearDown(self):
+        clear_analysis_cache()
+        db.session.remove()
+        self.app_context.pop()
+
+    def test_matches_per_symbol_analysis(self):
+        portfolio = analyze_portfolio(status="open")
+        self.assertEqual(list(portfolio), ["CACHE1", "CACHE2"])
+        clear_analysis_cache()
+        for symbol, result in portfolio.items():
+            self.assertEqual(result, analyze_symbol_safe(symbol, status="open"))
+
+    def test_uses_one_scan_and_one_version_check(self):
+        with patch.object(
+            analysis_service, "_symbol_versions", wraps=analysis_service._symbol_versions,
+        ) as mock_version, patch.object(
+            analysis_service, "get_trade_data_for_analysis",
+        ) as mock_fetch:
+            analyze_portfolio()
+        mock_version.assert_called_once()
+        mock_fetch.assert_not_called()
+
+    def test_shares_the_per_symbol_cache(self):
+        portfolio = analyze_portfolio()
+        self.assertIs(analyze_symbol_safe("CACHE1"), portfolio["CACHE1"])
+
+    def test_repeat_call_skips_the_scan(self):
+        first = analyze_portfolio()
+        with patch.object(analysis_service, "iter_trade_data_by_symbol") as mock_scan:
+            second = analyze_portfolio()
+        mock_scan.assert_not_called()
+        self.assertEqual(second, first)
+
+    def test_insert_invalidates_portfolio(self):
+        analyze_portfolio()
+        self.db_inserter.insert_transaction(stock_txn(
+            symbol="CACHE2", action="S", trade_date="2026-03-01",
+            quantity=6, amount=720.0, price=120.0,
+        ))
+        portfolio = analyze_portfolio()
+        self.assertEqual(portfolio["CACHE2"]["stock"]["summary"]["sold_quantity"], 10)
+
+    def test_cold_worker_serves_portfolio_from_the_shared_cache(self):
+        first = analyze_portfolio()
+        analysis_service._cache.clear()
+        analysis_service._portfolio_symbols.clear()
+        with patch.object(analysis_service, "iter_trade_data_by_symbol") as mock_scan:
+            second = analyze_portfolio()
+        mock_scan.assert_not_called()
+        self.assertEqual(second, first)
+
+    def test_statuses_share_one_analysis(self):
+        with patch.object(
+            analysis_service, "analyze_groups", wraps=analysis_service.analyze_groups,
+        ) as mock_groups:
+            for status in analysis_service.WARM_STATUSES:
+                analyze_portfolio(status=status)
+        mock_groups.assert_called_once()
+        self.db_inserter.cursor.execute("SELECT DISTINCT status FROM analysis_cache")
+        self.assertEqual(self.db_inserter.cursor.fetchall(), [("all",)])
+
+    def test_summary_only_results(self):
+        full = analyze_portfolio(status="closed")
+        summaries = analyze_portfolio(status="closed", summary_only=True)
+        self.assertEqual(list(summaries), list(full))
+        for symbol, result in summaries.items():
+            for security_type, section in result.items():
+                self.assertNotIn("all_trades", section)
+                self.assertEqual(section["summary"], full[symbol][security_type]["summary"])
+        self.assertIs(analyze_portfolio(status="closed", summary_only=True)["CACHE1"],
+                      summaries["CACHE1"])
+
+    def test_summary_only_never_builds_the_full_payload(self):
+        with patch.object(
+            analysis_service.TradingAnalyzer, "_iter_trade_rows",
+        ) as mock_rows, patch.object(
+            analysis_service, "analyze_groups", wraps=analysis_service.analyze_groups,
+        ) as mock_groups:
+            summaries = analyze_portfolio(status="closed", summary_only=True)
+        mock_rows.assert_not_called()
+        self.assertTrue(mock_groups.call_args.kwargs["summary_only"])
+        self.db_inserter.cursor.execute("SELECT DISTINCT status FROM analysis_cache")
+        self.assertEqual(self.db_inserter.cursor.fetchall(), [("closed:summary",)])
+        self.assertFalse(any(status == "all" for _, status in analysis_service._cache))
+
+        full = analyze_portfolio(status="closed")
+        self.assertEqual(list(summaries), list(full))
+        for symbol, result in summaries.items():
+            for security_type, section in result.items():
+                self.assertEqual(section["summary"], full[symbol][security_type]["summary"])
+                self.assertEqual(section["has_trades"], full[symbol][security_type]["has_trades"])
+
+    def test_cold_worker_serves_summaries_from_the_shared_cache(self):
+        first = analyze_portfolio(status="closed", summary_only=True)
+        analysis_service._cache.clear()
+        analysis_service._portfolio_symbols.clear()
+        with patch.object(analysis_service, "iter_trade_data_by_symbol") as mock_scan:
+            second = analyze_portfolio(status="closed", summary_only=True)
+        mock_scan.assert_not_called()
+        self.assertEqual(second, first)
+
+    def test_portfolio_reads_the_lot_ledger_without_writing(self):
+        self.assertTrue(analysis_service.extend_lot_ledger())
+        self.db_inserter.insert_transaction(stock_txn(
+            symbol="CACHE2", action="S", trade_date="2026-03-01",
+            quantity=6, amount=720.0, price=120.0,
+        ))
+        changes = self.db_inserter.connection.total_changes
+        with patch.object(analysis_service, "_shared_put"):
+            portfolio = analyze_portfolio()
+        self.assertEqual(self.db_inserter.connection.total_changes, changes)
+        self.assertEqual(portfolio["CACHE2"]["stock"]["summary"]["sold_quantity"], 10)
+        clear_analysis_cache()
+        self.assertEqual(portfolio["CACHE2"], analysis_service.analyze_symbol("CACHE2"))
+
+    def test_warm_analysis_cache_fills_every_ui_status(self):
+        analysis_service.warm_analysis_cache()
+        with patch.object(analysis_service, "iter_trade_data_by_symbol") as mock_scan:
+            for status in analysis_service.WARM_STATUSES:
+                self.assertEqual(list(analyze_portfolio(status=status)), ["CACHE1", "CACHE2"])
+        mock_scan.assert_not_called()
+
+    def test_warmed_aggregates_are_served_to_a_cold_worker(self):
+        summary = dashboard_service.build_dashboard_summary()
+        positions = holdings_service.aggregate_open_positions()
+        self.assertEqual(summary["overall"]["symbols_traded"], 0)
+        self.assertEqual(sorted(positions["stock"]), ["CACHE1", "CACHE2"])
+
+        analysis_service._cache.clear()
+        analysis_service._portfolio_symbols.clear()
+        with patch.object(dashboard_service, "analyze_portfolio") as mock_summary_scan, \
+                patch.object(holdings_service, "analyze_portfolio") as mock_positions_scan:
+            self.assertEqual(dashboard_service.build_dashboard_summary(), summary)
+            self.assertEqual(holdings_service.aggregate_open_positions(), positions)
+        mock_summary_scan.assert_not_called()
+        mock_positions_scan.assert_not_called()
+
+    def test_aggregates_rebuild_when_a_symbol_changes(self):
+        dashboard_service.build_dashboard_summary()
+        self.db_inserter.insert_transaction(stock_txn(
+            symbol="CACHE2", action="S", trade_date="2026-03-01",
+            quantity=6, amount=720.0, price=120.0,
+        ))
+        summary = dashboard_service.build_dashboard_summary()
+        self.assertEqual(summary["overall"]["symbols_traded"], 1)
+        self.assertEqual(summary["by_symbol"][0]["symbol"], "CACHE2")
+
+    def test_parallel_mode_matches_serial(self):
+        serial = analyze_portfolio()
+        clear_analysis_cache()
+        env = {"ANALYSIS_WORKERS": "2", "ANALYSIS_PARALLEL_MIN_SYMBOLS": "1"}
+        try:
+            with patch.dict(analysis_service.os.environ, env):
+                parallel = analyze_portfolio()
+        finally:
+            portfolio_analysis.shutdown_pool()
+        self.assertEqual(parallel, serial)
+
+    def test_failing_symbol_is_skipped(self):
+        real_analyze = portfolio_analysis.analyze_transactions
+
+        def fail_cache1(symbol, *args, **kwargs):
+            if symbol == "CACHE1":
+                raise ValueError("bad data")
+            return real_analyze(symbol, *args, **kwargs)
+
+        with patch.object(portfolio_analysis, "analyze_transactions", side_effect=fail_cache1):
+            portfolio = analyze_portfolio()
+        self.assertEqual(list(portfolio), ["CACHE2"])
 
 
 if __name__ == "__main__":
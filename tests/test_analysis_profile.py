@@ -0,0 +1,84 @@
+import unittest
+
+from lib.analysis_profile import STAGES, StageStats, StageTimer, stage_stats
+from lib.trading_analyzer import TradingAnalyzer
+
+
+def trade(**overrides):
+    row = {
+        "id": "1",
+        "symbol": "PROF",
+        "action": "B",
+        "trade_date": "2024-01-02",
+        "quantity": 10,
+        "price": 100.0,
+        "amount": -1000.0,
+        "account": "C",
+    }
+    row.update(overrides)
+    return row
+
+
+class TestStageTimer(unittest.TestCase):
+    def test_stages_accumulate_in_stage_order(self):
+        stats = StageStats()
+        timer = StageTimer("AAA", stats=stats)
+        timer.add("match", 0.5, rows=3)
+        timer.add("convert", 0.25, rows=10)
+        timer.add("match", 0.25, rows=2)
+
+        self.assertEqual(timer.as_dict(), {
+            "total_seconds": 1.0,
+            "stages": [
+                {"stage": "convert", "seconds": 0.25, "rows": 10},
+                {"stage": "match", "seconds": 0.75, "rows": 5},
+            ],
+        })
+        self.assertEqual(stats.snapshot()["stages"]["match"]["calls"], 2)
+
+    def test_failed_stage_is_still_timed(self):
+        timer = StageTimer("AAA", stats=None)
+        with self.assertRaises(ValueError):
+            with timer.stage("convert", rows=1):
+                raise ValueError("bad row")
+        self.assertIn("convert", timer.stages)
+
+
+class TestStageStats(unittest.TestCase):
+    def test_snapshot_ranks_symbols_by_time(self):
+        stats = StageStats()
+        for symbol, seconds in (("FAST", 0.1), ("SLOW", 2.0), ("MID", 0.5)):
+            stats.add(symbol, "convert", seconds, rows=1)
+            stats.add(symbol, "match", seconds)
+
+        snapshot = stats.snapshot(top=2)
+        self.assertEqual([s["symbol"] for s in snapshot["slowest_symbols"]], ["SLOW", "MID"])
+        self.assertEqual(snapshot["slowest_symbols"][0]["runs"], 1)
+        self.assertEqual(snapshot["symbols_profiled"], 3)
+        convert = snapshot["stages"]["convert"]
+        self.assertEqual((convert["calls"], convert["rows"], convert["max_symbol"]), (3, 3, "SLOW"))
+        self.assertAlmostEqual(convert["mean_seconds"], 2.6 / 3, places=6)
+
+
+class TestAnalyzerStages(unittest.TestCase):
+    def setUp(self):
+        stage_stats.reset()
+        self.addCleanup(stage_stats.reset)
+
+    def test_analysis_records_every_stage(self):
+        analyzer = TradingAnalyzer("PROF", [
+            trade(),
+            trade(id="2", action="S", trade_date="2024-02-01", price=110.0, amount=1100.0),
+        ])
+        analyzer.analyze_trades()
+        analyzer.get_profit_loss_data_json()
+
+        profile = analyzer.timings.as_dict()
+        self.assertEqual([s["stage"] for s in profile["stages"]], list(STAGES))
+        rows = {s["stage"]: s["rows"] for s in profile["stages"]}
+        self.assertEqual((rows["convert"], rows["match"], rows["serialize"]), (2, 1, 2))
+        self.assertEqual(stage_stats.snapshot()["slowest_symbols"][0]["symbol"], "PROF")
+
+
+if __name__ == "__main__":
+    unittest.main()
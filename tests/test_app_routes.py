@@ -1,12 +1,16 @@
 import os
+import json
+import re
 import unittest
 import logging
 from unittest.mock import patch, MagicMock
 from sqlalchemy import select, delete
 from app.models.models import Security, TradeTransaction
 from app.extensions import db
+from app.services.analysis_service import refresh_realized_pnl
+from app.services.trade_service import encode_cursor
 from lib.db_utils import DatabaseInserter
-from tests.helpers import create_test_app
+from tests.helpers import FakeQuoteSource, create_test_app
 
 # Configure test logger
 test_logger = logging.getLogger("test_routes")
@@ -310,6 +314,65 @@ class TestAppRoutes(unittest.TestCase):
 
         self.assertIn(b"FAKE1", response.data, "Symbol 'FAKE1' not found in response")
 
+    def test_trades_by_symbol_route_paged(self):
+        """Test trades by symbol route pages with limit and cursor links"""
+        response = self.client.get("/trades/FAKE1?limit=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Later", response.data)
+        self.assertNotIn(b"Earlier", response.data)
+
+        next_url = re.search(rb'href="([^"]*after=[^"]*)"', response.data).group(1)
+        response = self.client.get(next_url.decode().replace("&amp;", "&"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Earlier", response.data)
+
+        for cursor in ("garbage", encode_cursor("2024-01-01", "x"),
+                       encode_cursor("2024-01-01T00:00+00:00", 1)):
+            response = self.client.get(f"/trades/FAKE1?after={cursor}")
+            self.assertEqual(response.status_code, 400, cursor)
+
+    def _trades_page(self, url):
+        """(transaction ids, earlier link, later link) of a /trades page."""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        ids = [int(i) for i in re.findall(rb'href="/transaction/(\d+)"', response.data)]
+        links = []
+        for direction in (b"before", b"after"):
+            match = re.search(rb'href="([^"]*' + direction + rb'=[^"]*)"', response.data)
+            links.append(match.group(1).decode().replace("&amp;", "&") if match else None)
+        return ids, *links
+
+    def test_trades_by_symbol_pages_cover_rows_sharing_a_date(self):
+        """Every row appears exactly once walking the pages either way"""
+        self.db_inserter.insert_security({"symbol": "PAGE1", "name": "Paging Co"})
+        inserted = []
+        # Bare 'YYYY-MM-DD' text, as the Schwab sync writes them, and
+        # timestamps, which order by their time of day within the date
+        for trade_date in ("2025-01-01", "2025-01-01", "2025-01-02 15:00:00",
+                           "2025-01-02 09:30:00", "2025-01-03", "2025-01-03"):
+            self.db_inserter.insert_transaction({
+                "symbol": "PAGE1", "action": "B", "label": "", "trade_type": "L",
+                "trade_date": trade_date, "quantity": 1, "price": 10.0,
+                "amount": -10.0, "account": "C",
+            })
+            inserted.append(self.db_inserter.cursor.lastrowid)
+        inserted[2:4] = inserted[3], inserted[2]
+
+        forward, url, last_url = [], "/trades/PAGE1?limit=1", None
+        while url:
+            last_url = url
+            ids, _, url = self._trades_page(url)
+            forward.extend(ids)
+        self.assertEqual(forward, inserted)
+
+        # Back from the last page via the "Earlier" links
+        ids, url, _ = self._trades_page(last_url)
+        backward = ids
+        while url:
+            ids, url, _ = self._trades_page(url)
+            backward = ids + backward
+        self.assertEqual(backward, inserted)
+
     # @unittest.skip("Skipping test_update_transaction_route")
     def test_update_transaction_route(self):
         """Test updating a transaction works correctly"""
@@ -806,6 +869,92 @@ class TestAppRoutes(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("asset_type", response.json["error"])
 
+    def test_api_positions_streamed_matches_buffered(self):
+        """Test GET with stream=1 returns the same document as the buffered response"""
+        for query in ("", "&asset_type=option", "&after_date=2025-01-01&account=O"):
+            url = f"/api/trades/all/json/FAKE1?stream=1{query}"
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.mimetype, "application/json")
+
+            buffered = self.client.get(url.replace("stream=1", "stream=0"))
+            self.assertEqual(json.loads(response.get_data()), buffered.json, url)
+
+    def test_api_positions_streamed_invalid_params(self):
+        """Test stream=1 still validates query params before streaming"""
+        response = self.client.get("/api/trades/all/json/FAKE1?stream=1&account=INVALID")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("account", response.json["error"])
+
+    def test_api_positions_paged_walks_every_lot(self):
+        """Test limit/after page through all_trades by lot, keeping whole-set totals"""
+        for day, action in ((3, "B"), (4, "B"), (5, "S"), (6, "B")):
+            self.db_inserter.insert_transaction({
+                "symbol": filter_symbol, "action": action, "label": "", "trade_type": "L",
+                "trade_date": f"2025-04-0{day} 10:00", "reason": "Paging",
+                "quantity": 10, "price": 10.0 + day,
+                "amount": (-1 if action == "B" else 1) * 10 * (10.0 + day), "account": "R",
+            })
+        full = self.client.get(f"/api/trades/all/json/{filter_symbol}?asset_type=stock").json
+        full_stock = full["transaction_stats"]["stock"]
+
+        pages, cursor = [], None
+        while True:
+            url = f"/api/trades/all/json/{filter_symbol}?asset_type=stock&limit=1"
+            response = self.client.get(url + (f"&after={cursor}" if cursor else ""))
+            self.assertEqual(response.status_code, 200)
+            stock = response.json["transaction_stats"]["stock"]
+            self.assertEqual(stock["summary"], full_stock["summary"])
+            self.assertEqual(stock["page"]["total_trades"], len(full_stock["all_trades"]))
+            self.assertTrue(stock["all_trades"][0].get("is_buy_trade"))
+            self.assertEqual(sum(bool(t.get("is_buy_trade")) for t in stock["all_trades"]), 1)
+            pages.append(stock)
+            cursor = stock["page"]["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertGreater(len(pages), 1, f"{filter_symbol} should have several stock lots")
+        self.assertEqual(len(pages), pages[0]["page"]["total_lots"])
+        paged_rows = [row for page in pages for row in page["all_trades"]]
+        self.assertCountEqual(
+            [json.dumps(r, sort_keys=True) for r in paged_rows],
+            [json.dumps(r, sort_keys=True) for r in full_stock["all_trades"]],
+        )
+        buy_dates = [r["trade_date"] for r in paged_rows if r.get("is_buy_trade")]
+        self.assertEqual(buy_dates, sorted(buy_dates))
+
+        # Walking back from the last page returns the one before it
+        response = self.client.get(
+            f"/api/trades/all/json/{filter_symbol}?asset_type=stock&limit=1"
+            f"&before={pages[-1]['page']['prev_cursor']}"
+        )
+        self.assertEqual(
+            response.json["transaction_stats"]["stock"]["all_trades"], pages[-2]["all_trades"]
+        )
+
+    def test_api_positions_pages_come_from_the_analysis_cache(self):
+        """Unfiltered pages are cut from the cached analysis, not a fresh one"""
+        url = f"/api/trades/all/json/{filter_symbol}?asset_type=stock&limit=1"
+        first = self.client.get(url).json["transaction_stats"]["stock"]
+        with patch("app.services.analysis_service._run_analyzer") as run:
+            second = self.client.get(url).json["transaction_stats"]["stock"]
+            self.client.get(url + f"&after={first['page']['next_cursor']}")
+        run.assert_not_called()
+        self.assertEqual(second, first)
+        # Paging left the cached result whole
+        full = self.client.get(f"/api/trades/all/json/{filter_symbol}").json
+        self.assertEqual(
+            len(full["transaction_stats"]["stock"]["all_trades"]), first["page"]["total_trades"]
+        )
+
+    def test_api_positions_invalid_page_params(self):
+        """Test invalid limit or cursor returns 400"""
+        crafted = (encode_cursor("2024-01-01", "x"), encode_cursor("2024-01-01T00:00+00:00", 1))
+        for query in ("limit=0", "limit=abc", "after=not-a-cursor", "after=x&before=y",
+                      *(f"after={c}" for c in crafted), *(f"before={c}" for c in crafted)):
+            response = self.client.get(f"/api/trades/all/json/FAKE1?{query}")
+            self.assertEqual(response.status_code, 400, query)
+
     def test_api_get_stock_data(self):
         """GET /api/get_stock_data/<symbol> returns JSON from YahooFinance."""
         mock_data = {"currentPrice": 150.0, "symbol": "FAKE1", "quoteType": "EQUITY"}
@@ -932,6 +1081,7 @@ class TestAppRoutes(unittest.TestCase):
 
     def test_dashboard_pnl_over_time_structure(self):
         """pnl_over_time returns monthly and quarterly lists with required keys."""
+        refresh_realized_pnl()  # as a sync's warm-up would
         response = self.client.get("/api/dashboard/pnl_over_time")
         self.assertEqual(response.status_code, 200)
         data = response.get_json()
@@ -952,6 +1102,7 @@ class TestAppRoutes(unittest.TestCase):
         FAKE1 option closed 2024-12-15 → 2024-12 must appear.
         FILT1 stock  closed 2025-02-02 → 2025-02 must appear.
         """
+        refresh_realized_pnl()  # as a sync's warm-up would
         response = self.client.get("/api/dashboard/pnl_over_time")
         data = response.get_json()
 
@@ -980,6 +1131,7 @@ class TestAppRoutes(unittest.TestCase):
 
     def test_dashboard_pnl_over_time_asset_type_filter(self):
         """asset_type filter changes results: stock-only total differs from all."""
+        refresh_realized_pnl()  # as a sync's warm-up would
         all_resp = self.client.get("/api/dashboard/pnl_over_time?asset_type=all")
         stock_resp = self.client.get("/api/dashboard/pnl_over_time?asset_type=stock")
         self.assertEqual(all_resp.status_code, 200)
@@ -990,6 +1142,52 @@ class TestAppRoutes(unittest.TestCase):
         # Stock-only should have fewer wins than all (options excluded)
         self.assertLess(stock_total, all_total)
 
+    def test_dashboard_pnl_over_time_periods_and_range(self):
+        """periods selects the bucket lists; start/end limit the close dates."""
+        refresh_realized_pnl()  # as a sync's warm-up would
+        response = self.client.get("/api/dashboard/pnl_over_time?periods=week,year")
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(set(data), {"weekly", "yearly"})
+        self.assertEqual(
+            sum(b["winning_trades"] for b in data["weekly"]),
+            sum(b["winning_trades"] for b in data["yearly"]),
+        )
+        self.assertIn("2024", [b["period"] for b in data["yearly"]])
+
+        response = self.client.get(
+            "/api/dashboard/pnl_over_time?periods=month&start=2025-01-01&end=2025-12-31"
+        )
+        self.assertEqual([b["period"] for b in response.get_json()["monthly"]], ["2025-02"])
+
+    def test_dashboard_pnl_over_time_reads_without_writing(self):
+        """A request serves the table as last refreshed and only reports that it is behind."""
+        response = self.client.get("/api/dashboard/pnl_over_time")
+        self.assertEqual(response.get_json()["monthly"], [])
+        self.assertEqual(response.headers["X-Realized-PnL-Stale"], str(len(TEST_SECURITIES)))
+
+        refresh_realized_pnl()
+        with DatabaseInserter(db=db) as conn:
+            writes = conn.connection.total_changes
+            response = self.client.get("/api/dashboard/pnl_over_time")
+            self.assertEqual(conn.connection.total_changes, writes)
+        self.assertNotIn("X-Realized-PnL-Stale", response.headers)
+        self.assertIn("2024-12", [b["period"] for b in response.get_json()["monthly"]])
+
+    def test_trade_update_refreshes_realized_pnl(self):
+        refresh_realized_pnl()
+        trade_id = db.session.execute(select(TradeTransaction.id)).scalars().first()
+        self.client.patch(f"/api/trade/update/{trade_id}", json={"reason": "edited"})
+        response = self.client.get("/api/dashboard/pnl_over_time")
+        self.assertNotIn("X-Realized-PnL-Stale", response.headers)
+
+    def test_dashboard_pnl_over_time_invalid_periods_or_range(self):
+        """Unknown periods or malformed date bounds return 400."""
+        for query in ("periods=decade", "periods=", "start=2025-13-01",
+                      "start=2025-02-01&end=2025-01-01"):
+            response = self.client.get(f"/api/dashboard/pnl_over_time?{query}")
+            self.assertEqual(response.status_code, 400, query)
+
     def test_dashboard_pnl_over_time_invalid_asset_type(self):
         """Invalid asset_type returns 400."""
         response = self.client.get("/api/dashboard/pnl_over_time?asset_type=bad")
@@ -997,12 +1195,9 @@ class TestAppRoutes(unittest.TestCase):
 
     # --- Holdings endpoint tests (GET /api/holdings) ---
 
-    @patch("lib.yfinance.YahooFinance")
-    def test_api_holdings_structure(self, MockYF):
+    @patch("app.services.holdings_service.download_prices", FakeQuoteSource(default=210.0))
+    def test_api_holdings_structure(self):
         """GET /api/holdings returns stock and option sections with correct structure."""
-        instance = MockYF.return_value
-        instance.get_stock_data.return_value = None
-        instance.get_results.return_value = {"currentPrice": 210.0, "quoteType": "EQUITY"}
 
         response = self.client.get("/api/holdings")
         self.assertEqual(response.status_code, 200)
@@ -1017,12 +1212,9 @@ class TestAppRoutes(unittest.TestCase):
             self.assertIn("total_market_value", section)
             self.assertIn("total_unrealized_pnl", section)
 
-    @patch("lib.yfinance.YahooFinance")
-    def test_api_holdings_shows_only_open_positions(self, MockYF):
+    @patch("app.services.holdings_service.download_prices", FakeQuoteSource(default=210.0))
+    def test_api_holdings_shows_only_open_positions(self):
         """Holdings endpoint only returns genuinely open positions (FAKE3 stock, not FAKE1/FAKE2)."""
-        instance = MockYF.return_value
-        instance.get_stock_data.return_value = None
-        instance.get_results.return_value = {"currentPrice": 210.0, "quoteType": "EQUITY"}
 
         response = self.client.get("/api/holdings")
         self.assertEqual(response.status_code, 200)
@@ -1038,12 +1230,9 @@ class TestAppRoutes(unittest.TestCase):
         # FAKE2 stock is fully closed
         self.assertNotIn("FAKE2", stock_symbols, "FAKE2 stock should not be in open holdings")
 
-    @patch("lib.yfinance.YahooFinance")
-    def test_api_holdings_stock_position_fields(self, MockYF):
+    @patch("app.services.holdings_service.download_prices", FakeQuoteSource(default=210.0))
+    def test_api_holdings_stock_position_fields(self):
         """Each stock position has all required fields with correct values."""
-        instance = MockYF.return_value
-        instance.get_stock_data.return_value = None
-        instance.get_results.return_value = {"currentPrice": 210.0, "quoteType": "EQUITY"}
 
         response = self.client.get("/api/holdings")
         data = response.json
@@ -1067,12 +1256,9 @@ class TestAppRoutes(unittest.TestCase):
         self.assertEqual(fake3["unrealized_pnl"], 250.0)
         self.assertEqual(fake3["pnl_pct"], 5.0)
 
-    @patch("lib.yfinance.YahooFinance")
-    def test_api_holdings_option_open_positions(self, MockYF):
+    @patch("app.services.holdings_service.download_prices", FakeQuoteSource(default=4.50))
+    def test_api_holdings_option_open_positions(self):
         """FAKE3 open option position appears in option section, FAKE1 closed option does not."""
-        instance = MockYF.return_value
-        instance.get_stock_data.return_value = None
-        instance.get_results.return_value = {"lastPrice": 4.50, "quoteType": "OPTION"}
 
         response = self.client.get("/api/holdings")
         data = response.json
@@ -1091,12 +1277,9 @@ class TestAppRoutes(unittest.TestCase):
         self.assertEqual(fake3_opt["avg_cost"], 3.50)
         self.assertEqual(fake3_opt["cost_basis"], 700.0)  # 3.50 * 2 * 100
 
-    @patch("lib.yfinance.YahooFinance")
-    def test_api_holdings_totals(self, MockYF):
+    @patch("app.services.holdings_service.download_prices", FakeQuoteSource(default=210.0))
+    def test_api_holdings_totals(self):
         """Holdings totals include values from open positions and are consistent."""
-        instance = MockYF.return_value
-        instance.get_stock_data.return_value = None
-        instance.get_results.return_value = {"currentPrice": 210.0, "quoteType": "EQUITY"}
 
         response = self.client.get("/api/holdings")
         data = response.json
@@ -1111,11 +1294,9 @@ class TestAppRoutes(unittest.TestCase):
             places=2,
         )
 
-    @patch("lib.yfinance.YahooFinance")
-    def test_api_holdings_price_fetch_failure(self, MockYF):
+    @patch("app.services.holdings_service.download_prices", FakeQuoteSource(error=Exception("API down")))
+    def test_api_holdings_price_fetch_failure(self):
         """Holdings still returns positions when price fetch fails (prices are None)."""
-        instance = MockYF.return_value
-        instance.get_stock_data.side_effect = Exception("API down")
 
         response = self.client.get("/api/holdings")
         self.assertEqual(response.status_code, 200)
@@ -168,6 +168,61 @@ class TestInsertTransaction(DbUtilsTestCase):
             self.db.insert_transaction(stock_txn())
 
 
+class TestInsertTransactions(DbUtilsTestCase):
+    def _count(self):
+        self.db.cursor.execute("SELECT COUNT(*) FROM trade_transaction")
+        return self.db.cursor.fetchone()[0]
+
+    def test_inserts_batch_and_returns_inserted_records(self):
+        records = [stock_txn(activity_id=1, leg_index=0), stock_txn(activity_id=2, leg_index=0)]
+        self.assertEqual(self.db.insert_transactions(records), records)
+        self.assertEqual(self._count(), 2)
+
+    def test_skips_stored_and_repeated_activity_ids(self):
+        self.db.insert_transaction(stock_txn(activity_id=1, leg_index=0))
+        records = [
+            stock_txn(activity_id=1, leg_index=0),
+            stock_txn(activity_id=1, leg_index=1),
+            stock_txn(activity_id=1, leg_index=1),
+        ]
+        self.assertEqual(self.db.insert_transactions(records), [records[1]])
+        self.assertEqual(self._count(), 2)
+
+    def test_records_without_activity_id_use_business_field_match(self):
+        self.db.insert_transaction(stock_txn())
+        records = [stock_txn(), stock_txn(quantity=5.0), stock_txn(quantity=5.0)]
+        self.assertEqual(self.db.insert_transactions(records), [records[1]])
+        self.assertEqual(self._count(), 2)
+
+    def test_failure_inserts_nothing(self):
+        records = [stock_txn(activity_id=1), stock_txn(activity_id=2, price="bad")]
+        with self.assertRaises(ValueError):
+            self.db.insert_transactions(records)
+        self.assertEqual(self._count(), 0)
+
+    def test_nested_transactions_commit_once(self):
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                self.db.insert_securities([{"symbol": "FAKE", "name": "Fake Co"}])
+                self.db.insert_transactions([stock_txn(activity_id=1)])
+                raise ValueError("crash before the outer block commits")
+        self.db.cursor.execute("SELECT COUNT(*) FROM security")
+        self.assertEqual((self.db.cursor.fetchone()[0], self._count()), (0, 0))
+
+        with self.db.transaction():
+            self.db.insert_transactions([stock_txn(activity_id=1)])
+        self.assertEqual(self._count(), 1)
+
+    def test_insert_securities(self):
+        self.db.insert_securities([
+            {"symbol": "FAKE", "name": "Fake Co"},
+            {"symbol": "FAKE", "name": "Fake Co"},
+            {"symbol": "OTHER", "name": "Other Co"},
+        ])
+        self.db.cursor.execute("SELECT COUNT(*) FROM security")
+        self.assertEqual(self.db.cursor.fetchone()[0], 2)
+
+
 class TestParsePrice(DbUtilsTestCase):
     def test_dollar_string(self):
         self.assertEqual(self.db._parse_price("$12.50"), 12.5)
@@ -0,0 +1,298 @@
+"""
+Tests for lib/lot_ledger.py — the persisted, incrementally extended FIFO
+lot ledger. Runs against an in-memory sqlite DatabaseInserter with the
+trade_transaction schema and the symbol_version triggers; the ledger
+creates its own tables.
+"""
+import unittest
+from unittest.mock import patch
+
+from lib.db_utils import DatabaseInserter
+from lib.lot_ledger import LotLedger
+from lib.lot_matching import QTY_SCALE
+from lib.symbol_version import ensure_symbol_versions
+from lib.trading_analyzer import TradingAnalyzer
+
+SCHEMA = """
+CREATE TABLE trade_transaction (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT NOT NULL,
+    action TEXT NOT NULL,
+    label TEXT,
+    trade_type TEXT,
+    trade_date DATETIME NOT NULL,
+    expiration_date DATETIME,
+    reason TEXT,
+    quantity REAL NOT NULL,
+    price REAL NOT NULL,
+    amount REAL NOT NULL,
+    target_price REAL,
+    initial_stop_price REAL,
+    projected_sell_price REAL,
+    account TEXT NOT NULL,
+    activity_id INTEGER,
+    leg_index INTEGER
+);
+"""
+
+
+def txn(**overrides):
+    record = {
+        "symbol": "LEDG",
+        "action": "Buy",
+        "label": None,
+        "trade_type": "L",
+        "trade_date": "2026-01-05",
+        "quantity": 10.0,
+        "price": 100.0,
+        "amount": -1000.0,
+        "account": "C",
+    }
+    record.update(overrides)
+    return record
+
+
+class TestLotLedger(unittest.TestCase):
+    def setUp(self):
+        self.db = DatabaseInserter(db_path=":memory:")
+        self.db.cursor.executescript(SCHEMA)
+        ensure_symbol_versions(self.db)
+        self.ledger = LotLedger(self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def _insert(self, **overrides):
+        self.db.insert_transaction(txn(**overrides))
+        return self.db.cursor.lastrowid
+
+    def _rows(self):
+        self.db.cursor.execute(
+            "SELECT id, symbol, action, label, trade_type, trade_date, quantity, "
+            "price, amount, account, target_price FROM trade_transaction ORDER BY id"
+        )
+        columns = [c[0] for c in self.db.cursor.description]
+        return [dict(zip(columns, row)) for row in self.db.cursor.fetchall()]
+
+    def test_extend_matches_fifo(self):
+        buy_1 = self._insert(quantity=10)
+        buy_2 = self._insert(quantity=5, trade_date="2026-01-06")
+        sell = self._insert(action="Sell", quantity=12, trade_date="2026-01-10")
+
+        allocations = self.ledger.extend("LEDG")
+
+        self.assertEqual(allocations, [
+            (buy_1, sell, 10 * QTY_SCALE, True, False),
+            (buy_2, sell, 2 * QTY_SCALE, False, True),
+        ])
+
+    def test_new_rows_extend_without_replay(self):
+        buy = self._insert(quantity=10)
+        self.ledger.extend("LEDG")
+        sell_1 = self._insert(action="Sell", quantity=4, trade_date="2026-01-10")
+        sell_2 = self._insert(action="Sell", quantity=6, trade_date="2026-01-11")
+
+        with patch.object(LotLedger, "_clear") as mock_clear:
+            allocations = self.ledger.extend("LEDG")
+
+        mock_clear.assert_not_called()
+        self.assertEqual(allocations, [
+            (buy, sell_1, 4 * QTY_SCALE, False, True),
+            (buy, sell_2, 6 * QTY_SCALE, True, True),
+        ])
+
+    def test_pending_sell_matches_a_later_buy(self):
+        sell = self._insert(action="Sell", quantity=5, trade_date="2026-01-02")
+        self.assertEqual(self.ledger.extend("LEDG"), [])
+        buy = self._insert(quantity=5, trade_date="2026-01-03")
+        self.assertEqual(
+            self.ledger.extend("LEDG"), [(buy, sell, 5 * QTY_SCALE, True, True)]
+        )
+
+    def test_back_dated_insert_replays(self):
+        self._insert(quantity=10, price=100.0, trade_date="2026-01-05")
+        self._insert(action="Sell", quantity=10, trade_date="2026-01-10")
+        self.ledger.extend("LEDG")
+        # Earlier buy now sorts first and takes the sell
+        early_buy = self._insert(quantity=10, price=90.0, trade_date="2026-01-01")
+
+        with patch.object(LotLedger, "_clear", wraps=self.ledger._clear) as mock_clear:
+            allocations = self.ledger.extend("LEDG")
+
+        mock_clear.assert_called_once()
+        self.assertEqual(allocations[0][0], early_buy)
+        self.assertEqual(allocations, self.ledger.replay("LEDG"))
+
+    def test_deleted_row_replays(self):
+        self._insert(quantity=10)
+        sell = self._insert(action="Sell", quantity=10, trade_date="2026-01-10")
+        self.ledger.extend("LEDG")
+        self.db.cursor.execute("DELETE FROM trade_transaction WHERE id = ?", (sell,))
+        self.db.connection.commit()
+
+        self.assertEqual(self.ledger.extend("LEDG"), [])
+
+    def test_option_sells_only_match_their_own_contract(self):
+        contract_a = "LEDG 03/20/2026 10.00 C"
+        contract_b = "LEDG 03/20/2026 12.00 C"
+        buy_a = self._insert(action="Buy to Open", trade_type="C", label=contract_a,
+                             quantity=1, price=1.0, amount=-100.0)
+        buy_b = self._insert(action="Buy to Open", trade_type="C", label=contract_b,
+                             quantity=1, price=1.0, amount=-100.0, trade_date="2026-01-06")
+        sell_b = self._insert(action="Sell to Close", trade_type="C", label=contract_b,
+                              quantity=1, price=2.0, amount=200.0, trade_date="2026-01-10")
+
+        allocations = self.ledger.extend("LEDG")
+
+        self.assertEqual(allocations, [(buy_b, sell_b, QTY_SCALE, True, True)])
+        self.assertNotIn(buy_a, [a[0] for a in allocations])
+
+    def test_ledger_engine_matches_object_engine(self):
+        self._insert(quantity=10, price=100.0)
+        self._insert(quantity=5, price=104.0, trade_date="2026-01-06", account="R")
+        self._insert(quantity=7.5, price=98.0, trade_date="2026-01-07")
+        self._insert(action="Sell", quantity=12.25, price=110.0, amount=1347.5,
+                     trade_date="2026-01-12")
+        self._insert(action="Sell", quantity=5, price=101.0, amount=505.0,
+                     trade_date="2026-01-13", account="R")
+        allocations = self.ledger.extend("LEDG")
+
+        object_analyzer = TradingAnalyzer("LEDG", self._rows())
+        object_analyzer.analyze_trades()
+        ledger_analyzer = TradingAnalyzer("LEDG", self._rows())
+        ledger_analyzer.analyze_trades(engine="ledger", allocations=allocations)
+
+        self.assertEqual(
+            ledger_analyzer.get_profit_loss_data_json(),
+            object_analyzer.get_profit_loss_data_json(),
+        )
+
+    def test_extend_all_matches_extend_per_symbol(self):
+        buy = self._insert(quantity=10)
+        sell = self._insert(action="Sell", quantity=4, trade_date="2026-01-10")
+        other_buy = self._insert(symbol="OTHR", quantity=3)
+        self._insert(symbol="OTHR", action="Sell", quantity=3, trade_date="2026-01-10")
+
+        allocations = self.ledger.extend_all()
+
+        self.assertEqual(allocations["LEDG"], [(buy, sell, 4 * QTY_SCALE, False, True)])
+        self.assertEqual(allocations["OTHR"], self.ledger.extend("OTHR"))
+        self.assertEqual(allocations["OTHR"][0][0], other_buy)
+
+    def test_extend_all_only_matches_new_rows(self):
+        self._insert(quantity=10)
+        self._insert(symbol="OTHR", quantity=3)
+        self.ledger.extend_all()
+        sell = self._insert(symbol="OTHR", action="Sell", quantity=3, trade_date="2026-01-10")
+
+        with patch.object(LotLedger, "_append", wraps=self.ledger._append) as mock_append:
+            allocations = self.ledger.extend_all()
+
+        mock_append.assert_called_once()
+        self.assertEqual(mock_append.call_args.args[0], "OTHR")
+        self.assertEqual(allocations["LEDG"], [])
+        self.assertEqual(allocations["OTHR"][0][1], sell)
+
+    def test_extend_all_replays_after_a_delete(self):
+        self._insert(quantity=10)
+        sell = self._insert(action="Sell", quantity=10, trade_date="2026-01-10")
+        self.ledger.extend_all()
+        self.db.cursor.execute("DELETE FROM trade_transaction WHERE id = ?", (sell,))
+        self.db.connection.commit()
+
+        self.assertEqual(self.ledger.extend_all(), {"LEDG": []})
+
+    def _assert_ledger_matches_object_engine(self, allocations):
+        object_analyzer = TradingAnalyzer("LEDG", self._rows())
+        object_analyzer.analyze_trades()
+        ledger_analyzer = TradingAnalyzer("LEDG", self._rows())
+        ledger_analyzer.analyze_trades(engine="ledger", allocations=allocations)
+        self.assertEqual(
+            ledger_analyzer.get_profit_loss_data_json(),
+            object_analyzer.get_profit_loss_data_json(),
+        )
+
+    def _matched_pair(self):
+        buy = self._insert(quantity=10, price=100.0)
+        self._insert(quantity=10, price=105.0, trade_date="2026-01-06", account="R")
+        sell = self._insert(action="Sell", quantity=10, price=115.0, amount=1150.0,
+                            trade_date="2026-01-10")
+        self.ledger.extend("LEDG")
+        return buy, sell
+
+    def _update(self, trade_id, **fields):
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        self.db.cursor.execute(
+            f"UPDATE trade_transaction SET {assignments} WHERE id = ?",
+            (*fields.values(), trade_id),
+        )
+        self.db.connection.commit()
+
+    def test_edits_to_matched_rows_replay(self):
+        edits = {
+            "buy account": ("buy", {"account": "R"}),
+            "buy quantity": ("buy", {"quantity": 20.0, "amount": -2000.0}),
+            "buy price": ("buy", {"price": 90.0, "amount": -900.0}),
+            "buy trade_date": ("buy", {"trade_date": "2026-01-08"}),
+            "sell account": ("sell", {"account": "R"}),
+            "sell quantity": ("sell", {"quantity": 4.0, "amount": 460.0}),
+            "sell price": ("sell", {"price": 120.0, "amount": 1200.0}),
+            "sell trade_date": ("sell", {"trade_date": "2026-01-07"}),
+        }
+        for name, (side, fields) in edits.items():
+            with self.subTest(name):
+                self.db.cursor.execute("DELETE FROM trade_transaction")
+                self.db.connection.commit()
+                buy, sell = self._matched_pair()
+                self._update(buy if side == "buy" else sell, **fields)
+
+                # Read-only callers don't trust the stale ledger
+                self.assertIsNone(self.ledger.read("LEDG"))
+                self.assertNotIn("LEDG", self.ledger.read_all())
+                with patch.object(LotLedger, "_clear", wraps=self.ledger._clear) as mock_clear:
+                    allocations = self.ledger.extend("LEDG")
+                mock_clear.assert_called()
+                self._assert_ledger_matches_object_engine(allocations)
+
+    def test_extend_all_replays_after_an_edit(self):
+        buy, _ = self._matched_pair()
+        self._update(buy, account="R")
+
+        allocations = self.ledger.extend_all()
+
+        self._assert_ledger_matches_object_engine(allocations["LEDG"])
+        self.assertEqual(allocations, self.ledger.extend_all())
+
+    def test_read_matches_appended_rows_in_memory(self):
+        buy = self._insert(quantity=10)
+        self.ledger.extend("LEDG")
+        sell = self._insert(action="Sell", quantity=4, trade_date="2026-01-10")
+        changes = self.db.connection.total_changes
+
+        allocations = self.ledger.read("LEDG")
+
+        self.assertEqual(allocations, [(buy, sell, 4 * QTY_SCALE, False, True)])
+        self.assertEqual(self.ledger.read_all(), {"LEDG": allocations})
+        self.assertEqual(self.db.connection.total_changes, changes)
+        self._assert_ledger_matches_object_engine(allocations)
+        self.assertEqual(self.ledger.extend("LEDG"), allocations)
+
+    def test_read_leaves_out_symbols_needing_a_replay(self):
+        self._insert(quantity=10, trade_date="2026-01-05")
+        self._insert(action="Sell", quantity=10, trade_date="2026-01-10")
+        self.ledger.extend("LEDG")
+        self._insert(quantity=10, price=90.0, trade_date="2026-01-01")
+        self._insert(symbol="NEWS", quantity=1)
+
+        self.assertIsNone(self.ledger.read("LEDG"))
+        self.assertIsNone(self.ledger.read("NEWS"))
+        self.assertEqual(self.ledger.read_all(), {})
+
+    def test_ledger_engine_requires_allocations(self):
+        analyzer = TradingAnalyzer("LEDG", [])
+        with self.assertRaises(ValueError):
+            analyzer.analyze_trades(engine="ledger")
+
+
+if __name__ == "__main__":
+    unittest.main()
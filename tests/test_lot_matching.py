@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from lib.lot_matching import QTY_SCALE, match_fifo, to_units
+from lib.trading_analyzer import TradingAnalyzer
+
+
+class TestMatchFifo(unittest.TestCase):
+    """Tests for the columnar FIFO matcher."""
+
+    def test_partial_fills_split_at_every_boundary(self):
+        # Buys 100, 50 against sells 30, 90, 10 -> overlaps 30 | 70 | 20 | 10
+        matches = match_fifo(to_units([100, 50]), to_units([30, 90, 10]))
+        self.assertEqual(matches.buy_idx.tolist(), [0, 0, 1, 1])
+        self.assertEqual(matches.sell_idx.tolist(), [0, 1, 1, 2])
+        self.assertEqual((matches.units / QTY_SCALE).tolist(), [30, 70, 20, 10])
+        self.assertEqual(matches.buy_filled.tolist(), [False, True, False, False])
+        self.assertEqual(matches.sell_exhausted.tolist(), [True, False, True, True])
+
+    def test_matching_stops_at_smaller_side(self):
+        matches = match_fifo(to_units([10]), to_units([4, 4, 4]))
+        self.assertEqual((matches.units / QTY_SCALE).tolist(), [4, 4, 2])
+        self.assertTrue(matches.buy_filled[-1])
+        self.assertFalse(matches.sell_exhausted[-1])
+
+    def test_empty_side_returns_no_matches(self):
+        self.assertEqual(len(match_fifo(to_units([10]), to_units([]))), 0)
+        self.assertEqual(len(match_fifo(to_units([]), to_units([10]))), 0)
+
+    def test_fractional_quantities_are_exact(self):
+        matches = match_fifo(to_units([9.9464]), to_units([4.9732, 4.9732]))
+        self.assertEqual(int(np.sum(matches.units)), 99464)
+        self.assertTrue(matches.buy_filled[-1])
+
+
+class TestColumnarEngine(unittest.TestCase):
+    """Columnar engine through TradingAnalyzer, checked against the object engine."""
+
+    def _analyze(self, transactions, engine):
+        analyzer = TradingAnalyzer("MIX", transactions)
+        analyzer.analyze_trades(engine=engine)
+        return analyzer.get_profit_loss_data_json()
+
+    def test_accounts_and_option_labels_match_independently(self):
+        transactions = [
+            {"id": "1", "symbol": "MIX", "action": "B", "trade_date": "2025-01-02",
+             "quantity": 10, "price": 10.0, "amount": -100.0, "account": "C"},
+            {"id": "2", "symbol": "MIX", "action": "B", "trade_date": "2025-01-03",
+             "quantity": 5, "price": 12.0, "amount": -60.0, "account": "R"},
+            {"id": "3", "symbol": "MIX", "action": "S", "trade_date": "2025-01-10",
+             "quantity": 12, "price": 11.0, "amount": 132.0, "account": "C"},
+            {"id": "4", "symbol": "MIX", "action": "S", "trade_date": "2025-01-11",
+             "quantity": 5, "price": 13.0, "amount": 65.0, "account": "R"},
+            {"id": "5", "symbol": "MIX", "action": "BO", "trade_type": "C",
+             "trade_date": "2025-02-01", "label": "MIX 03/21/2025 10.00 C",
+             "quantity": 2, "price": 1.0, "amount": -200.0, "account": "C"},
+            {"id": "6", "symbol": "MIX", "action": "BO", "trade_type": "C",
+             "trade_date": "2025-02-02", "label": "MIX 03/21/2025 12.00 C",
+             "quantity": 1, "price": 0.5, "amount": -50.0, "account": "C"},
+            {"id": "7", "symbol": "MIX", "action": "SC", "trade_type": "C",
+             "trade_date": "2025-02-10", "label": "MIX 03/21/2025 12.00 C",
+             "quantity": 1, "price": 0.8, "amount": 80.0, "account": "C"},
+            {"id": "8", "symbol": "MIX", "action": "SC", "trade_type": "C",
+             "trade_date": "2025-02-11", "label": "MIX 03/21/2025 10.00 C",
+             "quantity": 1, "price": 1.5, "amount": 150.0, "account": "C"},
+        ]
+        self.assertEqual(
+            self._analyze(transactions, "columnar"), self._analyze(transactions, "object")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from app.extensions import db
+from bin.migrate_add_covering_indexes import INDEXES, SUPERSEDED_INDEXES, migrate
+from tests.helpers import create_test_app
+
+# trade_transaction after migrate_add_activity_id, with the indexes from
+# bin/create_views_and_indexes.sql
+LEGACY_SCHEMA = """
+CREATE TABLE trade_transaction (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT NOT NULL,
+    action TEXT NOT NULL,
+    label TEXT,
+    trade_type TEXT,
+    trade_date DATETIME NOT NULL,
+    quantity REAL NOT NULL,
+    price REAL NOT NULL,
+    amount REAL NOT NULL,
+    account TEXT NOT NULL,
+    activity_id INTEGER,
+    leg_index INTEGER
+);
+CREATE UNIQUE INDEX unique_trade_transaction_activity_index
+ON trade_transaction (activity_id, leg_index) WHERE activity_id IS NOT NULL;
+CREATE INDEX idx_trade_symbol_action_date ON trade_transaction (symbol, action, trade_date);
+CREATE INDEX idx_trade_action_symbol_type ON trade_transaction (action, symbol, trade_type);
+CREATE INDEX idx_trade_symbol ON trade_transaction (symbol);
+CREATE INDEX idx_trade_date ON trade_transaction (trade_date);
+"""
+
+
+def index_columns(conn):
+    """{index name: [columns]} for trade_transaction's named indexes."""
+    names = [
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = 'trade_transaction' AND sql IS NOT NULL"
+        ).fetchall()
+    ]
+    return {
+        name: [row[2] for row in conn.execute(f"PRAGMA index_info({name})").fetchall()]
+        for name in names
+    }
+
+
+class TestMigrateAddCoveringIndexes(unittest.TestCase):
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(LEGACY_SCHEMA)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def _index_columns(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return index_columns(conn)
+        finally:
+            conn.close()
+
+    def test_adds_covering_and_drops_superseded_indexes(self):
+        migrate(db_path=self.db_path)
+        indexes = self._index_columns()
+        for index_name in INDEXES:
+            self.assertIn(index_name, indexes)
+        for index_name in SUPERSEDED_INDEXES:
+            self.assertNotIn(index_name, indexes)
+        # Indexes this migration doesn't own are left alone
+        self.assertIn("idx_trade_date", indexes)
+        self.assertIn("unique_trade_transaction_activity_index", indexes)
+
+    def test_idempotent(self):
+        migrate(db_path=self.db_path)
+        migrate(db_path=self.db_path)  # should not raise
+        self.assertTrue(INDEXES.keys() <= self._index_columns().keys())
+
+    def test_matches_model_indexes(self):
+        """A migrated database gets the same indexes db.create_all() builds."""
+        migrate(db_path=self.db_path)
+        migrated = self._index_columns()
+
+        app = create_test_app(flask_env="dev")
+        with app.app_context():
+            raw = db.engine.raw_connection()
+            try:
+                model = index_columns(raw.driver_connection)
+            finally:
+                raw.close()
+
+        self.assertEqual({name: migrated.get(name) for name in model}, model)
+
+
+if __name__ == "__main__":
+    unittest.main()
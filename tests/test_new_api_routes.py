@@ -4,16 +4,22 @@ Follows the existing test patterns from test_app_routes.py:
 - unittest framework (not pytest)
 - In-memory SQLite with DatabaseInserter for test data
 - FLASK_ENV=dev to bypass API auth
-- Mocked external APIs (yfinance) — no live network calls
+- Offline quotes (tests.helpers.FakeQuoteSource) — no live network calls
 """
 
 import os
+import threading
+import time
 import unittest
 import logging
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from app import create_app
 from app.extensions import db
+from app.services import holdings_service
+from lib.analysis_profile import STAGES, stage_stats
 from lib.db_utils import DatabaseInserter
+from lib.quote_store import QUOTE_TTL_SECONDS
+from tests.helpers import FakeQuoteSource
 
 test_logger = logging.getLogger("test_new_api_routes")
 test_logger.setLevel(logging.INFO)
@@ -165,27 +171,18 @@ class TestHoldingsEndpoint(unittest.TestCase):
         test_logger.info("TestHoldingsEndpoint teardown completed")
 
     def _mock_yfinance(self):
-        """Return a patcher that mocks YahooFinance for all calls.
+        """Return a patcher that prices holdings from an offline FakeQuoteSource.
 
         Option prices are keyed by OCC-format ticker (label_to_occ converts the label
-        before calling yfinance). "HOLD1 03/21/2025 60.00 C" → "HOLD1250321C00060000".
+        before pricing). "HOLD1 03/21/2025 60.00 C" → "HOLD1250321C00060000".
         """
-        patcher = patch("lib.yfinance.YahooFinance")
-        mock_yf_class = patcher.start()
-
-        def side_effect(symbol):
-            instance = MagicMock()
-            instance.get_stock_data.return_value = None
-            prices = {
-                "HOLD1": {"currentPrice": 55.00, "regularMarketPrice": 55.00},
-                "HOLD2": {"currentPrice": 125.00, "regularMarketPrice": 125.00},
-                # OCC format for "HOLD1 03/21/2025 60.00 C"
-                "HOLD1250321C00060000": {"lastPrice": 4.20, "regularMarketPrice": 4.20},
-            }
-            instance.get_results.return_value = prices.get(symbol, {})
-            return instance
-
-        mock_yf_class.side_effect = side_effect
+        patcher = patch("app.services.holdings_service.download_prices", FakeQuoteSource({
+            "HOLD1": 55.00,
+            "HOLD2": 125.00,
+            # OCC format for "HOLD1 03/21/2025 60.00 C"
+            "HOLD1250321C00060000": 4.20,
+        }))
+        patcher.start()
         return patcher
 
     def test_holdings_returns_200(self):
@@ -450,13 +447,76 @@ class TestHoldingsEndpoint(unittest.TestCase):
         finally:
             patcher.stop()
 
+    def test_holdings_prices_every_position_in_one_fetch(self):
+        """Stale quotes are fetched together; a second request within the TTL fetches none."""
+        source = FakeQuoteSource(default=10.0)
+        with patch("app.services.holdings_service.download_prices", source):
+            self.client.get("/api/holdings")
+            self.client.get("/api/holdings")
+
+        self.assertEqual(len(source.calls), 1)
+        self.assertTrue({"HOLD1", "HOLD2", "HOLD1250321C00060000"} <= set(source.calls[0]))
+
+    def _age_quotes(self, seconds):
+        """Make every stored quote `seconds` older."""
+        with DatabaseInserter(db=db) as conn, conn.transaction() as cursor:
+            cursor.execute(
+                "UPDATE quote_cache SET fetched_at = fetched_at - ?, expires_at = expires_at - ?",
+                (seconds, seconds),
+            )
+
+    def _position(self, data, symbol):
+        return next(p for p in data["stock"]["positions"] if p["symbol"] == symbol)
+
+    def test_holdings_serve_stale_prices_while_refreshing(self):
+        """Expired quotes are served at once, tagged with their age, then refreshed in the background."""
+        with patch("app.services.holdings_service.download_prices", FakeQuoteSource(default=50.0)):
+            self.client.get("/api/holdings")
+        self._age_quotes(QUOTE_TTL_SECONDS + 60)
+
+        gate = threading.Event()  # Yahoo is slow
+        source = FakeQuoteSource(default=60.0, gate=gate)
+        with patch("app.services.holdings_service.download_prices", source):
+            started = time.monotonic()
+            data = self.client.get("/api/holdings").get_json()
+            self.assertLess(time.monotonic() - started, 2)
+
+            hold1 = self._position(data, "HOLD1")
+            self.assertEqual(hold1["current_price"], 50.0)
+            self.assertGreaterEqual(hold1["price_age_seconds"], QUOTE_TTL_SECONDS + 60)
+            self.assertTrue(data["quotes"]["refreshing"])
+            self.assertEqual(data["quotes"]["stale"], len(source.calls[0]))
+
+            gate.set()
+            self.assertTrue(holdings_service._refresher.wait(5))
+            data = self.client.get("/api/holdings").get_json()
+
+        hold1 = self._position(data, "HOLD1")
+        self.assertEqual(hold1["current_price"], 60.0)
+        self.assertLess(hold1["price_age_seconds"], 5)
+        self.assertEqual(data["quotes"], {"stale": 0, "refreshing": False})
+        self.assertEqual(len(source.calls), 1)
+
+    def test_holdings_new_position_waits_only_briefly_for_its_first_quote(self):
+        gate = threading.Event()
+        source = FakeQuoteSource(default=60.0, gate=gate)
+        with patch("app.services.holdings_service.download_prices", source), \
+                patch.object(holdings_service, "NEW_QUOTE_WAIT_SECONDS", 0.05):
+            data = self.client.get("/api/holdings").get_json()
+            self.assertIsNone(self._position(data, "HOLD1")["current_price"])
+            self.assertIsNone(self._position(data, "HOLD1")["price_age_seconds"])
+            self.assertTrue(data["quotes"]["refreshing"])
+
+            gate.set()
+            self.assertTrue(holdings_service._refresher.wait(5))
+            data = self.client.get("/api/holdings").get_json()
+
+        self.assertEqual(self._position(data, "HOLD1")["current_price"], 60.0)
+
     def test_holdings_yfinance_failure_graceful(self):
         """If yfinance throws, positions still appear but with null price fields."""
-        with patch("lib.yfinance.YahooFinance") as MockYF:
-            instance = MagicMock()
-            instance.get_stock_data.side_effect = Exception("API down")
-            MockYF.return_value = instance
-
+        with patch("app.services.holdings_service.download_prices",
+                   FakeQuoteSource(error=Exception("API down"))):
             response = self.client.get("/api/holdings")
             self.assertEqual(response.status_code, 200)
 
@@ -474,6 +534,40 @@ class TestHoldingsEndpoint(unittest.TestCase):
                     f"current_price should be None when yfinance fails: {pos['symbol']}"
                 )
 
+    def test_quote_refresher_queues_only_tickers_not_in_flight(self):
+        """A ticker submitted mid-fetch waits for the next batch unless it is in this one."""
+        gate = threading.Event()
+        source = FakeQuoteSource(default=60.0, gate=gate)
+        refresher = holdings_service.QuoteRefresher()
+        with patch("app.services.holdings_service.download_prices", source):
+            refresher.submit(self.app, ["HOLD1"])
+            deadline = time.monotonic() + 5
+            while not source.calls and time.monotonic() < deadline:
+                time.sleep(0.01)
+            refresher.submit(self.app, ["HOLD1", "HOLD2"])
+            gate.set()
+            self.assertTrue(refresher.wait(5))
+
+        self.assertEqual(source.calls, [["HOLD1"], ["HOLD2"]])
+
+    def test_holdings_failed_fetch_is_not_retried_on_every_request(self):
+        """After a failed refresh, requests stop resubmitting (and waiting on) the tickers."""
+        source = FakeQuoteSource(error=Exception("API down"))
+        with patch("app.services.holdings_service.download_prices", source):
+            self.client.get("/api/holdings")
+            self.assertTrue(holdings_service._refresher.wait(5))
+
+            gate = threading.Event()  # would hold any new fetch
+            source.gate = gate
+            started = time.monotonic()
+            data = self.client.get("/api/holdings").get_json()
+            self.assertLess(time.monotonic() - started, holdings_service.NEW_QUOTE_WAIT_SECONDS)
+            gate.set()
+
+        self.assertEqual(len(source.calls), 1)
+        self.assertEqual(data["quotes"], {"stale": 0, "refreshing": False})
+        self.assertIsNone(self._position(data, "HOLD1")["current_price"])
+
     def test_holdings_excludes_fully_closed_from_results(self):
         """CLOSED1 (buy 50 + sell 50) must not appear — only truly open positions remain."""
         patcher = self._mock_yfinance()
@@ -563,12 +657,7 @@ class TestHoldingsAuth(unittest.TestCase):
 
     def test_holdings_with_correct_api_key_returns_200(self):
         """GET /api/holdings with correct X-API-KEY returns 200."""
-        with patch("lib.yfinance.YahooFinance") as MockYF:
-            instance = MagicMock()
-            instance.get_stock_data.return_value = None
-            instance.get_results.return_value = {}
-            MockYF.return_value = instance
-
+        with patch("app.services.holdings_service.download_prices", FakeQuoteSource()):
             response = self.client.get(
                 "/api/holdings",
                 headers={"X-API-KEY": "test-secret-key"},
@@ -576,5 +665,68 @@ class TestHoldingsAuth(unittest.TestCase):
             self.assertEqual(response.status_code, 200)
 
 
+class TestAnalysisProfileEndpoint(unittest.TestCase):
+    """Tests for GET /api/debug/analysis_profile[/<symbol>]."""
+
+    def setUp(self):
+        os.environ["FLASK_ENV"] = "testing"
+        self.app = create_app()
+        self.app.config["TESTING"] = True
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        os.environ["FLASK_ENV"] = "dev"
+
+        self.db_inserter = DatabaseInserter(db=db)
+        self.db_inserter.insert_security({"symbol": "PROF1", "name": "Profiled Co"})
+        for action, trade_date, price, amount in (
+            ("B", "2025-01-15 10:00", 50.0, -5000.0),
+            ("S", "2025-02-15 10:00", 55.0, 5500.0),
+        ):
+            self.db_inserter.insert_transaction({
+                "symbol": "PROF1", "action": action, "label": "", "trade_type": "L",
+                "trade_date": trade_date, "quantity": 100, "price": price,
+                "amount": amount, "account": "C",
+            })
+        stage_stats.reset()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.environ.pop("FLASK_ENV", None)
+
+    def test_symbol_profile_reports_every_stage(self):
+        response = self.client.get("/api/debug/analysis_profile/prof1")
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual((data["symbol"], data["status"], data["trades"]), ("PROF1", "all", 2))
+        self.assertEqual([s["stage"] for s in data["stages"]], list(STAGES))
+        self.assertEqual(data["stages"][0]["rows"], 2)
+        self.assertAlmostEqual(data["total_seconds"], sum(s["seconds"] for s in data["stages"]), places=5)
+
+    def test_profiles_add_up_in_the_process_stats(self):
+        self.client.get("/api/debug/analysis_profile/PROF1")
+        self.client.get("/api/debug/analysis_profile/PROF1?status=closed")
+        data = self.client.get("/api/debug/analysis_profile").get_json()
+
+        self.assertEqual(data["pid"], os.getpid())
+        self.assertEqual(data["stages"]["convert"]["calls"], 2)
+        self.assertEqual(data["stages"]["convert"]["rows"], 4)
+        self.assertEqual(data["slowest_symbols"][0]["symbol"], "PROF1")
+        self.assertEqual(data["slowest_symbols"][0]["runs"], 2)
+
+    def test_reset(self):
+        self.client.get("/api/debug/analysis_profile/PROF1")
+        self.client.get("/api/debug/analysis_profile?reset=1")
+        data = self.client.get("/api/debug/analysis_profile").get_json()
+        self.assertEqual((data["stages"], data["symbols_profiled"]), ({}, 0))
+
+    def test_invalid_params(self):
+        self.assertEqual(
+            self.client.get("/api/debug/analysis_profile/PROF1?status=bogus").status_code, 400
+        )
+        self.assertEqual(self.client.get("/api/debug/analysis_profile?top=x").status_code, 400)
+
+
 if __name__ == "__main__":
     unittest.main(failfast=True)
@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import patch
+
+from lib import portfolio_analysis
+from lib.portfolio_analysis import analyze_groups, shutdown_pool
+
+
+def symbol_group(symbol, sell_qty=4):
+    transactions = [
+        {"id": 1, "symbol": symbol, "action": "B", "trade_date": "2025-01-02",
+         "quantity": 10, "price": 10.0, "amount": -100.0, "account": "C"},
+        {"id": 2, "symbol": symbol, "action": "S", "trade_date": "2025-01-10",
+         "quantity": sell_qty, "price": 12.0, "amount": 12.0 * sell_qty, "account": "C"},
+    ]
+    return symbol, transactions, None
+
+
+class TestAnalyzeGroups(unittest.TestCase):
+    def tearDown(self):
+        shutdown_pool()
+
+    def test_parallel_results_match_serial(self):
+        groups = [symbol_group(f"SYM{i}", sell_qty=i + 1) for i in range(6)]
+        serial = list(analyze_groups(groups, status="all"))
+        parallel = list(analyze_groups(groups, status="all", workers=2, min_parallel=1))
+        self.assertEqual(parallel, serial)
+        self.assertEqual([r[0] for r in parallel], [g[0] for g in groups])
+
+    def test_small_portfolio_runs_serially(self):
+        groups = [symbol_group("SYM0"), symbol_group("SYM1")]
+        with patch.object(portfolio_analysis, "_get_pool") as mock_pool:
+            results = list(analyze_groups(groups, workers=4, min_parallel=3))
+        mock_pool.assert_not_called()
+        self.assertEqual(len(results), 2)
+
+    def test_failing_symbol_returns_error(self):
+        bad = ("BAD", [{"id": 1, "symbol": "BAD", "action": "B"}], None)
+        results = dict((r[0], r) for r in analyze_groups([bad, symbol_group("OK")]))
+        self.assertIsNone(results["BAD"][1])
+        self.assertIsNotNone(results["BAD"][2])
+        self.assertIsNotNone(results["OK"][1])
+
+    def test_mismatched_allocations_fall_back_and_flag(self):
+        symbol, transactions, _ = symbol_group("STALE")
+        # Allocates more than the sell holds
+        allocations = [(1, 2, 10 * 10_000, True, True)]
+        (_, result, error, ledger_stale), = analyze_groups(
+            [(symbol, transactions, allocations)]
+        )
+        self.assertIsNone(error)
+        self.assertTrue(ledger_stale)
+        expected = analyze_groups([symbol_group("STALE")])
+        self.assertEqual(result, next(expected)[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import re
+import unittest
+from unittest.mock import patch
+
+from app.extensions import db
+from app.repositories import trade_repository as repo
+from lib.db_utils import DatabaseInserter
+from tests.helpers import create_test_app
+
+# A plan step that reads trade_transaction row by row: a bare table scan, or a
+# full scan of a non-covering index (every row plus a table lookup each)
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?trade_transaction\b(?! USING COVERING INDEX)")
+
+
+class TestTradeTransactionQueryPlans(unittest.TestCase):
+    """
+    Every repository read of trade_transaction must be served by an index
+    (the ones declared on the model / bin/migrate_add_covering_indexes.py).
+    The SQL is captured as actually executed, then run through
+    EXPLAIN QUERY PLAN.
+    """
+
+    def setUp(self):
+        self.app = create_test_app(flask_env="dev")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        # The in-memory database is a single shared connection
+        self.raw = db.engine.raw_connection()
+        patcher = patch.object(repo, "get_ignored_symbols", return_value={"HIDE"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.raw.close()
+        db.session.remove()
+        self.app_context.pop()
+
+    def _captured(self, fn, *args):
+        """Run fn and return the trade_transaction queries it executed."""
+        statements = []
+        self.raw.driver_connection.set_trace_callback(statements.append)
+        try:
+            result = fn(*args)
+            if hasattr(result, "__next__"):
+                list(result)
+        finally:
+            self.raw.driver_connection.set_trace_callback(None)
+        return [
+            sql for sql in statements
+            if "trade_transaction" in sql and sql.lstrip().upper().startswith(("SELECT", "WITH"))
+        ]
+
+    def _plan(self, sql):
+        cursor = self.raw.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[3] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def assertIndexed(self, fn, *args):
+        queries = self._captured(fn, *args)
+        self.assertTrue(queries, f"{fn.__name__} ran no trade_transaction query")
+        for sql in queries:
+            plan = self._plan(sql)
+            scans = [step for step in plan if FULL_SCAN.match(step)]
+            self.assertFalse(
+                scans, f"{fn.__name__} scans trade_transaction:\n" + "\n".join(plan)
+            )
+
+    def test_get_raw_trade_data(self):
+        self.assertIndexed(repo.get_raw_trade_data, "AAPL")
+
+    def test_get_raw_trade_data_needs_no_sort(self):
+        (sql,) = self._captured(repo.get_raw_trade_data, "AAPL")
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", self._plan(sql))
+
+    def test_iter_trade_data_by_symbol(self):
+        self.assertIndexed(repo.iter_trade_data_by_symbol)
+
+    def test_get_current_holdings(self):
+        self.assertIndexed(repo.get_current_holdings)
+        self.assertIndexed(repo.get_current_holdings, "AAPL")
+
+    def test_get_trade_stats_summary(self):
+        self.assertIndexed(repo.get_trade_stats_summary)
+
+    def test_get_all_traded_symbols(self):
+        self.assertIndexed(repo.get_all_traded_symbols)
+
+    def test_transaction_exists(self):
+        csv_row = {
+            "symbol": "AAPL", "action": "B", "label": None, "trade_type": "L",
+            "trade_date": "2026-01-05", "quantity": 10.0, "price": 100.0,
+            "amount": -1000.0, "account": "C",
+        }
+        with DatabaseInserter(db=db) as inserter:
+            self.assertIndexed(inserter.transaction_exists, csv_row)
+            self.assertIndexed(
+                inserter.transaction_exists, {**csv_row, "activity_id": 42, "leg_index": 0}
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from lib.db_utils import DatabaseInserter
+from lib.quote_store import MISSING_QUOTE_TTL_SECONDS, QUOTE_TTL_SECONDS, Quote, QuoteStore
+from tests.helpers import FakeQuoteSource
+
+NOW = 1_700_000_000.0
+
+
+class TestQuoteStore(unittest.TestCase):
+    def setUp(self):
+        self.db = DatabaseInserter(db_path=":memory:")
+        self.addCleanup(self.db.close)
+        self.store = QuoteStore(self.db)
+
+    def test_missing_quotes_are_fetched_in_one_batch(self):
+        source = FakeQuoteSource({"AAPL": 190.0, "MSFT": 410.0, "X250117C00010000": 1.25})
+        quotes = self.store.refresh(["AAPL", "MSFT", "X250117C00010000", "AAPL"], source, now=NOW)
+
+        self.assertEqual({s: q.price for s, q in quotes.items()},
+                         {"AAPL": 190.0, "MSFT": 410.0, "X250117C00010000": 1.25})
+        self.assertEqual(source.calls, [["AAPL", "MSFT", "X250117C00010000"]])
+        self.assertEqual(self.store.get_many(["AAPL", "MSFT", "X250117C00010000"]), quotes)
+
+    def test_quotes_expire_after_the_ttl(self):
+        self.store.refresh(["AAPL", "MSFT"], FakeQuoteSource(default=10.0), now=NOW)
+        quotes = self.store.get_many(["AAPL", "MSFT", "NEW"])
+
+        self.assertEqual(QuoteStore.expired(["AAPL", "MSFT", "NEW"], quotes, NOW), ["NEW"])
+        self.assertEqual(
+            QuoteStore.expired(["AAPL", "MSFT"], quotes, NOW + QUOTE_TTL_SECONDS - 1), []
+        )
+        self.assertEqual(
+            QuoteStore.expired(["AAPL", "MSFT"], quotes, NOW + QUOTE_TTL_SECONDS), ["AAPL", "MSFT"]
+        )
+
+    def test_missing_prices_expire_sooner(self):
+        quotes = self.store.refresh(["GONE"], FakeQuoteSource(), now=NOW)
+        self.assertEqual(quotes, {"GONE": Quote(None, NOW, NOW + MISSING_QUOTE_TTL_SECONDS)})
+        self.assertEqual(
+            QuoteStore.expired(["GONE"], quotes, NOW + MISSING_QUOTE_TTL_SECONDS), ["GONE"]
+        )
+
+    def test_failed_fetch_keeps_the_last_price_and_retries_later(self):
+        self.store.put_many({"AAPL": 190.0}, now=NOW - QUOTE_TTL_SECONDS)
+        source = FakeQuoteSource(error=ConnectionError("offline"))
+
+        quotes = self.store.refresh(["AAPL", "MSFT"], source, now=NOW)
+
+        self.assertEqual(quotes, {
+            "AAPL": Quote(190.0, NOW - QUOTE_TTL_SECONDS, NOW + MISSING_QUOTE_TTL_SECONDS),
+            "MSFT": Quote(None, NOW, NOW + MISSING_QUOTE_TTL_SECONDS),
+        })
+        self.assertEqual(self.store.get_many(["AAPL", "MSFT"]), quotes)
+        self.assertEqual(QuoteStore.expired(["AAPL", "MSFT"], quotes, NOW + 1), [])
+
+        source.error = None
+        source.default = 200.0
+        quotes = self.store.refresh(["AAPL", "MSFT"], source, now=NOW + MISSING_QUOTE_TTL_SECONDS)
+        self.assertEqual({s: q.price for s, q in quotes.items()}, {"AAPL": 200.0, "MSFT": 200.0})
+
+    def test_tickers_left_out_of_a_fetch_are_retried_later(self):
+        def partial(tickers):
+            return {"AAPL": 190.0}
+
+        quotes = self.store.refresh(["AAPL", "MSFT"], partial, now=NOW)
+        self.assertEqual(quotes["MSFT"], Quote(None, NOW, NOW + MISSING_QUOTE_TTL_SECONDS))
+        self.assertEqual(self.store.get_many(["AAPL", "MSFT"]), quotes)
+
+    def test_many_symbols(self):
+        symbols = [f"S{i}" for i in range(1200)]
+        self.store.put_many({s: 1.0 for s in symbols}, now=NOW)
+        self.assertEqual(len(self.store.get_many(symbols)), 1200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import threading
+import unittest
+
+from lib.rate_limiter import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def bucket(self, rate, capacity):
+        return TokenBucket(rate, capacity, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_up_to_capacity_then_waits_at_rate(self):
+        bucket = self.bucket(rate=2, capacity=3)
+        waits = [bucket.acquire() for _ in range(5)]
+        self.assertEqual(waits, [0.0, 0.0, 0.0, 0.5, 0.5])
+        self.assertEqual(self.clock.now, 1.0)
+
+    def test_refills_while_idle_but_not_past_capacity(self):
+        bucket = self.bucket(rate=2, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+        self.clock.now += 60
+        waits = [bucket.acquire() for _ in range(3)]
+        self.assertEqual(waits, [0.0, 0.0, 0.5])
+
+    def test_shared_across_threads(self):
+        bucket = TokenBucket(rate=1000, capacity=5)
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+
+    def test_rejects_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+from unittest.mock import patch
+
+from app.extensions import db
+from app.services import analysis_service
+from app.services.analysis_service import refresh_realized_pnl
+from lib.db_utils import DatabaseInserter
+from lib.realized_pnl import RealizedPnl, daily_rows
+from tests.helpers import create_test_app
+
+
+def closed_buy(closed_date, pnl, account="C", pct=1.0):
+    return {
+        "is_buy_trade": True,
+        "is_done": True,
+        "closed_date": closed_date,
+        "account": account,
+        "current_profit_loss": pnl,
+        "current_percent_profit_loss": pct,
+    }
+
+
+def closed_result(stock_trades=(), option_trades=()):
+    return {
+        "stock": {"has_trades": bool(stock_trades), "all_trades": list(stock_trades)},
+        "option": {"has_trades": bool(option_trades), "all_trades": list(option_trades)},
+    }
+
+
+class TestRealizedPnlTable(unittest.TestCase):
+    def setUp(self):
+        self.db = DatabaseInserter(db_path=":memory:")
+        self.table = RealizedPnl(self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_daily_rows_aggregate_by_date_asset_type_and_account(self):
+        result = closed_result(
+            stock_trades=[
+                closed_buy("2024-03-04T10:00:00", 50.0),
+                closed_buy("2024-03-04T15:30:00", -20.0),
+                closed_buy("2024-03-04T15:30:00", 0.0, account="R"),
+                {"is_done": True, "closed_date": "2024-03-04"},  # a sell row
+                closed_buy(None, 5.0),
+            ],
+            option_trades=[closed_buy("2024-03-04", 300.0)],
+        )
+        rows = daily_rows(result)
+        self.assertEqual(rows[("2024-03-04", "stock", "C")], [1, 1, 2, 30.0, 2.0])
+        # Zero P&L counts as a loss, as on the dashboard
+        self.assertEqual(rows[("2024-03-04", "stock", "R")][:3], [0, 1, 1])
+        self.assertEqual(rows[("2024-03-04", "option", "C")][3], 300.0)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(daily_rows(None), {})
+
+    def test_buckets_group_by_period(self):
+        self.table.replace({
+            "AAA": (1, daily_rows(closed_result(stock_trades=[
+                closed_buy("2024-03-31", 10.0),  # Sunday
+                closed_buy("2024-04-01", 20.0),  # Monday
+                closed_buy("2025-01-02", -5.0),
+            ]))),
+        })
+
+        weeks = [b["period"] for b in self.table.buckets("week")]
+        self.assertEqual(weeks, ["2024-03-25", "2024-04-01", "2024-12-30"])
+        quarters = {b["period"]: b["pnl_dollars"] for b in self.table.buckets("quarter")}
+        self.assertEqual(quarters, {"2024-Q1": 10.0, "2024-Q2": 20.0, "2025-Q1": -5.0})
+        years = {b["period"]: b["trade_count"] for b in self.table.buckets("year")}
+        self.assertEqual(years, {"2024": 2, "2025": 1})
+
+        in_range = self.table.buckets("month", start="2024-04-01", end="2024-12-31")
+        self.assertEqual([b["period"] for b in in_range], ["2024-04"])
+        self.assertEqual(self.table.buckets("month", asset_types=["option"]), [])
+
+    def test_stale_symbols_and_replace(self):
+        self.table.replace({
+            "AAA": (1, daily_rows(closed_result(stock_trades=[closed_buy("2024-01-02", 1.0)]))),
+            "BBB": (4, {}),
+        })
+        self.assertEqual(self.table.stale_symbols({"AAA": 1, "BBB": 4}), set())
+        self.assertEqual(
+            self.table.stale_symbols({"AAA": 2, "BBB": 4, "CCC": 1}), {"AAA", "CCC"}
+        )
+        # A symbol that lost all its trades is stale until forgotten
+        self.assertEqual(self.table.stale_symbols({"BBB": 4}), {"AAA"})
+        self.table.replace({"AAA": (None, {})})
+        self.assertEqual(self.table.stale_symbols({"BBB": 4}), set())
+        self.assertEqual(self.table.buckets("day"), [])
+
+
+class TestRefreshRealizedPnl(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app(flask_env="dev")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.db_inserter = DatabaseInserter(db=db)
+        for symbol in ("PNL1", "PNL2"):
+            self.db_inserter.insert_security({"symbol": symbol, "name": symbol})
+            self.insert_round_trip(symbol, "2025-01-06", "2025-01-08")
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+
+    def insert_round_trip(self, symbol, buy_date, sell_date, sell_price=12.0):
+        common = {"symbol": symbol, "label": "", "trade_type": "L", "quantity": 10,
+                  "account": "C"}
+        self.db_inserter.insert_transaction(
+            {**common, "action": "B", "trade_date": buy_date, "price": 10.0, "amount": -100.0}
+        )
+        self.db_inserter.insert_transaction(
+            {**common, "action": "S", "trade_date": sell_date, "price": sell_price,
+             "amount": 10 * sell_price}
+        )
+
+    def test_only_changed_symbols_are_rebuilt(self):
+        self.assertEqual(refresh_realized_pnl(), 2)
+        self.assertEqual(refresh_realized_pnl(), 0)
+
+        self.insert_round_trip("PNL2", "2025-02-03", "2025-02-05", sell_price=9.0)
+        with patch.object(analysis_service, "daily_rows", wraps=analysis_service.daily_rows) as rows:
+            self.assertEqual(refresh_realized_pnl(), 1)
+        self.assertEqual(rows.call_count, 1)
+
+        with DatabaseInserter(db=db) as conn:
+            months = {b["period"]: b for b in RealizedPnl(conn).buckets("month")}
+        self.assertEqual(months["2025-01"]["winning_trades"], 2)
+        self.assertEqual(months["2025-02"]["losing_trades"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
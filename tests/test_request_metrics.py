@@ -0,0 +1,135 @@
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from app.extensions import db
+from app.request_metrics import REQUEST_SECONDS, registry, server_timing_header
+from lib import request_timing
+from lib.db_utils import DatabaseInserter
+from lib.metrics import Histogram
+from tests.helpers import create_test_app
+
+
+class TestHistogram(unittest.TestCase):
+    def test_prometheus_text(self):
+        histogram = Histogram("req_seconds", "Request time.", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, route='/a"b')
+        self.assertEqual(list(histogram.render()), [
+            "# HELP req_seconds Request time.",
+            "# TYPE req_seconds histogram",
+            'req_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+            'req_seconds_bucket{route="/a\\"b",le="1.0"} 2',
+            'req_seconds_bucket{route="/a\\"b",le="+Inf"} 3',
+            'req_seconds_sum{route="/a\\"b"} 5.55',
+            'req_seconds_count{route="/a\\"b"} 3',
+        ])
+
+
+class TestRequestTiming(unittest.TestCase):
+    def test_records_only_inside_a_tally(self):
+        request_timing.record(request_timing.SQL, 1.0)
+        self.assertEqual(request_timing.current(), {})
+
+        token = request_timing.start()
+        try:
+            request_timing.record(request_timing.SQL, 0.25)
+            request_timing.record(request_timing.SQL, 0.25)
+            with request_timing.timed(request_timing.YAHOO):
+                pass
+            # Other threads have no tally of their own
+            thread = threading.Thread(target=request_timing.record, args=(request_timing.SQL, 9.0))
+            thread.start()
+            thread.join()
+            timings = request_timing.current()
+        finally:
+            request_timing.finish(token)
+
+        self.assertEqual(timings[request_timing.SQL], 0.5)
+        self.assertIn(request_timing.YAHOO, timings)
+        self.assertEqual(request_timing.current(), {})
+
+    def test_server_timing_header(self):
+        self.assertEqual(
+            server_timing_header(0.1234, {"yahoo": 0.05, "sql": 0.002}),
+            "total;dur=123.4, sql;dur=2.0, yahoo;dur=50.0",
+        )
+
+
+class TestRequestMetricsMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app(flask_env="dev")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        inserter = DatabaseInserter(db=db)
+        inserter.insert_security({"symbol": "TIME1", "name": "Timing Co"})
+        inserter.insert_transaction({
+            "symbol": "TIME1", "action": "B", "label": "", "trade_type": "L",
+            "trade_date": "2025-01-15 10:00", "quantity": 10, "price": 10.0,
+            "amount": -100.0, "account": "C",
+        })
+        registry.reset()
+
+    def tearDown(self):
+        registry.reset()
+        db.session.remove()
+        self.app_context.pop()
+
+    def _timings(self, response):
+        entries = [entry.split(";dur=") for entry in response.headers["Server-Timing"].split(", ")]
+        return {name: float(duration) for name, duration in entries}
+
+    def test_server_timing_reports_sql_and_analysis(self):
+        response = self.client.get("/api/dashboard/summary")
+        self.assertEqual(response.status_code, 200)
+        timings = self._timings(response)
+        self.assertIn("sql", timings)
+        self.assertIn("analysis", timings)
+        self.assertGreaterEqual(timings["total"], timings["sql"])
+
+    def test_yahoo_time(self):
+        class FakeTicker:
+            def __init__(self, symbol):
+                pass
+
+            def history(self, period, interval):
+                return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"])
+
+        with patch("app.routes.api_routes.yf_lib.Ticker", FakeTicker):
+            response = self.client.get("/api/ticker/history/TIME1")
+        self.assertIn("yahoo", self._timings(response))
+
+    def test_metrics_endpoint_renders_route_histograms(self):
+        self.client.get("/api/dashboard/summary")
+        self.client.get("/api/trades/all/json/TIME1")
+        self.client.get("/api/no-such-route")
+
+        response = self.client.get("/api/debug/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain; version=0.0.4"))
+        text = response.get_data(as_text=True)
+        self.assertIn("# TYPE http_request_duration_seconds histogram", text)
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",route="/api/dashboard/summary",'
+            'status="200"} 1', text,
+        )
+        # Labelled by route template, not by the concrete URL
+        self.assertIn('route="/api/trades/<string:scope>/json/<string:stock_symbol>"', text)
+        self.assertIn('route="<unmatched>",status="404"', text)
+        self.assertIn('http_request_sql_seconds_count{method="GET",route="/api/dashboard/summary"} 1', text)
+
+    def test_requests_without_api_key_are_timed_too(self):
+        with patch.dict(os.environ, {"FLASK_ENV": "production", "API_SECRET_KEY": "k"}):
+            response = self.client.get("/api/holdings")
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("Server-Timing", response.headers)
+        self.assertIn('status="401"', "\n".join(REQUEST_SECONDS.render()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import json
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from app.extensions import db
+from lib.profiling import StackSampler, prune_profiles
+from tests.helpers import create_test_app
+
+
+class TestStackSampler(unittest.TestCase):
+    def test_speedscope_document(self):
+        sampler = StackSampler(interval=0.001)
+        sampler.start()
+
+        def busy_wait():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        busy_wait()
+        sampler.stop()
+
+        document = sampler.speedscope("busy")
+        profile = document["profiles"][0]
+        frame_names = [frame["name"] for frame in document["shared"]["frames"]]
+        self.assertEqual(profile["type"], "sampled")
+        self.assertEqual(len(profile["samples"]), len(profile["weights"]))
+        self.assertGreater(len(profile["samples"]), 0)
+        self.assertIn("busy_wait", frame_names)
+        self.assertAlmostEqual(sum(profile["weights"]), profile["endValue"], delta=0.01)
+
+
+class TestPruneProfiles(unittest.TestCase):
+    def test_keeps_the_newest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for i, name in enumerate(("a.pstats", "b.speedscope.json", "c.pstats", "notes.txt")):
+                path = os.path.join(directory, name)
+                open(path, "w").close()
+                os.utime(path, (1000 + i, 1000 + i))
+            self.assertEqual(sorted(prune_profiles(directory, keep=1)), ["a.pstats", "b.speedscope.json"])
+            self.assertEqual(sorted(os.listdir(directory)), ["c.pstats", "notes.txt"])
+
+
+class TestRequestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profile_dir.cleanup)
+        self.app = create_test_app(flask_env="dev", config={
+            "REQUEST_PROFILING": True,
+            "PROFILE_DIR": self.profile_dir.name,
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+
+    def test_pstats_profile_is_saved_and_listed(self):
+        response = self.client.get(
+            "/api/dashboard/pnl_over_time?period=month", headers={"X-Profile": "pstats"}
+        )
+        self.assertEqual(response.status_code, 200)
+        name = response.headers["X-Profile-Id"]
+        self.assertTrue(name.endswith("-GET-api_dashboard_pnl_over_time.pstats"))
+
+        stats = pstats.Stats(os.path.join(self.profile_dir.name, name))
+        self.assertTrue(any(func[2] == "get_pnl_over_time" for func in stats.stats))
+
+        listing = self.client.get("/api/debug/profiles").get_json()["profiles"]
+        self.assertEqual([(p["name"], p["format"]) for p in listing], [(name, "pstats")])
+
+    def test_speedscope_profile_download(self):
+        name = self.client.get(
+            "/api/dashboard/summary", headers={"X-Profile": "speedscope"}
+        ).headers["X-Profile-Id"]
+
+        response = self.client.get(f"/api/debug/profiles/{name}")
+        self.assertEqual(response.status_code, 200)
+        document = json.loads(response.get_data())
+        self.assertEqual(document["profiles"][0]["name"], "GET /api/dashboard/summary?")
+
+    def test_requests_without_the_header_are_not_profiled(self):
+        response = self.client.get("/api/dashboard/summary")
+        self.assertNotIn("X-Profile-Id", response.headers)
+        response = self.client.get("/api/dashboard/summary", headers={"X-Profile": "bogus"})
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(os.listdir(self.profile_dir.name), [])
+
+    def test_profiling_requires_the_api_key(self):
+        with patch.dict(os.environ, {"FLASK_ENV": "production", "API_SECRET_KEY": "k"}):
+            response = self.client.get("/api/dashboard/summary", headers={"X-Profile": "pstats"})
+            self.assertEqual(response.status_code, 401)
+            self.assertNotIn("X-Profile-Id", response.headers)
+            response = self.client.get(
+                "/api/dashboard/summary", headers={"X-Profile": "pstats", "X-API-KEY": "k"}
+            )
+            self.assertIn("X-Profile-Id", response.headers)
+
+    def test_download_stays_inside_the_profile_dir(self):
+        response = self.client.get("/api/debug/profiles/../../app/__init__.py")
+        self.assertEqual(response.status_code, 404)
+
+
+class TestRequestProfilerDisabled(unittest.TestCase):
+    def test_off_by_default(self):
+        app = create_test_app(flask_env="dev")
+        client = app.test_client()
+        with app.app_context():
+            self.assertFalse(app.config["REQUEST_PROFILING"])
+            response = client.get("/api/dashboard/summary", headers={"X-Profile": "pstats"})
+            self.assertNotIn("X-Profile-Id", response.headers)
+            self.assertEqual(client.get("/api/debug/profiles").status_code, 404)
+            db.session.remove()
+
+
+class TestRequestProfilerEnvironment(unittest.TestCase):
+    def test_settings_come_from_the_environment(self):
+        with tempfile.TemporaryDirectory() as directory, patch.dict(os.environ, {
+            "REQUEST_PROFILING": "Y", "PROFILE_DIR": directory, "PROFILE_KEEP": "1",
+        }):
+            app = create_test_app(flask_env="dev")
+            client = app.test_client()
+            with app.app_context():
+                db.create_all()
+                for _ in range(2):
+                    client.get("/api/dashboard/summary", headers={"X-Profile": "pstats"})
+                db.session.remove()
+            self.assertEqual(app.config["PROFILE_DIR"], directory)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
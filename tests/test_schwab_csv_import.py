@@ -0,0 +1,106 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from bin import process_schwab_transactions
+from bin.process_schwab_transactions import OUTPUT_HEADER, process_schwab_transactions_row
+from lib.csv_processing_utils import CSVProcessor
+from lib.db_utils import DatabaseInserter
+from lib.schwab_csv_import import bulk_import, normalize_transactions, read_export
+from tests.test_db_utils import SCHEMA
+
+HEADER = ["Date", "Action", "Symbol", "Description", "Quantity", "Price", "Fees & Comm", "Amount"]
+
+EXPORT = [
+    ["01/05/2024", "Buy", "AAPL", "APPLE INC", "10", "$150.25", "", "-$1,502.50"],
+    ["01/05/2024", "Buy", "AAPL", "APPLE INC", "10", "$150.25", "", "-$1,502.50"],  # duplicate row
+    ["01/05/2024", "Buy", "AAPL", "APPLE INC.", "10", "$150.25", "", ""],  # same trade
+    ["01/10/2024", "Sell", "AAPL", "APPLE INC", "10", "$160.00", "", "$1,600.00"],
+    ["02/01/2024 as of 01/31/2024", "Reinvest Shares", "FFIC", "FLUSHING", "1.234", "$12.10", "", ""],
+    ["03/01/2024", "Buy to Open", "SOUN 09/20/2024 4.00 C", "CALL SOUNDHOUND", "2", "$1.50", "$1.32", ""],
+    ["03/05/2024", "Sell to Close", "SOUN 09/20/2024 4.00 C", "CALL SOUNDHOUND", "2", "$2.10", "", ""],
+    ["09/20/2024", "Expired", "SOUN 09/20/2024 4.00 C", "CALL SOUNDHOUND", "2", "", "", ""],
+    ["03/26/2021", "Qual Div Reinvest", "", "TDA TRAN - QUALIFIED DIVIDEND (FFIC)", "", "", "", "$171.31"],
+    ["04/01/2024", "Exchange or Exercise", "SOUN 09/20/2024 4.00 C", "CALL SOUNDHOUND", "2", "", "", ""],
+    ["01/06/2024", "Buy", "TSLA", "TESLA", "", "$200", "", ""],  # no quantity
+    ["01/07/2024", "Buy", "NVDA", "NVIDIA", "5", "", "", ""],  # no price
+    ["01/08/2024", "Sell", "NVDA", "NVIDIA", "5", "", "", ""],  # no price, kept at 0
+    ["not a date", "Buy", "AMD", "AMD", "1", "$100", "", ""],
+    ["Transactions Total", "", "", "", "", "", "", "-$1,000.00"],
+]
+
+# Already in the database before the import
+STORED = {
+    "symbol": "AAPL", "action": "S", "label": None, "trade_type": "L",
+    "trade_date": "2024-01-10", "quantity": 10.0, "price": "$160.00",
+    "amount": 1600.0, "account": "C",
+}
+
+
+class TestBulkImportMatchesRowPipeline(unittest.TestCase):
+    """bulk_import stores and writes exactly what the per-row import does."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        process_schwab_transactions.SKIPPED_ROWS.clear()
+        self.addCleanup(process_schwab_transactions.SKIPPED_ROWS.clear)
+
+    def _run(self, name, bulk):
+        root = os.path.join(self.tmp, name)
+        dirs = [os.path.join(root, d) for d in ("input", "output", "processed")]
+        for d in dirs:
+            os.makedirs(d)
+        with open(os.path.join(dirs[0], "C_transactions.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            writer.writerows(EXPORT)
+
+        processor = CSVProcessor(*dirs)
+        db = DatabaseInserter(db_path=os.path.join(root, "trades.db"))
+        self.addCleanup(db.close)
+        db.cursor.executescript(SCHEMA)
+        db.insert_transaction(STORED)
+
+        input_files = processor.get_input_files("transaction")
+        if bulk:
+            _, skipped = bulk_import(processor, input_files, "out.csv", OUTPUT_HEADER, db)
+            skipped = len(skipped)
+        else:
+            processor.process_files(input_files, "out.csv", OUTPUT_HEADER,
+                                    process_schwab_transactions_row, db_inserter=db)
+            skipped = len(process_schwab_transactions.SKIPPED_ROWS)
+
+        db.cursor.execute("SELECT * FROM trade_transaction ORDER BY id")
+        rows = db.cursor.fetchall()
+        db.cursor.execute("SELECT * FROM security ORDER BY symbol")
+        securities = db.cursor.fetchall()
+        with open(os.path.join(dirs[1], "out.csv")) as f:
+            output = f.read()
+        self.assertEqual(os.listdir(dirs[2]), ["C_transactions.csv"])
+        return rows, securities, output, skipped
+
+    def test_same_rows_securities_output_and_skips(self):
+        expected = self._run("rows", bulk=False)
+        actual = self._run("bulk", bulk=True)
+        self.assertEqual(actual[0], expected[0])
+        self.assertEqual(actual[1], expected[1])
+        self.assertEqual(actual[2], expected[2])
+        self.assertEqual(actual[3], expected[3])
+        self.assertEqual(len(actual[0]), 7)
+
+    def test_option_action_without_label_is_skipped(self):
+        path = os.path.join(self.tmp, "export.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            writer.writerow(["03/01/2024", "Buy to Open", "SOUN", "CALL", "2", "$1.50", "", ""])
+        processor = CSVProcessor(self.tmp, self.tmp, self.tmp)
+        records, skipped = normalize_transactions(read_export(path), "C", processor)
+        self.assertEqual((records, len(skipped)), ([], 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
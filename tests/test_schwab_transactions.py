@@ -2,13 +2,21 @@ import json
 import os
 import sqlite3
 import tempfile
+import threading
+import time
 import unittest
+from types import SimpleNamespace
 from datetime import datetime, timezone
 from unittest.mock import MagicMock, patch
 
+import httpx
+
 from lib.db_utils import DatabaseInserter
+from lib.rate_limiter import TokenBucket
 from lib.schwab_transactions import (
     MAX_API_WINDOW_DAYS,
+    RETRY_BACKOFF_SECONDS,
+    SCHWAB_REQUESTS_PER_MINUTE,
     SYNC_WATERMARK_KEY,
     SchwabTransactionFetcher,
     build_account_codes,
@@ -473,5 +481,211 @@ class TestSchwabTransactionFetcher(unittest.TestCase):
         self.assertEqual(fetcher.stats["skipped_invalid_leg"], 1)
 
 
+
+class FakeSchwabClient:
+    """
+    Stands in for schwab-py's client: each get_transactions call sleeps for
+    `latency` seconds, then returns one TRADE per (account, window) whose
+    activityId encodes both, so ordering is visible in the records.
+
+    failures maps (account_hash, window start) to what its first calls
+    return instead, in order: an HTTP status code, or an exception to raise.
+    """
+
+    Transactions = SimpleNamespace(
+        TransactionType=SimpleNamespace(TRADE="TRADE", RECEIVE_AND_DELIVER="RECEIVE_AND_DELIVER")
+    )
+
+    def __init__(self, latency=0.0, fail_on=None, failures=None, accounts=()):
+        self.latency = latency
+        self.fail_on = fail_on  # (account_hash, window start), or an account_hash, that raises
+        self.failures = {key: list(outcomes) for key, outcomes in (failures or {}).items()}
+        self.accounts = [{"hashValue": h, "accountNumber": str(i)} for i, h in enumerate(accounts)]
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get_account_numbers(self):
+        return _response(200, self.accounts)
+
+    def get_transactions(self, account_hash, start_date, end_date, transaction_types):
+        key = (account_hash, start_date)
+        with self._lock:
+            self.calls.append(key)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            outcome = self.failures[key].pop(0) if self.failures.get(key) else None
+        try:
+            time.sleep(self.latency)
+            if self.fail_on in (key, account_hash):
+                raise RuntimeError("HTTP 500")
+            if isinstance(outcome, Exception):
+                raise outcome
+            if outcome is not None:
+                # Schwab's rate limiting says when to come back
+                headers = {"Retry-After": "7"} if outcome == 429 else None
+                return _response(outcome, {"errors": ["injected"]}, headers)
+            txn, _ = trade_txn(amount=1, activityId=f"{account_hash}:{start_date.date()}")
+            return _response(200, [txn])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _response(status, body, headers=None):
+    request = httpx.Request("GET", "https://api.schwabapi.com/trader/v1/accounts")
+    return httpx.Response(status, json=body, headers=headers, request=request)
+
+
+class TestConcurrentFetch(unittest.TestCase):
+    """
+    max_workers > 1 fetches account/window pairs from a thread pool but must
+    yield exactly what the sequential fetch yields, window by window.
+    """
+
+    ACCOUNTS = [{"hashValue": f"HASH{i}", "accountNumber": str(i)} for i in range(3)]
+    ACCOUNT_MAP = {"HASH0": "C", "HASH1": "R", "HASH2": "I"}
+    START = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    END = datetime(2026, 7, 1, tzinfo=timezone.utc)  # 5 windows
+
+    def _fetch(self, client, **kwargs):
+        fetcher = SchwabTransactionFetcher(client, self.ACCOUNTS, self.ACCOUNT_MAP, **kwargs)
+        return [
+            (window_end, [(r["account"], r["activity_id"]) for r in records])
+            for window_end, records in fetcher.fetch(self.START, self.END)
+        ]
+
+    def test_yields_the_same_windows_in_the_same_order(self):
+        sequential = self._fetch(FakeSchwabClient())
+        concurrent = self._fetch(FakeSchwabClient(), max_workers=4,
+                                 rate_limiter=TokenBucket(rate=1000, capacity=100))
+        self.assertEqual(len(sequential), 5)
+        self.assertEqual(concurrent, sequential)
+        self.assertEqual([code for code, _ in concurrent[0][1]], ["C", "R", "I"])
+
+    def test_overlaps_round_trips_up_to_max_workers(self):
+        client = FakeSchwabClient(latency=0.05)
+        started = time.perf_counter()
+        self._fetch(client, max_workers=4, rate_limiter=TokenBucket(rate=1000, capacity=100))
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(client.calls), 15)
+        self.assertLessEqual(client.max_in_flight, 4)
+        self.assertGreater(client.max_in_flight, 1)
+        self.assertLess(elapsed, 15 * 0.05 * 0.6)  # sequential would be >= 0.75s
+
+    def test_requests_wait_for_the_rate_limiter(self):
+        limiter = TokenBucket(rate=1000, capacity=1)
+        with patch.object(limiter, "acquire", wraps=limiter.acquire) as acquire:
+            self._fetch(FakeSchwabClient(), max_workers=4, rate_limiter=limiter)
+        self.assertEqual(acquire.call_count, 15)
+
+    def test_default_limiter_matches_schwab_budget(self):
+        fetcher = SchwabTransactionFetcher(FakeSchwabClient(), self.ACCOUNTS,
+                                           self.ACCOUNT_MAP, max_workers=4)
+        self.assertEqual(fetcher.rate_limiter.rate, SCHWAB_REQUESTS_PER_MINUTE / 60)
+        sequential = SchwabTransactionFetcher(FakeSchwabClient(), self.ACCOUNTS, self.ACCOUNT_MAP)
+        self.assertIsNone(sequential.rate_limiter)
+
+    def test_failure_surfaces_after_every_earlier_window(self):
+        windows = list(iter_windows(self.START, self.END))
+        client = FakeSchwabClient(fail_on=("HASH1", windows[2][0]))
+        fetcher = SchwabTransactionFetcher(client, self.ACCOUNTS, self.ACCOUNT_MAP, max_workers=4,
+                                           rate_limiter=TokenBucket(rate=1000, capacity=100))
+        yielded = []
+        with self.assertRaises(RuntimeError):
+            for window_end, _records in fetcher.fetch(self.START, self.END):
+                yielded.append(window_end)
+        self.assertEqual(yielded, [end for _start, end in windows[:2]])
+
+
+class TestFetchRetries(unittest.TestCase):
+    """
+    A transient failure (429/5xx, dropped connection) is retried with
+    jittered exponential backoff instead of aborting the whole fetch.
+    """
+
+    ACCOUNTS = [{"hashValue": f"HASH{i}", "accountNumber": str(i)} for i in range(2)]
+    ACCOUNT_MAP = {"HASH0": "C", "HASH1": "R"}
+    START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    END = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+    def _fetcher(self, client, **kwargs):
+        self.sleeps = []
+        return SchwabTransactionFetcher(client, self.ACCOUNTS, self.ACCOUNT_MAP,
+                                        sleep=self.sleeps.append, **kwargs)
+
+    def test_retries_retryable_statuses_with_growing_jittered_delays(self):
+        client = FakeSchwabClient(failures={("HASH1", self.START): [503, 502, 500]})
+        fetcher = self._fetcher(client)
+
+        [(_end, records)] = list(fetcher.fetch(self.START, self.END))
+
+        self.assertEqual([r["account"] for r in records], ["C", "R"])
+        self.assertEqual(client.calls.count(("HASH1", self.START)), 4)
+        self.assertEqual(fetcher.stats["retries"], 3)
+        self.assertEqual(len(self.sleeps), 3)
+        for attempt, delay in enumerate(self.sleeps):
+            self.assertTrue(0 <= delay <= RETRY_BACKOFF_SECONDS * 2 ** attempt, delay)
+
+    def test_honors_retry_after(self):
+        client = FakeSchwabClient(failures={("HASH0", self.START): [429]})
+        list(self._fetcher(client).fetch(self.START, self.END))
+        self.assertEqual(self.sleeps, [7.0])
+
+    def test_retries_transport_errors(self):
+        reset = httpx.ConnectError("connection reset by peer")
+        client = FakeSchwabClient(failures={("HASH0", self.START): [reset]})
+        [(_end, records)] = list(self._fetcher(client).fetch(self.START, self.END))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(len(self.sleeps), 1)
+
+    def test_gives_up_after_max_retries(self):
+        client = FakeSchwabClient(failures={("HASH0", self.START): [503] * 10})
+        fetcher = self._fetcher(client, max_retries=2)
+        with self.assertRaises(httpx.HTTPStatusError):
+            list(fetcher.fetch(self.START, self.END))
+        self.assertEqual(client.calls, [("HASH0", self.START)] * 3)
+
+    def test_client_errors_are_not_retried(self):
+        client = FakeSchwabClient(failures={("HASH0", self.START): [400]})
+        with self.assertRaises(httpx.HTTPStatusError):
+            list(self._fetcher(client).fetch(self.START, self.END))
+        self.assertEqual(self.sleeps, [])
+
+    def test_retries_take_rate_limiter_tokens(self):
+        limiter = TokenBucket(rate=1000, capacity=100)
+        client = FakeSchwabClient(failures={("HASH0", self.START): [503]})
+        with patch.object(limiter, "acquire", wraps=limiter.acquire) as acquire:
+            list(self._fetcher(client, rate_limiter=limiter).fetch(self.START, self.END))
+        self.assertEqual(acquire.call_count, 3)
+
+
+class TestFetchAccountWindows(unittest.TestCase):
+    ACCOUNTS = TestConcurrentFetch.ACCOUNTS
+    ACCOUNT_MAP = TestConcurrentFetch.ACCOUNT_MAP
+    START = TestConcurrentFetch.START
+    END = TestConcurrentFetch.END
+
+    def test_completed_account_windows_are_not_fetched(self):
+        windows = list(iter_windows(self.START, self.END))
+        completed = {("HASH0", windows[0][0].isoformat()), ("HASH2", windows[1][0].isoformat())}
+        for max_workers in (1, 4):
+            client = FakeSchwabClient()
+            fetcher = SchwabTransactionFetcher(
+                client, self.ACCOUNTS, self.ACCOUNT_MAP, max_workers=max_workers,
+                rate_limiter=TokenBucket(rate=1000, capacity=100),
+            )
+            parts = list(fetcher.fetch_account_windows(self.START, self.END, completed=completed))
+
+            self.assertEqual(len(parts), 15)
+            skipped = {(p.account_hash, p.window_start.isoformat())
+                       for p in parts if p.records is None}
+            self.assertEqual(skipped, completed)
+            self.assertEqual(len(client.calls), 13)
+            self.assertNotIn(("HASH0", windows[0][0]), client.calls)
+
+
 if __name__ == "__main__":
     unittest.main()
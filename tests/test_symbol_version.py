@@ -0,0 +1,47 @@
+import unittest
+
+from lib.db_utils import DatabaseInserter
+from lib.symbol_version import ensure_symbol_versions
+
+
+class TestSymbolVersion(unittest.TestCase):
+    def setUp(self):
+        self.db = DatabaseInserter(db_path=":memory:")
+        self.db.cursor.execute(
+            "CREATE TABLE trade_transaction (id INTEGER PRIMARY KEY, symbol TEXT, reason TEXT)"
+        )
+        self.db.cursor.execute("INSERT INTO trade_transaction (symbol) VALUES ('OLD')")
+        ensure_symbol_versions(self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def _versions(self):
+        self.db.cursor.execute("SELECT symbol, version FROM symbol_version")
+        return dict(self.db.cursor.fetchall())
+
+    def test_existing_symbols_are_seeded(self):
+        self.assertEqual(self._versions(), {"OLD": 1})
+
+    def test_ensure_is_idempotent(self):
+        ensure_symbol_versions(self.db)
+        self.assertEqual(self._versions(), {"OLD": 1})
+
+    def test_writes_bump_only_their_symbol(self):
+        self.db.cursor.execute("INSERT INTO trade_transaction (symbol) VALUES ('NEW')")
+        self.assertEqual(self._versions(), {"OLD": 1, "NEW": 1})
+        self.db.cursor.execute("UPDATE trade_transaction SET reason = 'x' WHERE symbol = 'NEW'")
+        self.db.cursor.execute("DELETE FROM trade_transaction WHERE symbol = 'NEW'")
+        versions = self._versions()
+        self.assertEqual(versions["OLD"], 1)
+        self.assertGreater(versions["NEW"], 2)
+
+    def test_moving_a_row_bumps_both_symbols(self):
+        self.db.cursor.execute("UPDATE trade_transaction SET symbol = 'NEW' WHERE symbol = 'OLD'")
+        versions = self._versions()
+        self.assertGreater(versions["OLD"], 1)
+        self.assertIn("NEW", versions)
+
+
+if __name__ == "__main__":
+    unittest.main()
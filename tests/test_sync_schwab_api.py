@@ -5,10 +5,12 @@ import unittest
 from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, patch
 
+import httpx
 from authlib.integrations.base_client.errors import OAuthError
 
 from bin.sync_schwab_api import main, _report_fatal_error
 from lib.db_utils import DatabaseInserter
+from lib.sync_checkpoint import SyncCheckpoints
 from lib.schwab_transactions import (
     MAX_API_WINDOW_DAYS,
     SYNC_WATERMARK_KEY,
@@ -17,8 +19,13 @@ from lib.schwab_transactions import (
     save_watermark,
     sync,
 )
+from tests.test_schwab_transactions import FakeSchwabClient, trade_txn
 
 SCHEMA = """
+CREATE TABLE security (
+    symbol TEXT PRIMARY KEY NOT NULL,
+    name TEXT NOT NULL
+);
 CREATE TABLE config (
     key TEXT PRIMARY KEY,
     value TEXT,
@@ -190,6 +197,26 @@ class TestSyncWindowing(unittest.TestCase):
         self.assertIsNone(global_row)
         self.assertEqual(symbol_row[0], end.isoformat())
 
+    def test_resync_skips_fills_already_stored(self):
+        # Two identical fills of one order, told apart only by activity_id
+        fills = [trade_txn(amount=100, activityId=i)[0] for i in (111, 222)]
+        client = self._mock_client()
+        resp = MagicMock()
+        resp.json.return_value = fills
+        client.get_transactions.return_value = resp
+        start = datetime(2026, 7, 1, tzinfo=timezone.utc)
+        end = datetime(2026, 7, 23, tzinfo=timezone.utc)
+
+        first = self._run_sync(client, start_date=start, end_date=end)
+        second = self._run_sync(client, start_date=start, end_date=end)
+
+        self.assertEqual((first["inserted"], first["skipped_existing"]), (2, 0))
+        self.assertEqual((second["inserted"], second["skipped_existing"]), (0, 2))
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute("SELECT COUNT(*) FROM trade_transaction").fetchone()[0]
+        conn.close()
+        self.assertEqual(count, 2)
+
     def test_sync_returns_result_counts(self):
         client = self._mock_client()
         start = datetime(2026, 1, 1, tzinfo=timezone.utc)
@@ -198,6 +225,118 @@ class TestSyncWindowing(unittest.TestCase):
         self.assertEqual(result, {"inserted": 0, "skipped_existing": 0, "skipped_invalid": 0})
 
 
+class TestSyncResume(unittest.TestCase):
+    """
+    A sync that dies part-way (here: a request that keeps failing) keeps
+    every account window it stored, and the next sync of the scope resumes
+    on the same windows without fetching those again.
+    """
+
+    ACCOUNTS = ("HASH0", "HASH1", "HASH2")
+    ACCOUNT_MAP = {"HASH0": "C", "HASH1": "R", "HASH2": "I"}
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(SCHEMA)
+        conn.commit()
+        conn.close()
+        self.addCleanup(os.remove, self.db_path)
+
+    def _run_sync(self, client, **kwargs):
+        with patch("lib.schwab_client.get_client", return_value=client), \
+             patch("lib.schwab_transactions.load_account_map", return_value=self.ACCOUNT_MAP), \
+             patch("lib.schwab_transactions._backoff_delay", return_value=0):
+            return sync(db_path=self.db_path, **kwargs)
+
+    def _query(self, sql):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_resumes_an_interrupted_backfill_without_refetching(self):
+        start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+        end = datetime(2025, 6, 1, tzinfo=timezone.utc)
+        windows = list(iter_windows(start, end))  # 3 windows
+        failing = FakeSchwabClient(accounts=self.ACCOUNTS,
+                                   failures={("HASH1", windows[1][0]): [503] * 10})
+        with self.assertRaises(httpx.HTTPStatusError):
+            self._run_sync(failing, start_date=start, end_date=end)
+
+        # Window 0 and HASH0's part of window 1 are stored and checkpointed
+        self.assertEqual(len(self._query("SELECT * FROM trade_transaction")), 4)
+        self.assertEqual(len(self._query("SELECT * FROM sync_checkpoint")), 4)
+        self.assertEqual(self._query(f"SELECT value FROM config WHERE key = '{SYNC_WATERMARK_KEY}'"),
+                         [(windows[0][1].isoformat(),)])
+
+        client = FakeSchwabClient(accounts=self.ACCOUNTS)
+        result = self._run_sync(client, start_date=start, end_date=end)
+
+        self.assertEqual(client.calls, [
+            ("HASH1", windows[1][0]), ("HASH2", windows[1][0]),
+            ("HASH0", windows[2][0]), ("HASH1", windows[2][0]), ("HASH2", windows[2][0]),
+        ])
+        self.assertEqual((result["inserted"], result["skipped_existing"]), (5, 0))
+        self.assertEqual(len(self._query("SELECT * FROM trade_transaction")), 9)
+        self.assertEqual(self._query(f"SELECT value FROM config WHERE key = '{SYNC_WATERMARK_KEY}'"),
+                         [(end.isoformat(),)])
+        # A finished run leaves nothing to resume
+        self.assertEqual(self._query("SELECT * FROM sync_checkpoint"), [])
+        self.assertEqual(self._query("SELECT * FROM sync_checkpoint_run"), [])
+
+    def test_window_is_stored_with_its_checkpoint_or_not_at_all(self):
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        end = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        real_mark_done = SyncCheckpoints.mark_done
+
+        def crash_on_second_window(checkpoints, account_hash, *args):
+            if account_hash == "HASH1":
+                raise sqlite3.OperationalError("disk I/O error")
+            return real_mark_done(checkpoints, account_hash, *args)
+
+        with patch.object(SyncCheckpoints, "mark_done", crash_on_second_window), \
+                self.assertRaises(sqlite3.OperationalError):
+            self._run_sync(FakeSchwabClient(accounts=self.ACCOUNTS),
+                           start_date=start, end_date=end)
+
+        # HASH1's fills rolled back with its checkpoint; HASH0's are kept
+        self.assertEqual(self._query("SELECT account FROM trade_transaction"), [("C",)])
+        self.assertEqual(self._query("SELECT account_hash FROM sync_checkpoint"), [("HASH0",)])
+
+        client = FakeSchwabClient(accounts=self.ACCOUNTS)
+        self._run_sync(client, start_date=start, end_date=end)
+        self.assertEqual([h for h, _ in client.calls], ["HASH1", "HASH2"])
+        self.assertEqual(len(self._query("SELECT * FROM trade_transaction")), 3)
+
+    def test_default_sync_resumes_the_interrupted_range(self):
+        failing = FakeSchwabClient(accounts=self.ACCOUNTS, fail_on="HASH2")
+        with self.assertRaises(RuntimeError):
+            self._run_sync(failing)
+        [(start, end)] = self._query("SELECT start_date, end_date FROM sync_checkpoint_run")
+
+        client = FakeSchwabClient(accounts=self.ACCOUNTS)
+        self._run_sync(client)
+
+        self.assertEqual(client.calls, [("HASH2", datetime.fromisoformat(start))])
+        self.assertEqual(self._query(f"SELECT value FROM config WHERE key = '{SYNC_WATERMARK_KEY}'"),
+                         [(end,)])
+
+    def test_a_different_range_starts_over(self):
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        failing = FakeSchwabClient(accounts=self.ACCOUNTS, fail_on=("HASH2", start))
+        with self.assertRaises(RuntimeError):
+            self._run_sync(failing, start_date=start,
+                           end_date=datetime(2026, 3, 1, tzinfo=timezone.utc))
+
+        client = FakeSchwabClient(accounts=self.ACCOUNTS)
+        self._run_sync(client, start_date=start,
+                       end_date=datetime(2026, 4, 1, tzinfo=timezone.utc))
+        self.assertEqual([h for h, _ in client.calls], list(self.ACCOUNTS))
+
+
 class TestReportFatalError(unittest.TestCase):
     """
     The raw authlib/httpx traceback is long and buries its one useful line
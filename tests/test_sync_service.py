@@ -12,9 +12,11 @@ import tempfile
 import threading
 import time
 import unittest
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
 
 from app.services import sync_service
+from tests.helpers import create_test_app
 
 SCHEMA = """
 CREATE TABLE sync_job (
@@ -26,7 +28,8 @@ CREATE TABLE sync_job (
     inserted INTEGER,
     skipped_existing INTEGER,
     skipped_invalid INTEGER,
-    error_message TEXT
+    error_message TEXT,
+    warmup_seconds REAL
 );
 """
 
@@ -132,6 +135,69 @@ class TestSyncService(unittest.TestCase):
 
         self.assertNotEqual(job_symbol, job_global)
 
+    def test_stale_running_job_is_replaced_by_a_resuming_job(self):
+        # A job whose worker died mid-sync: still 'running', hours later
+        started = datetime.now(timezone.utc) - sync_service.STALE_JOB_AFTER - timedelta(minutes=1)
+        conn = sqlite3.connect(self.db_path)
+        stale_id = conn.execute(
+            "INSERT INTO sync_job (symbol, status, started_at) VALUES (NULL, 'running', ?)",
+            (started.isoformat(),),
+        ).lastrowid
+        conn.commit()
+        conn.close()
+
+        with patch.object(sync_service, 'sync', return_value={
+            'inserted': 2, 'skipped_existing': 0, 'skipped_invalid': 0,
+        }) as mock_sync:
+            job_id = sync_service.start_sync(db_path=self.db_path)
+            job = self._wait_for_job(job_id)
+
+        self.assertNotEqual(job_id, stale_id)
+        mock_sync.assert_called_once_with(symbol=None, db_path=self.db_path)
+        self.assertEqual(job['status'], 'success')
+        stale = sync_service.get_job_status(stale_id, db_path=self.db_path)
+        self.assertEqual(stale['status'], 'error')
+        self.assertIn(f'resumed by job {job_id}', stale['error_message'])
+
+    def _start_in_app_context(self, **sync_patch):
+        app = create_test_app()
+        with app.app_context(), patch.object(sync_service, 'sync', **sync_patch):
+            job_id = sync_service.start_sync(db_path=self.db_path)
+            return self._wait_for_job(job_id)
+
+    def test_job_started_from_the_app_warms_the_cache(self):
+        with patch.object(sync_service, 'warm_analysis_cache') as mock_warm, \
+                patch.object(sync_service, 'build_dashboard_summary') as mock_summary, \
+                patch.object(sync_service, 'aggregate_open_positions') as mock_positions:
+            job = self._start_in_app_context(return_value={
+                'inserted': 1, 'skipped_existing': 0, 'skipped_invalid': 0,
+            })
+
+        mock_warm.assert_called_once()
+        mock_summary.assert_called_once()
+        mock_positions.assert_called_once()
+        self.assertEqual(job['status'], 'success')
+        self.assertIsNotNone(job['warmup_seconds'])
+
+    def test_failed_warm_up_still_reports_success(self):
+        with patch.object(sync_service, 'warm_analysis_cache', side_effect=RuntimeError('boom')):
+            job = self._start_in_app_context(return_value={
+                'inserted': 1, 'skipped_existing': 0, 'skipped_invalid': 0,
+            })
+
+        self.assertEqual(job['status'], 'success')
+        self.assertIsNone(job['warmup_seconds'])
+
+    def test_job_without_app_context_skips_the_warm_up(self):
+        with patch.object(sync_service, 'warm_analysis_cache') as mock_warm, \
+                patch.object(sync_service, 'sync', return_value={
+                    'inserted': 0, 'skipped_existing': 0, 'skipped_invalid': 0,
+                }):
+            job = self._wait_for_job(sync_service.start_sync(db_path=self.db_path))
+
+        mock_warm.assert_not_called()
+        self.assertIsNone(job['warmup_seconds'])
+
     def test_get_job_status_unknown_id_returns_none(self):
         self.assertIsNone(sync_service.get_job_status(999, db_path=self.db_path))
 
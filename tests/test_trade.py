@@ -2,7 +2,7 @@ import unittest
 import json
 import logging, time, os
 from datetime import datetime
-from lib.models.Trade import Trade, BuyTrade, SellTrade, TradeData
+from lib.models.Trade import Trade, BuyTrade, SellAllocation, SellTrade, TradeData
 from typing import List, cast
 
 
@@ -599,6 +599,33 @@ class TestTradeClasses(unittest.TestCase):
         )
         self.assertEqual(trade3.trade_date.isoformat(), "2023-05-17T00:00:00")
 
+    def test_date_formats_match_strptime(self):
+        """Unpadded dates still parse; other ISO variants are still rejected"""
+        trade = BuyTrade(
+            {
+                "trade_id": "1004",
+                "symbol": "TEST",
+                "action": "B",
+                "trade_date": "2023-5-7",  # type: ignore
+                "quantity": 10,
+                "price": 102.0,
+            }
+        )
+        self.assertEqual(trade.trade_date, datetime(2023, 5, 7))
+
+        for bad_date in ("2023-05-17 14:30:00", "2023-W20-3", "20230517"):
+            with self.assertRaises(ValueError):
+                BuyTrade(
+                    {
+                        "trade_id": "1005",
+                        "symbol": "TEST",
+                        "action": "B",
+                        "trade_date": bad_date,  # type: ignore
+                        "quantity": 10,
+                        "price": 102.0,
+                    }
+                )
+
     def test_validation(self):
         """Test trade validation rules"""
         # Missing required field
@@ -719,6 +746,36 @@ class TestTradeClasses(unittest.TestCase):
         except Exception as e:
             self.fail(f"JSON serialization failed: {str(e)}")
 
+    def test_trades_are_slotted(self):
+        """Trades carry no per-instance __dict__ and serialize in field order"""
+        buy = BuyTrade(self.sample_trades[0])
+        sell = SellTrade(self.sample_trades[1])
+        self.assertFalse(hasattr(buy, "__dict__"))
+        self.assertFalse(hasattr(sell, "__dict__"))
+        with self.assertRaises(AttributeError):
+            buy.not_a_field = 1  # type: ignore
+
+        buy_keys = list(buy.to_dict())
+        self.assertEqual(buy_keys[:3], ["symbol", "action", "trade_date"])
+        self.assertEqual(buy_keys[-1], "sells")
+        self.assertEqual(list(sell.to_dict())[-1], "percent_profit_loss")
+        self.assertNotIn("_multiplier", buy_keys)
+
+    def test_applied_sell_is_allocation_of_parent(self):
+        """Applied sells reference the parent sell instead of copying it"""
+        buy = BuyTrade(self.sample_trades[5])  # 50 shares
+        sell = SellTrade(self.sample_trades[6])  # 25 shares
+        applied = buy.apply_sell_trade(sell)
+
+        self.assertIsInstance(applied, SellAllocation)
+        self.assertIs(applied.sell, sell)
+        self.assertEqual(applied.trade_id, sell.trade_id)
+        self.assertEqual(applied.trade_date, sell.trade_date)
+        self.assertEqual(applied.quantity, 25.0)
+        self.assertEqual(sell.quantity, 0.0)
+        self.assertTrue(applied.is_done)
+        self.assertEqual(list(applied.to_dict()), list(sell.to_dict()))
+
     def test_complex_serialization(self):
         """Test serialization with multiple nested objects"""
         # Create a buy trade with multiple sells
@@ -1,5 +1,14 @@
+import base64
+import json
 import unittest
-from app.services.trade_service import validate_trade_update, REASON_MAX_LEN
+from datetime import datetime
+
+from app.services.trade_service import (
+    REASON_MAX_LEN,
+    decode_cursor,
+    encode_cursor,
+    validate_trade_update,
+)
 
 
 class TestValidateTradeUpdate(unittest.TestCase):
@@ -57,5 +66,19 @@ class TestValidateTradeUpdate(unittest.TestCase):
         self.assertEqual(validate_trade_update({"quantity": 100}), {})
 
 
+class TestPageCursor(unittest.TestCase):
+
+    def test_round_trip(self):
+        cursor = encode_cursor(datetime(2025, 1, 2, 9, 30), 42)
+        self.assertEqual(decode_cursor(cursor), (datetime(2025, 1, 2, 9, 30), 42))
+
+    def test_crafted_cursors_are_rejected(self):
+        for value in (["2024-01-01", "x"], ["2024-01-01", 1.5], ["2024-01-01", True],
+                      ["2024-01-01T00:00+00:00", 1], [20240101, 1], ["2024-01-01"]):
+            cursor = base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
 if __name__ == "__main__":
     unittest.main()
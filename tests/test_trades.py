@@ -131,6 +131,40 @@ class TestTradesClasses(unittest.TestCase):
             f"Expected B1, got {self.trades.buy_trades[1].trade_id}",
         )
 
+    def test_sell_queues_by_option_label(self):
+        """Option sells are queued per (account, trade_label), in sorted order"""
+        options = Trades(security_type="option")
+        for i, label in enumerate(["AAA 100 C", "AAA 110 C", "AAA 100 C"]):
+            options.add_trade(
+                SellTrade(
+                    {
+                        "trade_id": f"SC{i}",
+                        "symbol": "AAA",
+                        "action": "SC",
+                        "trade_date": datetime(2024, 3, 3 - i),
+                        "trade_type": "C",
+                        "trade_label": label,
+                        "quantity": 1,
+                        "price": 2.0,
+                        "account": "C",
+                    }  # type: ignore
+                )
+            )
+        options.sort_trades()
+
+        queues = options.sell_queues(match_label=True)
+        self.assertEqual(
+            [s.trade_id for s in queues[("C", "AAA 100 C")]], ["SC2", "SC0"]
+        )
+        self.assertEqual([s.trade_id for s in queues[("C", "AAA 110 C")]], ["SC1"])
+
+        # Queues are copies; draining one leaves sells_by_account alone
+        queues[("C", "AAA 110 C")].clear()
+        self.assertEqual(len(options.sells_by_account["C"]), 3)
+        self.assertEqual(
+            [s.trade_id for s in options.sell_queues()["C"]], ["SC2", "SC1", "SC0"]
+        )
+
     def test_json_serialization(self):
         """Test trades collection serialization to JSON"""
         trade_dict = self.trades.to_dict()
@@ -2252,6 +2252,59 @@ class TestTradingAnalyzer(unittest.TestCase):
         self.assertEqual(buy_50.sells[0].price, 8.0, "SC sell should have price=8.0")
         self.assertAlmostEqual(buy_50.sells[0].profit_loss, 300.0, places=2)
 
+    def _assert_same_trade_dict(self, expected, actual, context):
+        self.assertEqual(expected.keys(), actual.keys(), context)
+        for key, value in expected.items():
+            if key == "sells":
+                self.assertEqual(len(value), len(actual[key]), f"{context} sells")
+                for i, (exp_sell, act_sell) in enumerate(zip(value, actual[key])):
+                    self._assert_same_trade_dict(exp_sell, act_sell, f"{context} sell {i}")
+            elif isinstance(value, float):
+                self.assertAlmostEqual(value, actual[key], places=6, msg=f"{context} {key}")
+            else:
+                self.assertEqual(value, actual[key], f"{context} {key}")
+
+    def test_columnar_engine_matches_object_engine(self):
+        """The columnar lot matcher must reproduce the object engine on every data set."""
+        for data in self.data_list:
+            symbol, transactions = next(iter(data.items()))
+            for status in ("all", "open", "closed"):
+                with self.subTest(symbol=symbol, status=status):
+                    object_analyzer = TradingAnalyzer(symbol, transactions)
+                    object_analyzer.analyze_trades(status=status)
+                    columnar_analyzer = TradingAnalyzer(symbol, transactions)
+                    columnar_analyzer.analyze_trades(status=status, engine="columnar")
+
+                    expected = object_analyzer.get_profit_loss_data()
+                    actual = columnar_analyzer.get_profit_loss_data()
+                    for security_type in ("stock", "option"):
+                        exp_sec = expected[security_type]
+                        act_sec = actual[security_type]
+                        self.assertEqual(exp_sec["has_trades"], act_sec["has_trades"])
+                        self.assertEqual(
+                            len(exp_sec["all_buy_trades"]), len(act_sec["all_buy_trades"])
+                        )
+                        for exp_buy, act_buy in zip(
+                            exp_sec["all_buy_trades"], act_sec["all_buy_trades"]
+                        ):
+                            self.assertEqual(exp_buy.closed_date, act_buy.closed_date)
+                            self._assert_same_trade_dict(
+                                exp_buy.to_dict(),
+                                act_buy.to_dict(),
+                                f"{symbol} buy {exp_buy.trade_id}",
+                            )
+                        if exp_sec["has_trades"]:
+                            self.assertAlmostEqual(
+                                exp_sec["summary"].profit_loss,
+                                act_sec["summary"].profit_loss,
+                                places=6,
+                            )
+
+    def test_invalid_engine_raises(self):
+        analyzer = TradingAnalyzer("SN", self.data_list[0]["SN"])
+        with self.assertRaises(ValueError):
+            analyzer.analyze_trades(engine="turbo")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,11 +1,6 @@
 import unittest
 from datetime import datetime
-from lib.trading_analyzer import TradingAnalyzer
-
-
-import unittest
-from datetime import datetime
-from lib.trading_analyzer import TradingAnalyzer
+from lib.trading_analyzer import TradingAnalyzer, derive_profit_loss_view
 
 
 class TestTradingAnalyzerFilters(unittest.TestCase):
@@ -266,5 +261,79 @@ class TestTradingAnalyzerFilters(unittest.TestCase):
         )
 
 
+
+class TestDerivedViews(unittest.TestCase):
+    """derive_profit_loss_view must match re-running the analysis filtered."""
+
+    def setUp(self):
+        TestTradingAnalyzerFilters.setUp(self)
+        option = {
+            "symbol": "FILT",
+            "label": "FILT 06/20/2025 60.00 C",
+            "trade_type": "C",
+            "expiration_date": "2025-06-20",
+            "account": "XYZ",
+        }
+        self.trades += [
+            {**option, "id": "0101", "action": "BO", "trade_date": "2023-05-11",
+             "quantity": 3, "price": 2.1, "amount": -630.0},
+            {**option, "id": "0102", "action": "SC", "trade_date": "2023-05-20",
+             "quantity": 2, "price": 3.35, "amount": 670.0},
+            {**option, "id": "0103", "action": "BO", "trade_date": "2023-05-21",
+             "quantity": 1, "price": 1.7, "amount": -170.0},
+            {**option, "id": "0104", "action": "SC", "trade_date": "2023-05-22",
+             "quantity": 1, "price": 0.9, "amount": 90.0},
+        ]
+
+    def _analyze(self, **filters):
+        analyzer = TradingAnalyzer("FILT", self.trades)
+        analyzer.analyze_trades(**filters)
+        return analyzer.get_profit_loss_data_json()
+
+    def test_views_match_a_filtered_analysis(self):
+        unfiltered = self._analyze(status="all")
+        for filters in (
+            {"status": "open"},
+            {"status": "closed"},
+            {"account": "ABC"},
+            {"account": "XYZ", "status": "closed"},
+            {"after_date": "2023-05-17"},
+            {"after_date": "2023-05-17", "status": "open", "account": "XYZ"},
+            {"account": "NONE"},
+        ):
+            with self.subTest(**filters):
+                self.assertEqual(
+                    derive_profit_loss_view(unfiltered, **filters), self._analyze(**filters)
+                )
+
+    def test_unfiltered_view_equals_the_input(self):
+        unfiltered = self._analyze(status="all")
+        self.assertEqual(derive_profit_loss_view(unfiltered), unfiltered)
+
+    def test_summary_only_view(self):
+        unfiltered = self._analyze(status="all")
+        full = derive_profit_loss_view(unfiltered, status="closed")
+        summary_only = derive_profit_loss_view(unfiltered, status="closed", summary_only=True)
+        for security_type, section in full.items():
+            self.assertEqual(
+                summary_only[security_type],
+                {"has_trades": section["has_trades"], "summary": section["summary"]},
+            )
+
+    def test_symbol_without_options(self):
+        self.trades = [t for t in self.trades if "label" not in t]
+        unfiltered = self._analyze(status="all")
+        view = derive_profit_loss_view(unfiltered, status="open")
+        self.assertEqual(view["option"], {"has_trades": False, "summary": {}, "all_trades": []})
+        self.assertEqual(view, self._analyze(status="open"))
+
+    def test_invalid_filters(self):
+        unfiltered = self._analyze(status="all")
+        with self.assertRaises(ValueError):
+            derive_profit_loss_view(unfiltered, status="invalid")
+        with self.assertRaises(ValueError):
+            derive_profit_loss_view(unfiltered, after_date="05/17/2023")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -76,6 +76,16 @@ class TestTradingAnalyzerJSON(unittest.TestCase):
         except Exception as e:
             self.fail(f"JSON serialization failed: {str(e)}")
 
+    def test_summary_only_leaves_out_trade_rows(self):
+        """summary_only has the same summaries and no all_trades lists"""
+        full = self.analyzer.get_profit_loss_data_json()
+        summaries = self.analyzer.get_profit_loss_data_json(summary_only=True)
+
+        for security_type, section in summaries.items():
+            self.assertNotIn("all_trades", section)
+            self.assertEqual(section["has_trades"], full[security_type]["has_trades"])
+            self.assertEqual(section["summary"], full[security_type]["summary"])
+
     def test_empty_data_handling(self):
         """Test JSON output with no trades"""
         empty_analyzer = TradingAnalyzer("EMPTY", [])
@@ -4,7 +4,10 @@ import os
 import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
-from lib.yfinance import YahooFinance, extract_price, get_market_price, get_quote
+
+import pandas as pd
+
+from lib.yfinance import YahooFinance, download_prices, extract_price, get_market_price, get_quote
 
 test_symbol = "AAPL"
 mock_test_symbol = "FAKE1"
@@ -190,5 +193,45 @@ class TestPriceHelpers(unittest.TestCase):
         self.assertIsNone(get_market_price("FAKE"))
 
 
+class TestDownloadPrices(unittest.TestCase):
+    """download_prices asks for every ticker in one yf.download call."""
+
+    @staticmethod
+    def _frame(closes):
+        """A group_by="ticker" download: (ticker, field) columns, one row per day."""
+        index = pd.date_range("2026-10-12", periods=3)
+        return pd.concat(
+            {ticker: pd.DataFrame({"Open": values, "Close": values}, index=index)
+             for ticker, values in closes.items()},
+            axis=1,
+        )
+
+    def test_last_close_per_ticker_from_one_download(self):
+        downloader = MagicMock(return_value=self._frame({
+            "AAPL": [188.0, 189.5, 190.25],
+            "X250117C00010000": [1.2, 1.3, float("nan")],  # no trade today
+            "GONE": [float("nan")] * 3,
+        }))
+        prices = download_prices(["AAPL", "X250117C00010000", "GONE", "AAPL"], downloader=downloader)
+
+        self.assertEqual(prices, {"AAPL": 190.25, "X250117C00010000": 1.3, "GONE": None})
+        downloader.assert_called_once()
+        self.assertEqual(downloader.call_args.args[0], ["AAPL", "X250117C00010000", "GONE"])
+
+    def test_ticker_missing_from_the_frame_has_no_price(self):
+        downloader = MagicMock(return_value=self._frame({"AAPL": [1.0, 2.0, 3.0]}))
+        self.assertEqual(download_prices(["AAPL", "MSFT"], downloader=downloader),
+                         {"AAPL": 3.0, "MSFT": None})
+
+    def test_failed_download_returns_nothing(self):
+        self.assertEqual(download_prices(["AAPL"], downloader=MagicMock(side_effect=OSError)), {})
+        self.assertEqual(download_prices(["AAPL"], downloader=MagicMock(return_value=pd.DataFrame())), {})
+
+    def test_no_tickers_makes_no_call(self):
+        downloader = MagicMock()
+        self.assertEqual(download_prices([], downloader=downloader), {})
+        downloader.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()